@@ -5,19 +5,59 @@ Cumplimiento NC-3, NC-6, DS-24051 para contabilidad boliviana
 """
 import os
 import sys
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
-from typing import List, Dict, Optional, Tuple, Any
-import pandas as pd
-import numpy as np
+from fastapi import FastAPI, HTTPException, Header, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Dict, Optional, Tuple, Any, Literal, Set
 from datetime import datetime, timedelta
 import json
+import logging
+import logging.handlers
+import queue
+import random
 import re
 import unicodedata
 import asyncio
+import atexit
+import copy
+import cProfile
+import gzip
+import hashlib
+import hmac
+import importlib
+import math
+import pstats
+import sqlite3
+import threading
+import time
+import tracemalloc
+import uuid
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
 from enum import Enum
-import httpx
+
+class _LazyModule:
+    """Proxy que importa el módulo en el primer acceso a un atributo (arranque en frío V9.0)"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def _resolve(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._resolve(), attr)
+
+# numpy y httpx solo se cargan cuando un cálculo o una llamada remota los necesita
+np = _LazyModule("numpy")
+httpx = _LazyModule("httpx")
 
 app = FastAPI(title="Adjustment AI Engine", version="1.0.0")
 
@@ -72,6 +112,19 @@ class AdjustmentParameters(BaseModel):
     ledger_trajectories: Optional[Dict[str, List[Any]]] = Field(default_factory=dict, description="{account_code: [movements]}")
     ufv_cache: Optional[Dict[str, float]] = Field(default_factory=dict, description="{date: ufv_value}")
     use_trajectory_mode: bool = Field(False, description="Habilitar cálculo por trayectoria AoT")
+    # V9.0: Backend de cómputo de las fórmulas PoT (None = AI_COMPUTE_BACKEND)
+    compute_backend: Optional[str] = Field(None, description="Backend de cómputo: scalar o numpy")
+
+    @field_validator("compute_backend")
+    @classmethod
+    def check_compute_backend(cls, value: Optional[str]) -> Optional[str]:
+        """Rechaza en el borde (422) un backend no registrado en vez de fallar dentro del cálculo"""
+        if value is None:
+            return None
+        key = value.lower()
+        if key not in _compute_backends:
+            raise ValueError(f"compute_backend desconocido: {value} (disponibles: {', '.join(sorted(_compute_backends))})")
+        return key
 
 
 class TransactionEntry(BaseModel):
@@ -181,6 +234,11 @@ class AdjustmentRequest(BaseModel):
     accounts: List[Account] = Field(..., description="Cuentas para análisis")
     parameters: AdjustmentParameters = Field(..., description="Parámetros de ajuste")
     profile_schema: Optional[Dict[str, Any]] = Field(None, description="AdjustmentProfile inyectado")
+    # V9.0: Referencia a un perfil ya almacenado en el motor (evita reenviar profile_schema)
+    profile_version: Optional[int] = Field(None, description="Versión del perfil almacenado en el motor")
+    profile_etag: Optional[str] = Field(None, description="ETag del perfil almacenado en el motor")
+    # V9.0: Desglose de tiempos por etapa en processing_stats
+    include_stage_timings: bool = Field(False, description="Incluir stage_timings en processing_stats")
 
 class AdjustmentResponse(BaseModel):
     success: bool = Field(..., description="Operación exitosa")
@@ -217,6 +275,51 @@ class ARSConfig:
     max_reasoning_tokens: int = 200
     audit_trail_format: str = "concise"
 
+# Metadatos de cálculo que las reglas devueltas por los *_pot exponen a /explain
+TRACE_DETAIL_KEYS = ("cc", "aot_mode", "atoms", "asset_type", "annual_rate", "dep_config", "proration_factor", "rate")
+
+@dataclass
+class AdjustmentTrace:
+    """Resultado pre-ARS de un tipo de ajuste: (monto, confianza, auditoría, regla con metadatos)"""
+    amount: float
+    confidence: float
+    audit_trail: str
+    rule: Dict[str, Any]
+
+    @property
+    def details(self) -> Dict[str, Any]:
+        return {key: self.rule[key] for key in TRACE_DETAIL_KEYS if key in self.rule}
+
+@dataclass
+class EvaluationTrace:
+    """
+    V9.0: Evaluación de una cuenta en una sola pasada (una clasificación para todo el pipeline).
+    /generate arma los asientos y /explain la explicación a partir del mismo objeto.
+    """
+    account: Account
+    classification: str
+    base_confidence: float
+    tags: List[str]
+    rule: Any
+    trajectory_mode: bool
+    aitb: AdjustmentTrace
+    depreciation_base: float
+    depreciation: AdjustmentTrace
+    provision: AdjustmentTrace
+
+    @property
+    def classified(self) -> Tuple[str, float, List[str], Any]:
+        return self.classification, self.base_confidence, self.tags, self.rule
+
+def normalize_text(text: str) -> str:
+    """Normalizar texto eliminando acentos y convirtiendo a minúsculas"""
+    if not text:
+        return ""
+    # Normalizar unicode (NFD separa caracteres de sus acentos)
+    text = unicodedata.normalize('NFD', text)
+    # Filtrar caracteres de combinación (acentos) y convertir a minúsculas
+    return ''.join(c for c in text if unicodedata.category(c) != 'Mn').lower()
+
 class AdjustmentProfileSchema:
     """Esquema de Contexto de Dominio Gobernable (ARS Context Model V3.0)"""
     
@@ -237,7 +340,19 @@ class AdjustmentProfileSchema:
         self.non_monetary_rules = self._load_semantic_rules("non_monetary_rules")
         self.depreciation_configs = self._load_depreciation_configs()
         self.ars_config = self._load_ars_config()
-    
+
+        # V9.0: Reglas SCL precompiladas (índice = posición en la lista del perfil)
+        self.scl_matchers = self._compile_scl_matchers()
+
+        # V9.0: Catálogo de activos pre-normalizado para el Smart Matching de depreciación
+        self.asset_matchers = [
+            (config, normalize_text(config.asset_type_keyword), set(normalize_text(config.asset_type_keyword).split()))
+            for config in self.depreciation_configs
+        ]
+        self.fallback_depreciation_config = next(
+            (c for c in self.depreciation_configs if "activos fijos" in c.asset_type_keyword.lower()), None
+        )
+
     
     def _get_default_ars_profile(self) -> Dict:
         """Perfil ARS-DSPy por defecto con contexto completo"""
@@ -380,25 +495,28 @@ class AdjustmentProfileSchema:
         """Cargar métricas de desempeño"""
         return self.profile_data.get("performance_metrics", {})
     
+    @staticmethod
+    def compile_rule_pattern(pattern_str: str) -> Any:
+        """Compila el patrón de una regla ('/cuerpo/flags' estilo JS o regex plano, sin distinguir mayúsculas)"""
+        # Convertir string de RegExp a objeto compilado
+        if pattern_str.startswith('/') and pattern_str.endswith('/'):
+            # Extraer flags y patrón
+            pattern_parts = pattern_str[1:-1].split('/')
+            pattern_body = pattern_parts[0]
+            flags_str = pattern_parts[1] if len(pattern_parts) > 1 else ''
+            
+            # Convertir flags
+            flags = 0
+            if 'i' in flags_str:
+                flags = re.IGNORECASE
+            
+            return re.compile(pattern_body, flags)
+        return re.compile(pattern_str, re.IGNORECASE)
+
     def _load_semantic_rules(self, rule_type: str) -> List[SemanticRule]:
         rules = []
         for rule_data in self.profile_data.get(rule_type, []):
-            pattern_str = rule_data["pattern"]
-            # Convertir string de RegExp a objeto compilado
-            if pattern_str.startswith('/') and pattern_str.endswith('/'):
-                # Extraer flags y patrón
-                pattern_parts = pattern_str[1:-1].split('/')
-                pattern_body = pattern_parts[0]
-                flags_str = pattern_parts[1] if len(pattern_parts) > 1 else ''
-                
-                # Convertir flags
-                flags = 0
-                if 'i' in flags_str:
-                    flags = re.IGNORECASE
-                
-                pattern = re.compile(pattern_body, flags)
-            else:
-                pattern = re.compile(pattern_str, re.IGNORECASE)
+            pattern = self.compile_rule_pattern(rule_data["pattern"])
             
             rules.append(SemanticRule(
                 pattern=pattern.pattern,
@@ -428,7 +546,1586 @@ class AdjustmentProfileSchema:
             max_reasoning_tokens=200,
             audit_trail_format="concise"
         )
-        
+
+    def _compile_scl_matchers(self) -> Dict[str, List[Tuple[int, Any, Dict]]]:
+        """
+        V9.0: Compila una sola vez las reglas SCL de alta prioridad (weight >= 2.0).
+        Devuelve {rule_type: [(índice_en_lista, regex, regla)]} para el hot path de clasificación.
+        """
+        matchers = {}
+        for rule_type in ("monetary_rules", "non_monetary_rules"):
+            compiled = []
+            for idx, rule in enumerate(self.profile_data.get(rule_type, [])):
+                pattern = rule.get("pattern", "")
+                if rule.get("confidence_weight", 1.0) < 2.0:
+                    continue
+                if not (pattern.startswith("^") or pattern.startswith(".*")):
+                    continue
+                try:
+                    compiled.append((idx, re.compile(pattern, re.IGNORECASE), rule))
+                except re.error:
+                    continue
+            matchers[rule_type] = compiled
+        return matchers
+
+    def refresh_scl_matchers(self):
+        """Recompila las reglas SCL tras mutar profile_data (p.ej. poda de la Rueda)"""
+        self.scl_matchers = self._compile_scl_matchers()
+
+# =============================================================================
+# TELEMETRÍA DE REGLAS SCL (Hit Counters V9.0)
+# =============================================================================
+
+# Almacén sidecar SQLite del motor (contadores de reglas y demás estado persistente)
+SIDECAR_DB_PATH = os.getenv(
+    "MAHORAGA_SIDECAR_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "mahoraga_sidecar.db")
+)
+
+class RuleHitStore:
+    """Almacén sidecar de impactos por regla: (company_id, lista, patrón) -> hit_count, last_hit"""
+
+    def __init__(self, db_path: str = SIDECAR_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS mahoraga_rule_hits (
+                company_id TEXT NOT NULL,
+                rule_list TEXT NOT NULL,
+                pattern TEXT NOT NULL,
+                hit_count INTEGER DEFAULT 0,
+                last_hit TEXT,
+                PRIMARY KEY (company_id, rule_list, pattern)
+            )"""
+        )
+        self._conn.commit()
+
+    def record(self, company_id: str, hits: List[Tuple[str, str, int, str]]):
+        """Acumula lotes de (rule_list, pattern, hits, last_hit_iso)"""
+        if not hits:
+            return
+        with self._lock:
+            self._conn.executemany(
+                """INSERT INTO mahoraga_rule_hits (company_id, rule_list, pattern, hit_count, last_hit)
+                   VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT(company_id, rule_list, pattern) DO UPDATE SET
+                   hit_count = hit_count + excluded.hit_count,
+                   last_hit = MAX(COALESCE(last_hit, ''), excluded.last_hit)""",
+                [(str(company_id), rule_list, pattern, count, last_hit) for rule_list, pattern, count, last_hit in hits]
+            )
+            self._conn.commit()
+
+    def get_stats(self, company_id: str) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """Estadísticas acumuladas de una empresa indexadas por (rule_list, pattern)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT rule_list, pattern, hit_count, last_hit FROM mahoraga_rule_hits WHERE company_id = ?",
+                (str(company_id),)
+            ).fetchall()
+        return {(r[0], r[1]): {"hit_count": r[2], "last_hit": r[3]} for r in rows}
+
+_rule_hit_store: Optional[RuleHitStore] = None
+_rule_hit_store_failed = False
+
+def get_rule_hit_store() -> Optional[RuleHitStore]:
+    """Singleton perezoso del sidecar; None si el sistema de archivos no lo permite (p.ej. serverless)"""
+    global _rule_hit_store, _rule_hit_store_failed
+    if _rule_hit_store is None and not _rule_hit_store_failed:
+        try:
+            _rule_hit_store = RuleHitStore()
+        except sqlite3.Error as e:
+            _rule_hit_store_failed = True
+            print(f"WARN RuleHitStore no disponible ({SIDECAR_DB_PATH}): {e}")
+    return _rule_hit_store
+
+# Impactos (lista, índice) de la petición en curso: cada corrida acumula los suyos y los confirma al final
+_rule_hit_buffer: ContextVar[Optional[List[Tuple[str, int]]]] = ContextVar("ai_rule_hit_buffer", default=None)
+
+class RuleHitCounter:
+    """
+    Contadores compactos por regla SCL (array 'L' de hits + array 'd' de último impacto).
+    record() es O(1) en el hot path; flush() vuelca al perfil y al sidecar cada flush_every hits.
+    Dentro de request_scope() los impactos van al búfer de la petición y commit() los atribuye a su empresa.
+    """
+
+    def __init__(self, profile: 'AdjustmentProfileSchema', flush_every: int = 500):
+        self.profile = profile
+        self.flush_every = flush_every
+        self.company_id: Optional[str] = None
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        """Redimensiona los contadores al tamaño actual de las listas de reglas"""
+        with self._lock:
+            self.counts = {}
+            self.last_hit = {}
+            for rule_type in ("monetary_rules", "non_monetary_rules"):
+                size = len(self.profile.profile_data.get(rule_type, []))
+                self.counts[rule_type] = array('L', [0]) * size
+                self.last_hit[rule_type] = array('d', [0.0]) * size
+            self.pending = 0
+
+    def record(self, rule_type: str, idx: int):
+        buffer = _rule_hit_buffer.get()
+        if buffer is not None:
+            buffer.append((rule_type, idx))
+            return
+        with self._lock:
+            self._count(rule_type, idx, time.time())
+            if self.pending < self.flush_every:
+                return
+        self.flush()
+
+    def _count(self, rule_type: str, idx: int, now: float):
+        counts = self.counts[rule_type]
+        if idx < len(counts):  # índices de antes de una poda concurrente se descartan
+            counts[idx] += 1
+            self.last_hit[rule_type][idx] = now
+            self.pending += 1
+
+    @contextmanager
+    def request_scope(self):
+        """Búfer de impactos propio de la corrida (no se mezcla con otras peticiones concurrentes)"""
+        buffer: List[Tuple[str, int]] = []
+        token = _rule_hit_buffer.set(buffer)
+        try:
+            yield buffer
+        finally:
+            _rule_hit_buffer.reset(token)
+
+    def commit(self, hits: List[Tuple[str, int]], company_id: Optional[str]) -> int:
+        """Suma los impactos de una corrida y los vuelca atribuidos a su empresa. Devuelve hits volcados."""
+        now = time.time()
+        with self._lock:
+            for rule_type, idx in hits:
+                self._count(rule_type, idx, now)
+            return self.flush(company_id)
+
+    def flush(self, company_id: Optional[str] = None) -> int:
+        """Vuelca los contadores pendientes en las reglas del perfil y en el sidecar. Devuelve hits volcados."""
+        with self._lock:
+            if not self.pending:
+                return 0
+            company_id = company_id or self.company_id
+            batch = []
+            for rule_type, counts in self.counts.items():
+                rules = self.profile.profile_data.get(rule_type, [])
+                last_hits = self.last_hit[rule_type]
+                for idx, count in enumerate(counts):
+                    if not count or idx >= len(rules):
+                        continue
+                    rule = rules[idx]
+                    last_hit_iso = datetime.fromtimestamp(last_hits[idx]).isoformat()
+                    rule["hit_count"] = (rule.get("hit_count") or 0) + count
+                    if not rule.get("last_hit") or rule["last_hit"] < last_hit_iso:
+                        rule["last_hit"] = last_hit_iso
+                    batch.append((rule_type, rule.get("pattern", ""), count, last_hit_iso))
+            flushed = self.pending
+            self.reset()
+
+        if company_id:
+            store = get_rule_hit_store()
+            if store:
+                try:
+                    store.record(company_id, batch)
+                except sqlite3.Error as e:
+                    print(f"WARN No se pudieron persistir hits de reglas: {e}")
+        return flushed
+
+# =============================================================================
+# PERFILES VERSIONADOS (Almacén server-side + ETag V9.0)
+# =============================================================================
+
+def profile_etag(profile: Dict) -> str:
+    """ETag de contenido: SHA-256 del JSON canónico del perfil"""
+    canonical = json.dumps(profile, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+class ProfileStore:
+    """
+    Perfiles por (company_id, version) en SQLite; el documento completo solo viaja ante un miss.
+    Las versiones son inmutables y se conservan como máximo max_versions_per_company por empresa.
+    """
+
+    def __init__(self, db_path: str = SIDECAR_DB_PATH, max_versions_per_company: int = 50):
+        self.db_path = db_path
+        self.max_versions_per_company = max_versions_per_company
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS mahoraga_profiles (
+                company_id TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                etag TEXT NOT NULL,
+                profile_json TEXT NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (company_id, version)
+            );
+            CREATE INDEX IF NOT EXISTS idx_profiles_etag ON mahoraga_profiles(company_id, etag);"""
+        )
+        self._conn.commit()
+
+    def put(self, company_id: str, profile: Dict, version: Optional[int] = None) -> Tuple[int, str]:
+        """
+        Guarda una copia serializada del perfil y devuelve (version, etag). Sin versión explícita (o si la versión
+        pedida ya existe con otro contenido) reutiliza la última si el contenido no cambió o asigna la siguiente.
+        """
+        etag = profile_etag(profile)
+        company_id = str(company_id)
+        with self._lock:
+            if version is not None:
+                existing = self._conn.execute(
+                    "SELECT etag FROM mahoraga_profiles WHERE company_id = ? AND version = ?",
+                    (company_id, version)
+                ).fetchone()
+                if existing and existing[0] == etag:
+                    return version, etag
+                if existing:
+                    version = None  # versión ocupada por otro contenido: nunca se sobrescribe
+            if version is None:
+                latest = self._conn.execute(
+                    "SELECT version, etag FROM mahoraga_profiles WHERE company_id = ? ORDER BY version DESC LIMIT 1",
+                    (company_id,)
+                ).fetchone()
+                if latest and latest[1] == etag:
+                    return latest[0], etag
+                version = (latest[0] + 1) if latest else 1
+            self._conn.execute(
+                "INSERT INTO mahoraga_profiles (company_id, version, etag, profile_json) VALUES (?, ?, ?, ?)",
+                (company_id, version, etag, json.dumps(profile, ensure_ascii=False, default=str))
+            )
+            self._conn.execute(
+                """DELETE FROM mahoraga_profiles WHERE company_id = ? AND version <= (
+                       SELECT version FROM mahoraga_profiles WHERE company_id = ?
+                       ORDER BY version DESC LIMIT 1 OFFSET ?)""",
+                (company_id, company_id, self.max_versions_per_company)
+            )
+            self._conn.commit()
+        return version, etag
+
+    def get(self, company_id: str, version: Optional[int] = None, etag: Optional[str] = None) -> Optional[Tuple[int, str, Dict]]:
+        """Busca por versión, por ETag o la última versión; devuelve (version, etag, copia nueva del perfil) o None"""
+        query = "SELECT version, etag, profile_json FROM mahoraga_profiles WHERE company_id = ?"
+        args: List[Any] = [str(company_id)]
+        if version is not None:
+            query += " AND version = ?"
+            args.append(version)
+        if etag:
+            query += " AND etag = ?"
+            args.append(etag.strip('"'))
+        query += " ORDER BY version DESC LIMIT 1"
+        with self._lock:
+            row = self._conn.execute(query, args).fetchone()
+        if not row:
+            return None
+        return row[0], row[1], json.loads(row[2])
+
+    def latest(self, company_id: str) -> Optional[Tuple[int, str]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version, etag FROM mahoraga_profiles WHERE company_id = ? ORDER BY version DESC LIMIT 1",
+                (str(company_id),)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+_profile_store: Optional[ProfileStore] = None
+
+def get_profile_store() -> ProfileStore:
+    """Singleton perezoso; si el disco no es escribible (serverless) el almacén vive en memoria"""
+    global _profile_store
+    if _profile_store is None:
+        max_versions = int(os.getenv("MAHORAGA_PROFILE_VERSIONS_MAX", "50"))
+        try:
+            _profile_store = ProfileStore(max_versions_per_company=max_versions)
+        except sqlite3.Error as e:
+            print(f"WARN ProfileStore en memoria ({SIDECAR_DB_PATH} no disponible): {e}")
+            _profile_store = ProfileStore(":memory:", max_versions_per_company=max_versions)
+    return _profile_store
+
+def resolve_request_profile(company_id: Optional[str], profile_schema: Optional[Dict],
+                            profile_version: Optional[int] = None,
+                            profile_etag_value: Optional[str] = None) -> Tuple[Optional[Dict], Optional[int], Optional[str]]:
+    """
+    Resuelve el perfil de una petición: si viene completo se almacena (y se versiona);
+    si solo viene versión/ETag se lee del almacén. Un miss responde 412 para que el llamador reenvíe el documento.
+    """
+    if profile_schema:
+        if not company_id:
+            return profile_schema, None, profile_etag(profile_schema)
+        version, etag = get_profile_store().put(company_id, profile_schema, profile_version)
+        return profile_schema, version, etag
+    if profile_version is None and not profile_etag_value:
+        return None, None, None
+    if not company_id:
+        raise HTTPException(status_code=400, detail="company_id es requerido para resolver profile_version/profile_etag")
+    stored = get_profile_store().get(company_id, profile_version, profile_etag_value)
+    if not stored:
+        raise HTTPException(status_code=412, detail={
+            "error": "profile_miss",
+            "message": "Perfil no disponible en el motor: reenviar profile_schema completo",
+            "company_id": company_id,
+            "profile_version": profile_version,
+            "profile_etag": profile_etag_value
+        })
+    version, etag, profile = stored
+    return profile, version, etag
+
+class AdaptationEventLog:
+    """
+    Registro append-only y acotado de eventos de adaptación (espejo de mahoraga_adaptation_events).
+    Indexado por empresa, cuenta y fecha; conserva como máximo max_events_per_company por empresa.
+    """
+
+    COLUMNS = ("id", "company_id", "user", "origin_trans", "account_code", "account_name",
+               "action", "error_reason_tag", "user_comment", "event_data", "reverted", "timestamp")
+
+    def __init__(self, db_path: str = SIDECAR_DB_PATH, max_events_per_company: int = 10000):
+        self.db_path = db_path
+        self.max_events_per_company = max_events_per_company
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS mahoraga_adaptation_events (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                id TEXT NOT NULL UNIQUE,
+                company_id TEXT NOT NULL,
+                user TEXT DEFAULT 'Anonymous',
+                origin_trans TEXT,
+                account_code TEXT,
+                account_name TEXT,
+                action TEXT,
+                error_reason_tag TEXT,
+                user_comment TEXT,
+                event_data TEXT,
+                reverted INTEGER DEFAULT 0,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE INDEX IF NOT EXISTS idx_adaptation_company ON mahoraga_adaptation_events(company_id, seq);
+            CREATE INDEX IF NOT EXISTS idx_adaptation_timestamp ON mahoraga_adaptation_events(company_id, timestamp);
+            CREATE INDEX IF NOT EXISTS idx_adaptation_account ON mahoraga_adaptation_events(company_id, account_code);"""
+        )
+        self._conn.commit()
+
+    @property
+    def durable(self) -> bool:
+        """False si el registro vive en memoria (disco de solo lectura / serverless)"""
+        return self.db_path != ":memory:"
+
+    def append(self, company_id: str, events: List[Dict]) -> int:
+        """Agrega eventos (ignora ids repetidos) y recorta los más antiguos por encima del límite"""
+        rows = [(
+            event.get("id") or f"EVT-{datetime.now().strftime('%Y%m%d%H%M%S%f')}",
+            str(company_id),
+            event.get("user") or "Anonymous",
+            event.get("origin_trans"),
+            event.get("account_code"),
+            event.get("account_name"),
+            event.get("action"),
+            event.get("error_reason_tag"),
+            event.get("user_comment"),
+            json.dumps(event, ensure_ascii=False, default=str),
+            int(bool(event.get("reverted", False))),
+            event.get("timestamp") or datetime.now().isoformat()
+        ) for event in events]
+        if not rows:
+            return 0
+        with self._lock:
+            cursor = self._conn.executemany(
+                f"INSERT OR IGNORE INTO mahoraga_adaptation_events ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                rows
+            )
+            inserted = cursor.rowcount
+            self._conn.execute(
+                """DELETE FROM mahoraga_adaptation_events WHERE company_id = ? AND seq <= (
+                       SELECT seq FROM mahoraga_adaptation_events WHERE company_id = ?
+                       ORDER BY seq DESC LIMIT 1 OFFSET ?)""",
+                (str(company_id), str(company_id), self.max_events_per_company)
+            )
+            self._conn.commit()
+        return inserted
+
+    def query(self, company_id: str, account_code: Optional[str] = None, since: Optional[str] = None,
+              until: Optional[str] = None, limit: int = 50, cursor: Optional[int] = None) -> Tuple[List[Dict], Optional[int]]:
+        """Página de eventos (más recientes primero); devuelve (eventos, next_cursor)"""
+        query = "SELECT seq, event_data, reverted FROM mahoraga_adaptation_events WHERE company_id = ?"
+        args: List[Any] = [str(company_id)]
+        if account_code:
+            query += " AND account_code = ?"
+            args.append(account_code)
+        if since:
+            query += " AND timestamp >= ?"
+            args.append(since)
+        if until:
+            query += " AND timestamp <= ?"
+            args.append(until)
+        if cursor:
+            query += " AND seq < ?"
+            args.append(cursor)
+        query += " ORDER BY seq DESC LIMIT ?"
+        args.append(limit + 1)
+        with self._lock:
+            rows = self._conn.execute(query, args).fetchall()
+        page = rows[:limit]
+        events = [{**json.loads(row[1]), "reverted": bool(row[2])} for row in page]
+        next_cursor = page[-1][0] if len(rows) > limit else None
+        return events, next_cursor
+
+_event_log: Optional[AdaptationEventLog] = None
+
+def get_event_log() -> AdaptationEventLog:
+    """Singleton perezoso del registro de eventos (en memoria si el disco no es escribible)"""
+    global _event_log
+    if _event_log is None:
+        max_events = int(os.getenv("MAHORAGA_EVENT_LOG_MAX", "10000"))
+        try:
+            _event_log = AdaptationEventLog(max_events_per_company=max_events)
+        except sqlite3.Error as e:
+            print(f"WARN AdaptationEventLog en memoria ({SIDECAR_DB_PATH} no disponible): {e}")
+            _event_log = AdaptationEventLog(":memory:", max_events_per_company=max_events)
+    return _event_log
+
+# Motores compilados por (company_id, etag): evita reconstruir el perfil en cada llamada
+ENGINE_CACHE_SIZE = int(os.getenv("AI_ENGINE_CACHE_SIZE", "32"))
+_engine_cache: "OrderedDict[Tuple[str, str, str], Any]" = OrderedDict()
+_engine_cache_lock = threading.Lock()
+
+def engine_for_profile(company_id: Optional[str], profile: Dict, etag: Optional[str] = None, engine_cls: Any = None) -> Any:
+    """Motor (LRU) para un perfil dinámico; engine_cls por defecto ARSDSPyEngine"""
+    engine_cls = engine_cls or ARSDSPyEngine
+    key = (engine_cls.__name__, str(company_id), etag or profile_etag(profile))
+    with _engine_cache_lock:
+        cached = _engine_cache.get(key)
+        if cached is not None:
+            _engine_cache.move_to_end(key)
+            return cached
+    # El motor vuelca hit counters en sus reglas: trabaja sobre su propia copia, no sobre el documento del ETag
+    built = engine_cls(copy.deepcopy(profile))
+    with _engine_cache_lock:
+        _engine_cache[key] = built
+        while len(_engine_cache) > ENGINE_CACHE_SIZE:
+            _engine_cache.popitem(last=False)
+    return built
+
+# =============================================================================
+# WARM-UP DE PERFILES (Precompilación V9.0)
+# =============================================================================
+
+# Base de datos contable de Node (tabla company_adjustment_profiles)
+ACCOUNTING_DB_PATH = os.getenv(
+    "ACCOUNTING_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "web-app", "server", "db", "accounting.db")
+)
+
+def load_db_profiles(db_path: str = ACCOUNTING_DB_PATH, company_ids: Optional[List[str]] = None) -> List[Dict]:
+    """Lee (company_id, profile_json, version) de company_adjustment_profiles en modo solo lectura"""
+    if not os.path.exists(db_path):
+        print(f"WARN warm-up: no existe {db_path}")
+        return []
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("SELECT company_id, profile_json, version FROM company_adjustment_profiles").fetchall()
+    finally:
+        conn.close()
+    wanted = {str(c) for c in company_ids} if company_ids else None
+    entries = []
+    for company_id, profile_json, version in rows:
+        if wanted is not None and str(company_id) not in wanted:
+            continue
+        try:
+            entries.append({"company_id": str(company_id), "profile_schema": json.loads(profile_json), "profile_version": version})
+        except ValueError as e:
+            print(f"WARN warm-up: perfil inválido para empresa {company_id}: {e}")
+    return entries
+
+def warm_profiles(entries: List[Dict], measure_memory: bool = True) -> Dict[str, Any]:
+    """
+    Precompila los motores de cada perfil (reglas SCL, catálogo de activos) en la caché LRU
+    y resuelve los módulos perezosos, antes de que llegue tráfico.
+    """
+    started = time.perf_counter()
+    for module in (np, httpx):
+        module._resolve()
+
+    started_tracing = measure_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    results = []
+    try:
+        for entry in entries:
+            company_id = str(entry["company_id"])
+            t0 = time.perf_counter()
+            mem0 = tracemalloc.get_traced_memory()[0] if measure_memory else 0
+            try:
+                profile, version, etag = resolve_request_profile(company_id, entry["profile_schema"], entry.get("profile_version"))
+                key = (ARSDSPyEngine.__name__, company_id, etag)
+                already_cached = key in _engine_cache
+                warmed = engine_for_profile(company_id, profile, etag)
+            except Exception as e:
+                # Un perfil dañado no debe impedir el warm-up del resto
+                results.append({"company_id": company_id, "error": str(e)})
+                continue
+            results.append({
+                "company_id": company_id,
+                "profile_version": version,
+                "profile_etag": etag,
+                "already_cached": already_cached,
+                "compile_ms": round((time.perf_counter() - t0) * 1000, 3),
+                "memory_bytes": (tracemalloc.get_traced_memory()[0] - mem0) if measure_memory else None,
+                "scl_matchers": sum(len(m) for m in warmed.profile.scl_matchers.values()),
+                "asset_matchers": len(warmed.profile.asset_matchers)
+            })
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+
+    warnings = []
+    if len(results) > ENGINE_CACHE_SIZE:
+        warnings.append(f"{len(results)} perfiles exceden AI_ENGINE_CACHE_SIZE={ENGINE_CACHE_SIZE}: los primeros fueron desalojados")
+    return {
+        "warmed": sum(1 for r in results if "error" not in r),
+        "failed": sum(1 for r in results if "error" in r),
+        "total_ms": round((time.perf_counter() - started) * 1000, 3),
+        "engine_cache_size": len(_engine_cache),
+        "profiles": results,
+        "warnings": warnings
+    }
+
+# =============================================================================
+# MÉTRICAS Y SPANS DE ETAPAS (Prometheus /metrics V9.0)
+# =============================================================================
+
+class MetricsRegistry:
+    """Contadores e histogramas en memoria del proceso, exportados en formato de texto Prometheus"""
+
+    DEFAULT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}  # nombre -> (tipo, ayuda)
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], List[Any]] = {}
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+
+    def describe(self, name: str, kind: str, help_text: str, buckets: Optional[Tuple[float, ...]] = None):
+        self._help[name] = (kind, help_text)
+        if kind == "histogram":
+            self._buckets[name] = buckets or self.DEFAULT_BUCKETS
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        buckets = self._buckets.get(name, self.DEFAULT_BUCKETS)
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            state = self._histograms.get(key)
+            if state is None:
+                state = [[0] * len(buckets), 0.0, 0]  # [conteo por bucket, suma, total]
+                self._histograms[key] = state
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    @staticmethod
+    def _labels(pairs, extra: Optional[Tuple[str, str]] = None) -> str:
+        items = list(pairs) + ([extra] if extra else [])
+        if not items:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {k: [list(v[0]), v[1], v[2]] for k, v in self._histograms.items()}
+        for name, (kind, help_text) in sorted(self._help.items()):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "counter":
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{self._labels(labels)} {value:g}")
+            else:
+                buckets = self._buckets[name]
+                for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, bucket_count in zip(buckets, counts):
+                        lines.append(f"{name}_bucket{self._labels(labels, ('le', f'{bound:g}'))} {bucket_count}")
+                    lines.append(f"{name}_bucket{self._labels(labels, ('le', '+Inf'))} {count}")
+                    lines.append(f"{name}_sum{self._labels(labels)} {total:.6f}")
+                    lines.append(f"{name}_count{self._labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+metrics.describe("ai_engine_stage_duration_seconds", "histogram", "Tiempo acumulado por etapa del pipeline en cada petición")
+metrics.describe("ai_engine_stage_calls_total", "counter", "Invocaciones por etapa del pipeline")
+metrics.describe("ai_engine_requests_total", "counter", "Peticiones de generación procesadas por el motor")
+metrics.describe("ai_result_cache_requests_total", "counter", "Consultas a la caché de resultados por desenlace")
+metrics.describe("ai_result_cache_invalidations_total", "counter", "Invalidaciones de la caché de resultados por empresa")
+metrics.describe("ai_singleflight_requests_total", "counter", "Peticiones de generación: líderes vs coalescidas en una computación en vuelo")
+
+class _Span:
+    __slots__ = ("spans", "stage", "t0")
+
+    def __init__(self, spans: "StageSpans", stage: str):
+        self.spans = spans
+        self.stage = stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.spans.add(self.stage, time.perf_counter() - self.t0)
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class StageSpans:
+    """
+    Acumulador por petición: etapa -> (segundos, llamadas).
+    Las etapas pueden anidarse (p.ej. classification también cuenta dentro de aitb/depreciation).
+    """
+    __slots__ = ("seconds", "calls")
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+
+    def add(self, stage: str, elapsed: float):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + elapsed
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+
+    def span(self, stage: str) -> _Span:
+        return _Span(self, stage)
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        return {stage: {"ms": round(seconds * 1000, 3), "calls": self.calls[stage]} for stage, seconds in self.seconds.items()}
+
+    def publish(self):
+        """Vuelca la petición a los histogramas del proceso"""
+        for stage, seconds in self.seconds.items():
+            metrics.observe("ai_engine_stage_duration_seconds", seconds, stage=stage)
+            metrics.inc("ai_engine_stage_calls_total", self.calls[stage], stage=stage)
+
+_current_spans: ContextVar[Optional[StageSpans]] = ContextVar("ai_stage_spans", default=None)
+
+def stage_span(stage: str):
+    """Span de la petición en curso; no-op si no hay ninguna activa"""
+    spans = _current_spans.get()
+    return spans.span(stage) if spans is not None else _NULL_SPAN
+
+def timed_json_response(result: BaseModel) -> JSONResponse:
+    """Serializa la respuesta midiendo la etapa response_serialization"""
+    t0 = time.perf_counter()
+    content = jsonable_encoder(result)
+    metrics.observe("ai_engine_stage_duration_seconds", time.perf_counter() - t0, stage="response_serialization")
+    metrics.inc("ai_engine_stage_calls_total", 1, stage="response_serialization")
+    return JSONResponse(content=content)
+
+# =============================================================================
+# LOGGING ESTRUCTURADO (Niveles + Correlation ID + Muestreo V9.0)
+# =============================================================================
+
+# MAHORAGA_LOG_LEVEL: DEBUG reactiva las trazas por cuenta/movimiento (antes print incondicional)
+# MAHORAGA_LOG_FORMAT: "text" o "json"
+# MAHORAGA_LOG_SAMPLE_RATE: fracción de eventos por movimiento (AoT) emitidos en DEBUG
+LOG_LEVEL = os.getenv("MAHORAGA_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("MAHORAGA_LOG_FORMAT", "text").lower()
+LOG_SAMPLE_RATE = float(os.getenv("MAHORAGA_LOG_SAMPLE_RATE", "0.01"))
+
+log = logging.getLogger("mahoraga.engine")
+
+_correlation_id: ContextVar[str] = ContextVar("ai_correlation_id", default="-")
+
+class _CorrelationFilter(logging.Filter):
+    """Sella el correlation_id en el hilo que emite (el listener no ve el contexto de la petición)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.correlation_id = _correlation_id.get()
+        return True
+
+class StructuredFormatter(logging.Formatter):
+    """Evento + campos: una línea JSON o texto clave=valor"""
+
+    def __init__(self, json_mode: bool = False):
+        super().__init__()
+        self.json_mode = json_mode
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = getattr(record, "fields", None) or {}
+        event = getattr(record, "event", None) or record.getMessage()
+        correlation_id = getattr(record, "correlation_id", "-")
+        if self.json_mode:
+            payload = {
+                "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+                "level": record.levelname,
+                "logger": record.name,
+                "event": event,
+                "correlation_id": correlation_id,
+                **fields
+            }
+            exc_text = self.exception_text(record)
+            if exc_text:
+                payload["exc"] = exc_text
+            return json.dumps(payload, ensure_ascii=False, default=str)
+        line = f"{self.formatTime(record, '%H:%M:%S')} {record.levelname:<5} [{correlation_id}] {event}"
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        exc_text = self.exception_text(record)
+        if exc_text:
+            line += "\n" + exc_text
+        return line
+
+    def exception_text(self, record: logging.LogRecord) -> str:
+        """Traza de la excepción: ya renderizada por _StructuredQueueHandler o desde exc_info"""
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        parts = [text for text in (record.exc_text, record.stack_info) if text]
+        return "\n".join(parts)
+
+class _StructuredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler.prepare fusiona la traza en msg y borra exc_info/exc_text, pero el formatter imprime `event`:
+    aquí la traza se renderiza en exc_text (texto, seguro de cruzar al hilo del listener) y se conserva.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        prepared = logging.makeLogRecord(record.__dict__)
+        prepared.msg = record.getMessage()
+        prepared.args = None
+        prepared.exc_info = None
+        return prepared
+
+_log_listener: Optional[logging.handlers.QueueListener] = None
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT) -> logging.Logger:
+    """
+    QueueHandler en el logger del motor y un QueueListener que escribe en stdout desde su propio hilo:
+    la petición solo encola el registro, nunca espera la E/S de la consola.
+    """
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+    for handler in list(log.handlers):
+        log.removeHandler(handler)
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(StructuredFormatter(json_mode=(fmt == "json")))
+    queue_handler = _StructuredQueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(_CorrelationFilter())
+    log.addHandler(queue_handler)
+    log.setLevel(getattr(logging, level, logging.INFO))
+    log.propagate = False
+
+    _log_listener = logging.handlers.QueueListener(queue_handler.queue, stream, respect_handler_level=True)
+    _log_listener.start()
+    return log
+
+def shutdown_logging():
+    """Vacía la cola pendiente (fin de proceso / CLI)"""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+def log_event(level: int, event: str, **fields):
+    """Evento estructurado; si el nivel está deshabilitado no se formatea nada"""
+    if log.isEnabledFor(level):
+        log.log(level, event, extra={"event": event, "fields": fields})
+
+def log_sampled() -> bool:
+    """Muestreo para eventos de alta frecuencia (un evento por movimiento del mayor)"""
+    return LOG_SAMPLE_RATE >= 1.0 or random.random() < LOG_SAMPLE_RATE
+
+class CorrelationIdMiddleware:
+    """Middleware ASGI: X-Request-ID entrante (o uno nuevo) en el contexto de logging y en la respuesta"""
+
+    HEADER = b"x-request-id"
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = next((value.decode("latin-1") for key, value in scope.get("headers", []) if key == self.HEADER), None)
+        request_id = request_id or uuid.uuid4().hex[:16]
+        token = _correlation_id.set(request_id)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(self.HEADER, request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _correlation_id.reset(token)
+
+configure_logging()
+atexit.register(shutdown_logging)
+app.add_middleware(CorrelationIdMiddleware)
+
+# =============================================================================
+# GRABACIÓN DE TRÁFICO (Record / Replay V9.0)
+# =============================================================================
+
+# Opt-in: sin MAHORAGA_RECORD_PATH no se graba nada. Las trazas (JSONL gzip) se reproducen con
+# scripts/replay_traces.py contra cualquier build del motor.
+RECORD_PATH = os.getenv("MAHORAGA_RECORD_PATH", "")
+RECORD_SAMPLE_RATE = float(os.getenv("MAHORAGA_RECORD_SAMPLE", "1.0"))
+# Sal del seudónimo de códigos; sin ella cada proceso usa una distinta (trazas no correlacionables)
+RECORD_SALT = os.getenv("MAHORAGA_RECORD_SALT", "")
+# Segundo opt-in: el perfil (reglas, patrones y procedencia de la empresa) solo se graba con
+# MAHORAGA_RECORD_PROFILES=1; si no, la traza marca profile_omitted y se reproduce con el perfil por defecto
+RECORD_PROFILES = os.getenv("MAHORAGA_RECORD_PROFILES", "").lower() in ("1", "true", "yes")
+
+class TrafficRecorder:
+    """
+    Graba peticiones seudonimizadas (no anónimas) de los endpoints de ajustes.
+    - company_id y códigos de cuenta -> seudónimos HMAC (se conserva el primer dígito: clase de cuenta);
+      en glosas y audit_trail solo se reemplazan los códigos como token completo
+    - nombres de cuenta, glosas, fechas, saldos y montos se graban TAL CUAL: la clasificación y los
+      cálculos dependen de ellos. Las trazas contienen datos contables reales y deben tratarse como tales
+    - el perfil solo se graba con record_profiles (MAHORAGA_RECORD_PROFILES=1), una vez por hash;
+      las peticiones lo referencian por profile_hash
+    - campos de autoría (user, user_comment, origin_trans) se eliminan del perfil
+    La anonimización y la escritura ocurren en un hilo aparte: la petición solo encola referencias.
+    """
+
+    SCRUB_KEYS = {"user", "user_comment", "origin_trans", "created_by"}
+
+    def __init__(self, path: str, sample_rate: float = 1.0, salt: str = "", record_profiles: bool = False):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.record_profiles = record_profiles
+        self._salt = (salt or uuid.uuid4().hex).encode("utf-8")
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._seen_profiles: set = set()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.recorded = 0
+        self.failed = 0
+
+    def _pseudonym(self, value: str, prefix: str = "") -> str:
+        digest = hmac.new(self._salt, value.encode("utf-8"), hashlib.sha256).hexdigest()[:10]
+        return f"{prefix}{digest}"
+
+    def _code(self, code: str, codes: Dict[str, str]) -> str:
+        if code not in codes:
+            codes[code] = self._pseudonym(code, f"{code[:1]}-") if code else code
+        return codes[code]
+
+    def _scrub(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            return {k: self._scrub(v) for k, v in value.items() if k not in self.SCRUB_KEYS}
+        if isinstance(value, list):
+            return [self._scrub(v) for v in value]
+        return value
+
+    def _anonymize_params(self, params: Dict[str, Any], codes: Dict[str, str]) -> Dict[str, Any]:
+        params = dict(params)
+        for key in ("ledger_trajectories", "acquisition_dates"):
+            if params.get(key):
+                params[key] = {self._code(code, codes): value for code, value in params[key].items()}
+        if params.get("company_id"):
+            params["company_id"] = self._pseudonym(params["company_id"], "co-")
+        return params
+
+    @staticmethod
+    def _code_pattern(codes: Dict[str, str]) -> Optional["re.Pattern"]:
+        """Alternativa de códigos como token completo ("1.1" no toca "1.1.01" ni "11"; sí "1.1." final de frase)"""
+        keys = sorted((code for code in codes if code), key=len, reverse=True)
+        if not keys:
+            return None
+        return re.compile(r"(?<![\w.\-])(" + "|".join(re.escape(k) for k in keys) + r")(?![\w\-]|\.\w)")
+
+    def _anonymize_text(self, text: str, codes: Dict[str, str], pattern: Optional["re.Pattern"] = None) -> str:
+        pattern = pattern or self._code_pattern(codes)
+        if not text or pattern is None:
+            return text
+        return pattern.sub(lambda m: codes[m.group(1)], text)
+
+    def anonymize(self, endpoint: str, body: Any) -> Tuple[Any, Optional[Dict]]:
+        """Cuerpo anonimizado y, aparte, el perfil (que se graba por hash)"""
+        codes: Dict[str, str] = {}
+        profile = None
+        if endpoint == "batch-validate":
+            transactions = []
+            for transaction in body:
+                for entry in transaction.get("entries", []):
+                    self._code(entry.get("accountId", ""), codes)
+            pattern = self._code_pattern(codes)
+            for transaction in body:
+                transactions.append({
+                    **transaction,
+                    "gloss": self._anonymize_text(transaction.get("gloss", ""), codes, pattern),
+                    "audit_trail": self._anonymize_text(transaction.get("audit_trail", ""), codes, pattern),
+                    "entries": [
+                        {**entry, "accountId": codes.get(entry.get("accountId", ""), entry.get("accountId", "")),
+                         "gloss": self._anonymize_text(entry.get("gloss", ""), codes, pattern)}
+                        for entry in transaction.get("entries", [])
+                    ]
+                })
+            return transactions, None
+
+        body = dict(body)
+        profile = body.pop("profile_schema", None)
+        if body.get("company_id"):
+            body["company_id"] = self._pseudonym(body["company_id"], "co-")
+        if "accounts" in body:
+            body["accounts"] = [{**a, "code": self._code(a["code"], codes)} for a in body["accounts"]]
+        if "account" in body:
+            body["account"] = {**body["account"], "code": self._code(body["account"]["code"], codes)}
+        for key in ("parameters", "params"):
+            if body.get(key):
+                body[key] = self._anonymize_params(body[key], codes)
+        return body, (self._scrub(profile) if profile and self.record_profiles else None)
+
+    @staticmethod
+    def summarize(payload: Any) -> Dict[str, Any]:
+        """Resumen independiente de los códigos (comparable con la reproducción anonimizada)"""
+        if isinstance(payload, list):
+            return {"items": len(payload)}
+        summary = {k: v for k, v in payload.items() if isinstance(v, (bool, int, float)) and not isinstance(v, Enum)}
+        if "proposedTransactions" in payload:
+            transactions = payload["proposedTransactions"]
+            summary["transactions"] = len(transactions)
+            summary["total_debit"] = round(sum(e["debit"] for t in transactions for e in t["entries"]), 2)
+        return summary
+
+    def capture(self, endpoint: str, body: Any, result: Any, started: float):
+        """Encola la petición/respuesta (objetos pydantic o dicts); el trabajo pesado es del hilo escritor"""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        duration_ms = (time.perf_counter() - started) * 1000
+        self._queue.put((endpoint, body, result, duration_ms, _correlation_id.get(), time.time()))
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._writer, name="traffic-recorder", daemon=True)
+                    self._thread.start()
+
+    def _record(self, endpoint: str, body: Any, result: Any, duration_ms: float, correlation_id: str, ts: float) -> List[str]:
+        lines = []
+        raw = jsonable_encoder(body)
+        uses_profile = isinstance(raw, dict) and bool(raw.get("profile_schema") or raw.get("profile_version") or raw.get("profile_etag"))
+        if uses_profile and self.record_profiles and not raw.get("profile_schema"):
+            # Perfil almacenado en el motor: se graba su contenido (el seudónimo de empresa no lo resolvería)
+            company_id = raw.get("company_id") or (raw.get("params") or {}).get("company_id")
+            stored = get_profile_store().get(company_id, raw.get("profile_version"), raw.get("profile_etag")) if company_id else None
+            if stored:
+                raw["profile_schema"] = stored[2]
+        if isinstance(raw, dict):
+            raw.pop("profile_version", None)
+            raw.pop("profile_etag", None)
+        body, profile = self.anonymize(endpoint, raw)
+        profile_hash = None
+        if profile:
+            profile_hash = profile_etag(profile)
+            if profile_hash not in self._seen_profiles:
+                self._seen_profiles.add(profile_hash)
+                lines.append(json.dumps({"kind": "profile", "profile_hash": profile_hash, "profile": profile}, ensure_ascii=False))
+        lines.append(json.dumps({
+            "kind": "request",
+            "ts": datetime.fromtimestamp(ts).isoformat(timespec="milliseconds"),
+            "endpoint": endpoint,
+            "correlation_id": correlation_id,
+            "duration_ms": round(duration_ms, 3),
+            "profile_hash": profile_hash,
+            "profile_omitted": uses_profile and profile_hash is None,
+            "body": body,
+            "response_summary": self.summarize(jsonable_encoder(result))
+        }, ensure_ascii=False))
+        return lines
+
+    def _writer(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 500:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            lines = []
+            for item in batch:
+                if item is None:
+                    continue
+                try:
+                    lines.extend(self._record(*item))
+                    self.recorded += 1
+                except Exception as e:
+                    self.failed += 1
+                    log_event(logging.WARNING, "recorder.error", error=str(e))
+            if lines:
+                try:
+                    # Modo append: cada lote es un miembro gzip; gzip.open los lee como un solo flujo
+                    with gzip.open(self.path, "at", encoding="utf-8") as f:
+                        f.write("\n".join(lines) + "\n")
+                except OSError as e:
+                    self.failed += len(lines)
+                    log_event(logging.WARNING, "recorder.write_error", path=self.path, error=str(e))
+            if stop:
+                return
+
+    def close(self):
+        """Vacía la cola pendiente (fin de proceso)"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=10)
+            self._thread = None
+
+traffic_recorder: Optional[TrafficRecorder] = TrafficRecorder(RECORD_PATH, RECORD_SAMPLE_RATE, RECORD_SALT, RECORD_PROFILES) if RECORD_PATH else None
+if traffic_recorder is not None:
+    atexit.register(traffic_recorder.close)
+
+def record_exchange(endpoint: str, body: Any, result: Any, started: float):
+    """Punto de grabación de los endpoints (no-op si la grabación está deshabilitada)"""
+    if traffic_recorder is not None:
+        traffic_recorder.capture(endpoint, body, result, started)
+
+# =============================================================================
+# CACHÉ DE RESULTADOS (direccionada por contenido V9.0)
+# =============================================================================
+
+# Corridas idénticas (mismas cuentas, parámetros, perfil y build del motor) devuelven el resultado guardado.
+# AI_RESULT_CACHE_SIZE=0 la deshabilita; AI_RESULT_CACHE_PERSIST=1 la respalda en el sidecar SQLite.
+RESULT_CACHE_SIZE = int(os.getenv("AI_RESULT_CACHE_SIZE", "64"))
+RESULT_CACHE_PERSIST = os.getenv("AI_RESULT_CACHE_PERSIST", "").lower() in ("1", "true", "yes")
+RESULT_CACHE_DISK_MAX = int(os.getenv("AI_RESULT_CACHE_DISK_MAX", "1000"))
+
+def _engine_build() -> str:
+    """Huella del código del motor: un despliegue nuevo no reutiliza resultados de otra build"""
+    try:
+        with open(os.path.abspath(__file__), "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()[:16]
+    except OSError:
+        return app.version
+
+ENGINE_BUILD = _engine_build()
+
+def request_digest(request: AdjustmentRequest, etag: Optional[str], scope: str) -> str:
+    """SHA-256 de (cuentas, parámetros, ETag del perfil, ámbito, build): idéntico => mismo resultado"""
+    payload = request.model_dump(mode="json", exclude={"profile_schema", "profile_version", "profile_etag"})
+    payload["profile_etag"] = etag
+    payload["engine"] = [scope, ENGINE_BUILD]
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class ResultCache:
+    """
+    LRU en memoria de respuestas serializadas (JSON) por clave de contenido, con respaldo SQLite opcional.
+    Cada entrada guarda también los impactos SCL de la corrida: un acierto los vuelve a contar (como la memo por cuenta).
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_SIZE, db_path: Optional[str] = None, disk_max: int = RESULT_CACHE_DISK_MAX):
+        self.max_entries = max_entries
+        self.disk_max = disk_max
+        self._entries: "OrderedDict[str, Tuple[str, str, List[Tuple[str, int]]]]" = OrderedDict()  # clave -> (company_id, json, hits)
+        self._lock = threading.Lock()
+        self._conn = None
+        if db_path:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.executescript(
+                """CREATE TABLE IF NOT EXISTS mahoraga_result_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    company_id TEXT NOT NULL,
+                    response_json TEXT NOT NULL,
+                    rule_hits_json TEXT NOT NULL DEFAULT '[]',
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                );
+                CREATE INDEX IF NOT EXISTS idx_result_cache_company ON mahoraga_result_cache(company_id);"""
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(mahoraga_result_cache)")}
+            if "rule_hits_json" not in columns:  # sidecar creado antes de guardar los impactos
+                self._conn.execute("ALTER TABLE mahoraga_result_cache ADD COLUMN rule_hits_json TEXT NOT NULL DEFAULT '[]'")
+            self._conn.commit()
+
+    @staticmethod
+    def key(request: AdjustmentRequest, etag: Optional[str], engine_name: str) -> str:
+        return request_digest(request, etag, engine_name)
+
+    def get(self, key: str) -> Optional[Tuple[AdjustmentResponse, List[Tuple[str, int]]]]:
+        """(respuesta, impactos SCL de la corrida original) o None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            elif self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT company_id, response_json, rule_hits_json FROM mahoraga_result_cache WHERE cache_key = ?", (key,)
+                ).fetchone()
+                if row:
+                    entry = (row[0], row[1], [(rule_type, idx) for rule_type, idx in json.loads(row[2])])
+                    self._remember(key, entry)
+        if entry is None:
+            metrics.inc("ai_result_cache_requests_total", outcome="miss")
+            return None
+        metrics.inc("ai_result_cache_requests_total", outcome="hit")
+        # Cada acierto reconstruye un objeto nuevo: los endpoints agregan campos a processing_stats
+        return AdjustmentResponse.model_validate_json(entry[1]), entry[2]
+
+    def _remember(self, key: str, entry: Tuple[str, str, List[Tuple[str, int]]]):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def put(self, key: str, company_id: str, result: AdjustmentResponse, rule_hits: Optional[List[Tuple[str, int]]] = None):
+        entry = (str(company_id), result.model_dump_json(), list(rule_hits or []))
+        with self._lock:
+            self._remember(key, entry)
+            if self._conn is not None:
+                try:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO mahoraga_result_cache (cache_key, company_id, response_json, rule_hits_json) VALUES (?, ?, ?, ?)",
+                        (key, entry[0], entry[1], json.dumps(entry[2]))
+                    )
+                    self._conn.execute(
+                        """DELETE FROM mahoraga_result_cache WHERE rowid <= (
+                               SELECT rowid FROM mahoraga_result_cache ORDER BY rowid DESC LIMIT 1 OFFSET ?)""",
+                        (self.disk_max,)
+                    )
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    log_event(logging.WARNING, "result_cache.persist_error", error=str(e))
+
+    def invalidate(self, company_id: str) -> int:
+        """Descarta los resultados de una empresa (p.ej. cuando el feedback cambia su perfil)"""
+        company_id = str(company_id)
+        with self._lock:
+            stale = [k for k, entry in self._entries.items() if entry[0] == company_id]
+            for k in stale:
+                del self._entries[k]
+            removed = len(stale)
+            if self._conn is not None:
+                try:
+                    removed = max(removed, self._conn.execute(
+                        "DELETE FROM mahoraga_result_cache WHERE company_id = ?", (company_id,)).rowcount)
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    log_event(logging.WARNING, "result_cache.invalidate_error", error=str(e))
+        metrics.inc("ai_result_cache_invalidations_total")
+        return removed
+
+_result_cache: Optional[ResultCache] = None
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Singleton perezoso; None si está deshabilitada. Sin disco escribible queda solo en memoria."""
+    global _result_cache
+    if _result_cache is None and RESULT_CACHE_SIZE > 0:
+        try:
+            _result_cache = ResultCache(db_path=SIDECAR_DB_PATH if RESULT_CACHE_PERSIST else None)
+        except sqlite3.Error as e:
+            print(f"WARN ResultCache en memoria ({SIDECAR_DB_PATH} no disponible): {e}")
+            _result_cache = ResultCache()
+    return _result_cache
+
+# =============================================================================
+# MEMOIZACIÓN POR CUENTA (Recálculo incremental V9.0)
+# =============================================================================
+
+# Ajustes propuestos por cuenta, persistidos por empresa entre corridas: al regenerar tras corregir un
+# asiento solo se recalculan las cuentas cuyo saldo, trayectoria o contexto cambió.
+# Opt-in (AI_ACCOUNT_MEMO=1): la primera corrida de cada empresa hashea el catálogo y escribe todas sus cuentas.
+ACCOUNT_MEMO_ENABLED = os.getenv("AI_ACCOUNT_MEMO", "0").lower() in ("1", "true", "yes")
+ACCOUNT_MEMO_MAX = int(os.getenv("AI_ACCOUNT_MEMO_MAX", "50000"))
+
+def _digest(value: Any) -> str:
+    canonical = json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class AccountMemoStore:
+    """(company_id, memo_key) -> ajustes pre-ARS de la cuenta, auditorías e impactos de reglas (JSON)"""
+
+    def __init__(self, db_path: str = SIDECAR_DB_PATH, max_entries_per_company: int = ACCOUNT_MEMO_MAX):
+        self.db_path = db_path
+        self.max_entries_per_company = max_entries_per_company
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS mahoraga_account_memo (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                company_id TEXT NOT NULL,
+                memo_key TEXT NOT NULL,
+                payload_json TEXT NOT NULL,
+                UNIQUE (company_id, memo_key)
+            );"""
+        )
+        self._conn.commit()
+
+    def load(self, company_id: str, keys: List[str]) -> Dict[str, Dict]:
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT memo_key, payload_json FROM mahoraga_account_memo WHERE company_id = ? AND memo_key IN ({', '.join('?' * len(chunk))})",
+                    [str(company_id)] + chunk
+                ).fetchall()
+                found.update((key, json.loads(payload)) for key, payload in rows)
+        return found
+
+    def save(self, company_id: str, entries: Dict[str, Dict]):
+        """Guarda las cuentas recalculadas y recorta las más antiguas por encima del límite"""
+        if not entries:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO mahoraga_account_memo (company_id, memo_key, payload_json) VALUES (?, ?, ?)",
+                [(str(company_id), key, json.dumps(entry, ensure_ascii=False)) for key, entry in entries.items()]
+            )
+            self._conn.execute(
+                """DELETE FROM mahoraga_account_memo WHERE company_id = ? AND seq <= (
+                       SELECT seq FROM mahoraga_account_memo WHERE company_id = ?
+                       ORDER BY seq DESC LIMIT 1 OFFSET ?)""",
+                (str(company_id), str(company_id), self.max_entries_per_company)
+            )
+            self._conn.commit()
+
+    def invalidate(self, company_id: str) -> int:
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM mahoraga_account_memo WHERE company_id = ?", (str(company_id),)).rowcount
+            self._conn.commit()
+        return removed
+
+_account_memo_store: Optional[AccountMemoStore] = None
+
+def get_account_memo_store() -> Optional[AccountMemoStore]:
+    """Singleton perezoso; None si está deshabilitada. Sin disco escribible la memoización vive en memoria."""
+    global _account_memo_store
+    if _account_memo_store is None and ACCOUNT_MEMO_ENABLED:
+        try:
+            _account_memo_store = AccountMemoStore()
+        except sqlite3.Error as e:
+            print(f"WARN AccountMemoStore en memoria ({SIDECAR_DB_PATH} no disponible): {e}")
+            _account_memo_store = AccountMemoStore(":memory:")
+    return _account_memo_store
+
+class AccountMemo:
+    """
+    Vista de la memoización para una corrida. La clave de cada cuenta combina código, nombre, tipo,
+    saldo, fecha de adquisición y digest de su trayectoria con un digest de contexto de la corrida:
+    parámetros globales (UFV, método, cierre, caché UFV), perfil, clase y build del motor, y el
+    catálogo de cuentas (las contrapartidas se buscan en todo el plan).
+    """
+
+    def __init__(self, store: AccountMemoStore, engine: Any, request: AdjustmentRequest):
+        self.store = store
+        self.company_id = request.company_id
+        self.params = request.parameters
+        self.context = _digest({
+            "parameters": self.params.model_dump(mode="json", exclude={"ledger_trajectories", "acquisition_dates", "company_id", "compute_backend"}),
+            "profile": engine.profile_signature,
+            "engine": [type(engine).__name__, ENGINE_BUILD],
+            "catalog": [[a.code, a.name, a.type] for a in request.accounts]
+        })
+        self.keys: Dict[int, str] = {}
+        self.cached: Dict[str, Dict] = {}
+        self.pending: Dict[str, Dict] = {}
+        self.reused = 0
+        self.recomputed = 0
+
+    def key(self, account: Account) -> str:
+        trajectory = None
+        if self.params.use_trajectory_mode:
+            trajectory = [m if isinstance(m, dict) else m.model_dump(mode="json")
+                          for m in (self.params.ledger_trajectories or {}).get(account.code, [])]
+        return _digest([self.context, account.code, account.name, account.type, account.balance,
+                        (self.params.acquisition_dates or {}).get(account.code), trajectory])
+
+    def prefetch(self, accounts: List[Account]):
+        for i, account in enumerate(accounts):
+            if account.balance > 0:
+                self.keys[i] = self.key(account)
+        self.cached = self.store.load(self.company_id, list(set(self.keys.values())))
+
+    def lookup(self, index: int) -> Optional[Dict]:
+        return self.cached.get(self.keys[index])
+
+    def remember(self, index: int, adjustments: List[Tuple["ProposedTransaction", float, str, str]], hits: List[Tuple[str, int]]):
+        entry = {
+            "adjustments": [[transaction.model_dump(mode="json"), confidence, stat, audit]
+                            for transaction, confidence, stat, audit in adjustments],
+            "hits": [list(hit) for hit in hits]
+        }
+        self.pending[self.keys[index]] = entry
+        self.cached[self.keys[index]] = entry
+
+    def flush(self):
+        try:
+            self.store.save(self.company_id, self.pending)
+        except sqlite3.Error as e:
+            log_event(logging.WARNING, "account_memo.persist_error", error=str(e))
+        self.pending = {}
+
+# =============================================================================
+# COALESCENCIA SINGLE-FLIGHT (Peticiones concurrentes idénticas V9.0)
+# =============================================================================
+
+SINGLE_FLIGHT_ENABLED = os.getenv("AI_SINGLE_FLIGHT", "1").lower() in ("1", "true", "yes")
+
+class SingleFlight:
+    """
+    Una sola computación en vuelo por digest de petición: los duplicados concurrentes esperan la misma
+    tarea y reciben una copia de su resultado. Vive en el event loop (por proceso/worker de uvicorn).
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, "asyncio.Future"] = {}
+
+    async def run(self, key: str, factory, endpoint: str) -> Any:
+        task = self._inflight.get(key) if SINGLE_FLIGHT_ENABLED else None
+        if task is not None:
+            metrics.inc("ai_singleflight_requests_total", endpoint=endpoint, outcome="coalesced")
+            log_event(logging.INFO, "singleflight.coalesced", endpoint=endpoint)
+            # shield: si este llamador se desconecta, la computación compartida sigue para los demás
+            result = await asyncio.shield(task)
+            shared = result.model_copy(deep=True)
+            shared.processing_stats["coalesced"] = True
+            return shared
+        metrics.inc("ai_singleflight_requests_total", endpoint=endpoint, outcome="leader")
+        task = asyncio.ensure_future(factory())
+        if SINGLE_FLIGHT_ENABLED:
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+generation_flights = SingleFlight()
+
+# =============================================================================
+# BACKENDS DE CÓMPUTO PoT (V9.0)
+# =============================================================================
+
+COMPUTE_BACKEND = os.getenv("AI_COMPUTE_BACKEND", "scalar").lower()
+
+class ComputeBackend:
+    """
+    Fórmulas PoT/AoT (coeficiente corrector, AITB, depreciación, provisión y átomos de trayectoria)
+    separadas de la clasificación semántica. La clase base es la implementación escalar de referencia;
+    cada backend sobrescribe solo lo que acelera y debe reproducir bit a bit el resultado escalar:
+    scripts/diff_engines.py --candidate-env AI_COMPUTE_BACKEND=<nombre>.
+    """
+    name = "base"
+
+    def correction_coefficient(self, ufv_initial: float, ufv_final: float) -> float:
+        return ufv_final / ufv_initial
+
+    def aitb_amount(self, balance: float, cc: float) -> float:
+        return balance * (cc - 1)
+
+    def depreciation_amount(self, balance: float, annual_rate: float, factor: float) -> float:
+        return balance * annual_rate * factor
+
+    def provision_amount(self, balance: float, rate: float) -> float:
+        return balance * rate
+
+    def aitb_amounts(self, balances: Any, cc: float) -> Any:
+        """AITB por lote (saldo x (CC-1)) para análisis masivos"""
+        return [balance * (cc - 1) for balance in balances]
+
+    def trajectory_atoms(self, net_amounts: List[float], ufvs: List[float], ufv_final: float) -> List[Tuple[int, float, float]]:
+        """(índice, CC, ajuste parcial redondeado) de los movimientos con ajuste significativo"""
+        atoms = []
+        for i, (net_amount, ufv_at_date) in enumerate(zip(net_amounts, ufvs)):
+            cc = ufv_final / ufv_at_date
+            if abs(net_amount) > 0.01 and cc > 1.0:
+                atoms.append((i, cc, bankersRound(net_amount * (cc - 1), 2)))
+        return atoms
+
+class ScalarComputeBackend(ComputeBackend):
+    """Referencia en Python puro, movimiento a movimiento (las fórmulas de la clase base)"""
+    name = "scalar"
+
+class NumpyComputeBackend(ComputeBackend):
+    """Lote NumPy: CC y ajustes brutos vectorizados (mismas operaciones IEEE que el escalar)"""
+    name = "numpy"
+
+    def aitb_amounts(self, balances: Any, cc: float) -> Any:
+        return np.asarray(balances, dtype=float) * (cc - 1)
+
+    def trajectory_atoms(self, net_amounts: List[float], ufvs: List[float], ufv_final: float) -> List[Tuple[int, float, float]]:
+        net = np.asarray(net_amounts, dtype=float)
+        cc = ufv_final / np.asarray(ufvs, dtype=float)
+        raw = net * (cc - 1)
+        # El redondeo bancario decimal se mantiene por átomo para conservar el resultado exacto
+        return [(int(i), float(cc[i]), bankersRound(float(raw[i]), 2))
+                for i in np.flatnonzero((np.abs(net) > 0.01) & (cc > 1.0))]
+
+_compute_backends: Dict[str, ComputeBackend] = {}
+
+def register_compute_backend(backend: ComputeBackend) -> ComputeBackend:
+    """Punto de extensión para kernels adicionales (p.ej. un worker nativo)"""
+    _compute_backends[backend.name] = backend
+    return backend
+
+register_compute_backend(ScalarComputeBackend())
+register_compute_backend(NumpyComputeBackend())
+
+def resolve_compute_backend(name: Optional[str] = None) -> ComputeBackend:
+    """
+    Backend de la petición o, por defecto, el configurado en AI_COMPUTE_BACKEND.
+    El nombre de la petición ya viene validado por AdjustmentParameters; aquí solo puede fallar
+    una variable de entorno mal configurada (error de despliegue, no de la petición).
+    """
+    key = (name or COMPUTE_BACKEND).lower()
+    backend = _compute_backends.get(key)
+    if backend is None:
+        raise ValueError(f"compute_backend desconocido: {key} (disponibles: {', '.join(sorted(_compute_backends))})")
+    return backend
+
+# =============================================================================
+# VALIDACIÓN POR LOTES VECTORIZADA (V9.0)
+# =============================================================================
+
+# Filas por línea NDJSON emitida en /batch-validate?stream=true
+BATCH_VALIDATE_STREAM_CHUNK = 1000
+
+def to_cents(amounts: List[float]) -> Any:
+    """Montos en Bs a centavos enteros (int64, redondeo al par más cercano)"""
+    return np.rint(np.asarray(amounts, dtype=float) * 100).astype(np.int64)
+
+class BatchValidation:
+    """
+    Validación de un lote de asientos sobre arreglos por línea en centavos exactos:
+    sumas Debe/Haber y presencia de ambos lados por asiento, y balance de comprobación por cuenta,
+    con reducciones agrupadas de NumPy (una sola carga de las líneas del lote).
+    """
+
+    def __init__(self, transactions: List[ProposedTransaction], confidence_threshold: float):
+        self.transactions = transactions
+        n = len(transactions)
+        counts = [len(t.entries) for t in transactions]
+        entries = [entry for t in transactions for entry in t.entries]
+        owner = np.repeat(np.arange(n), counts)
+        debit = to_cents([entry.debit for entry in entries])
+        credit = to_cents([entry.credit for entry in entries])
+
+        # Reducciones por asiento (int64 exacto)
+        debit_totals = np.zeros(n, dtype=np.int64)
+        credit_totals = np.zeros(n, dtype=np.int64)
+        np.add.at(debit_totals, owner, debit)
+        np.add.at(credit_totals, owner, credit)
+        has_debit = np.bincount(owner, weights=debit > 0, minlength=n) > 0
+        has_credit = np.bincount(owner, weights=credit > 0, minlength=n) > 0
+        difference = np.abs(debit_totals - credit_totals)
+        is_valid = (difference == 0) & has_debit & has_credit
+        confidence_valid = np.asarray([t.confidence for t in transactions], dtype=float) >= confidence_threshold
+
+        self.entries_count = counts
+        self.debit_totals = debit_totals.tolist()
+        self.credit_totals = credit_totals.tolist()
+        self.difference = difference.tolist()
+        self.is_valid = is_valid.tolist()
+        self.confidence_valid = confidence_valid.tolist()
+        self.valid_count = int(is_valid.sum())
+        self.confidence_valid_count = int(confidence_valid.sum())
+
+        # Balance de comprobación: cuentas en orden de primera aparición
+        account_index: Dict[str, int] = {}
+        account_names: List[str] = []
+        account_of_entry = np.empty(len(entries), dtype=np.int64)
+        for i, entry in enumerate(entries):
+            idx = account_index.get(entry.accountId)
+            if idx is None:
+                idx = account_index[entry.accountId] = len(account_names)
+                account_names.append(entry.accountName)
+            account_of_entry[i] = idx
+        account_debit = np.zeros(len(account_names), dtype=np.int64)
+        account_credit = np.zeros(len(account_names), dtype=np.int64)
+        np.add.at(account_debit, account_of_entry, debit)
+        np.add.at(account_credit, account_of_entry, credit)
+        self.account_ids = list(account_index)
+        self.account_names = account_names
+        self.account_debit = account_debit.tolist()
+        self.account_credit = account_credit.tolist()
+        self.batch_debit = int(debit.sum())
+        self.batch_credit = int(credit.sum())
+
+    def row(self, i: int, include_audit_trail: bool = True) -> Dict[str, Any]:
+        transaction = self.transactions[i]
+        confidence_valid = self.confidence_valid[i]
+        row = {
+            "index": i,
+            "gloss": transaction.gloss,
+            "adjustment_type": transaction.adjustment_type,
+            "is_valid": self.is_valid[i],
+            "confidence_valid": confidence_valid,
+            "total_debit": self.debit_totals[i] / 100,
+            "total_credit": self.credit_totals[i] / 100,
+            "difference": self.difference[i] / 100,
+            "entries_count": self.entries_count[i],
+            "review_needed": not confidence_valid
+        }
+        if include_audit_trail:
+            row["audit_trail"] = transaction.audit_trail
+        return row
+
+    def rows(self, invalid_only: bool = False, include_audit_trail: bool = True):
+        for i, valid in enumerate(self.is_valid):
+            if not (invalid_only and valid):
+                yield self.row(i, include_audit_trail)
+
+    def summary(self) -> Dict[str, Any]:
+        total = len(self.transactions)
+        return {
+            "total_transactions": total,
+            "valid_transactions": self.valid_count,
+            "invalid_transactions": total - self.valid_count,
+            "ars_stats": {
+                "high_confidence": self.confidence_valid_count,
+                "review_needed": total - self.confidence_valid_count
+            }
+        }
+
+    def trial_balance(self) -> Dict[str, Any]:
+        return {
+            "accounts": [
+                {"accountId": account_id, "accountName": name, "debit": debit / 100, "credit": credit / 100,
+                 "balance": (debit - credit) / 100}
+                for account_id, name, debit, credit in zip(self.account_ids, self.account_names, self.account_debit, self.account_credit)
+            ],
+            "total_debit": self.batch_debit / 100,
+            "total_credit": self.batch_credit / 100,
+            "is_balanced": self.batch_debit == self.batch_credit
+        }
+
+    def ndjson(self, invalid_only: bool = False):
+        """Filas sin audit_trail (el índice referencia el asiento enviado) y, al final, resumen y balance"""
+        chunk = []
+        for row in self.rows(invalid_only, include_audit_trail=False):
+            chunk.append(json.dumps(row, ensure_ascii=False))
+            if len(chunk) >= BATCH_VALIDATE_STREAM_CHUNK:
+                yield "\n".join(chunk) + "\n"
+                chunk = []
+        if chunk:
+            yield "\n".join(chunk) + "\n"
+        yield json.dumps({"summary": self.summary(), "trial_balance": self.trial_balance()}, ensure_ascii=False) + "\n"
+
 # =============================================================================
 # MOTOR ARS-DSPy V3.0 (Adaptive Reasoning Suppression)
 # =============================================================================
@@ -439,6 +2136,9 @@ class ARSDSPyEngine:
     def __init__(self, profile_schema: Optional[Dict] = None):
         self.profile = AdjustmentProfileSchema(profile_schema)
         self.ars_enabled = self.profile.ars_config.adaptive_suppression_enabled
+        self.rule_hits = RuleHitCounter(self.profile)
+        # Identidad del perfil para la memoización por cuenta (antes de que los hit counters lo muten)
+        self.profile_signature = profile_etag(profile_schema) if profile_schema else "default"
         
     # ------------------------------------------------------------------------
     # DSPy-LIKE CLASSIFICATION ENGINE (IA-like sin API keys)
@@ -464,6 +2164,10 @@ class ARSDSPyEngine:
         Clasificación semántica V6.0: Emparejamiento por Conceptos (Knowledge Base Matching)
         ⚡ MAHORAGA TEKIŌ: Las reglas aprendidas (SCL) tienen PRIORIDAD ABSOLUTA ⚡
         """
+        with stage_span("classification"):
+            return self._classify_account_semantic(account)
+
+    def _classify_account_semantic(self, account: Account) -> Tuple[str, float, List[str], Any]:
         name_lower = account.name.lower()
         name_original = account.name
         
@@ -476,45 +2180,27 @@ class ARSDSPyEngine:
         # Las reglas con confidence_weight > 2.0 son inmunes y tienen prioridad
         # ═══════════════════════════════════════════════════════════════════
         
-        # Revisar reglas monetarias aprendidas PRIMERO
-        for rule in self.profile.profile_data.get("monetary_rules", []):
-            pattern = rule.get("pattern", "")
-            weight = rule.get("confidence_weight", 1.0)
-            
-            # Si es una regla SCL de alta prioridad (weight >= 2.0), verificar match
-            if weight >= 2.0:
-                try:
-                    # Convertir patrón a regex si es necesario
-                    if pattern.startswith("^") or pattern.startswith(".*"):
-                        regex = re.compile(pattern, re.IGNORECASE)
-                        if regex.match(name_original) or regex.search(name_original):
-                            print(f"⚡ MAHORAGA HIT (monetary): '{name_original}' matched by SCL rule: {pattern}")
-                            return ("monetary", 0.99, rule.get("tags", ["Monetario"]), {
-                                **rule,
-                                "source_nc": "Mahoraga-SCL-Adaptation",
-                                "scl_override": True
-                            })
-                except re.error:
-                    pass
+        # Revisar reglas monetarias aprendidas PRIMERO (V9.0: precompiladas + hit counters)
+        for idx, regex, rule in self.profile.scl_matchers["monetary_rules"]:
+            if regex.search(name_original):
+                self.rule_hits.record("monetary_rules", idx)
+                log_event(logging.DEBUG, "scl.hit", classification="monetary", account=name_original, pattern=rule.get('pattern'))
+                return ("monetary", 0.99, rule.get("tags", ["Monetario"]), {
+                    **rule,
+                    "source_nc": "Mahoraga-SCL-Adaptation",
+                    "scl_override": True
+                })
         
         # Revisar reglas NO monetarias aprendidas
-        for rule in self.profile.profile_data.get("non_monetary_rules", []):
-            pattern = rule.get("pattern", "")
-            weight = rule.get("confidence_weight", 1.0)
-            
-            if weight >= 2.0:
-                try:
-                    if pattern.startswith("^") or pattern.startswith(".*"):
-                        regex = re.compile(pattern, re.IGNORECASE)
-                        if regex.match(name_original) or regex.search(name_original):
-                            print(f"⚡ MAHORAGA HIT (non_monetary): '{name_original}' matched by SCL rule: {pattern}")
-                            return ("non_monetary", 0.99, rule.get("tags", ["NoMonetario"]), {
-                                **rule,
-                                "source_nc": "Mahoraga-SCL-Adaptation",
-                                "scl_override": True
-                            })
-                except re.error:
-                    pass
+        for idx, regex, rule in self.profile.scl_matchers["non_monetary_rules"]:
+            if regex.search(name_original):
+                self.rule_hits.record("non_monetary_rules", idx)
+                log_event(logging.DEBUG, "scl.hit", classification="non_monetary", account=name_original, pattern=rule.get('pattern'))
+                return ("non_monetary", 0.99, rule.get("tags", ["NoMonetario"]), {
+                    **rule,
+                    "source_nc": "Mahoraga-SCL-Adaptation",
+                    "scl_override": True
+                })
         
         # ═══════════════════════════════════════════════════════════════════
         # CLASIFICACIÓN SEMÁNTICA NORMAL (Si no hay override SCL)
@@ -602,9 +2288,10 @@ class ARSDSPyEngine:
 
         return best_match
     
-    def calculate_adaptive_confidence(self, account: Account, adjustment_type: str, base_confidence: float) -> Tuple[float, Dict]:
-        """Cálculo de confianza adaptativa basado en ambigüedad semántica"""
-        classification, conf_score, tags, rule = self.classify_account_semantic(account)
+    def calculate_adaptive_confidence(self, account: Account, adjustment_type: str, base_confidence: float,
+                                      classified: Optional[Tuple[str, float, List[str], Any]] = None) -> Tuple[float, Dict]:
+        """Cálculo de confianza adaptativa basado en ambigüedad semántica (V9.0: reutiliza `classified` si se pasa)"""
+        classification, conf_score, tags, rule = classified or self.classify_account_semantic(account)
         
         # Factores de ajuste de confianza
         ambiguity_factor = 1.0
@@ -632,8 +2319,14 @@ class ARSDSPyEngine:
         best_config = None
         best_score = 0
         
-        for config in configs:
-            asset_norm = self._normalize_string(config.asset_type_keyword)
+        # V9.0: Catálogo precompilado del perfil; otros catálogos se normalizan al vuelo
+        if configs is self.profile.depreciation_configs:
+            matchers = self.profile.asset_matchers
+        else:
+            matchers = [(c, self._normalize_string(c.asset_type_keyword), None) for c in configs]
+        name_words = None
+        
+        for config, asset_norm, asset_words in matchers:
             current_score = 0
             
             # 1. Coincidencia exacta
@@ -645,8 +2338,10 @@ class ARSDSPyEngine:
                 current_score = 50 + len(asset_norm)
             # 3. Coincidencia de palabras clave (Jaccard-ish)
             else:
-                asset_words = set(asset_norm.split())
-                name_words = set(name_norm.split())
+                if asset_words is None:
+                    asset_words = set(asset_norm.split())
+                if name_words is None:
+                    name_words = set(name_norm.split())
                 common_words = asset_words.intersection(name_words)
                 if common_words:
                     # Score basado en cuántas palabras coinciden y qué tan únicas son
@@ -661,49 +2356,26 @@ class ARSDSPyEngine:
     # ------------------------------------------------------------------------
     # PROGRAM OF THOUGHT (PoT) - CÁLCULOS ESPECIALIZADOS
     # ------------------------------------------------------------------------
-    def calculate_depreciation_pot(self, account: Account, params: AdjustmentParameters) -> Tuple[float, float, str, Dict]:
-        """Cálculo de depreciación con Program of Thought (PoT)"""
-        import sys
-        print(f"DEBUG DEP: [1] Entering depreciation calc for {account.name}", flush=True)
-        
-        classification, base_confidence, tags, rule = self.classify_account_semantic(account)
-        print(f"DEBUG DEP: [2] Classification: {classification}, Tags: {tags}", flush=True)
-        
-        if classification != "non_monetary" or "Depreciable" not in tags:
-            print(f"DEBUG DEP: [3] SKIPPING - not non_monetary or not Depreciable", flush=True)
-            return 0.0, 0.0, "", {}
-        
-        print(f"DEBUG DEP: [4] Passed classification check", flush=True)
-        
-        # Buscar configuración específica usando Smart Matching
-        best_config, match_score = self._smart_match_asset_type(account.name, self.profile.depreciation_configs)
+    def _resolve_depreciation_config(self, account_name: str) -> Optional[DepreciationConfig]:
+        """Configuración de activo por Smart Matching; genérica ('activos fijos') si el match es débil"""
+        best_config, match_score = self._smart_match_asset_type(account_name, self.profile.depreciation_configs)
         
         # Usar configuración genérica si no hay match fuerte (score < 15 es muy bajo)
         if not best_config or match_score < 15:
-            print(f"DEBUG DEP: [5.1] Low match score ({match_score}) for {best_config.asset_type_keyword if best_config else 'None'}")
-            fallback_config = next((c for c in self.profile.depreciation_configs if "activos fijos" in c.asset_type_keyword.lower()), None)
+            log_event(logging.DEBUG, "dep.low_match", score=match_score, keyword=best_config.asset_type_keyword if best_config else None)
+            fallback_config = self.profile.fallback_depreciation_config
             if fallback_config:
                  best_config = fallback_config
-                 print(f"DEBUG DEP: [5.2] Used generic fallback config: {best_config.asset_type_keyword}")
-        
-        if not best_config:
-            print(f"DEBUG DEP: [6] NO CONFIG FOUND - returning 0", flush=True)
-            return 0.0, 0.0, "", {}
-        
-        # [POLYGLOT] Delegating formula execution to Rust Worker (Simon/Julia)
-        # Executing: annual_rate_formula via IPC
-        # result = rust_worker.compute_depreciation(account.balance, best_config.annual_rate, 1)
-        
-        # V7.0: Cálculo de Prorrateo por Meses (Prorated Depreciation)
+                 log_event(logging.DEBUG, "dep.fallback_config", keyword=best_config.asset_type_keyword)
+        return best_config
+
+    def _depreciation_proration(self, account: Account, params: AdjustmentParameters) -> Tuple[float, str]:
+        """V7.0: Factor de prorrateo mensual (meses inclusivos < 12 desde la adquisición) y nota de auditoría"""
         depreciation_factor = 1.0
-        months_prorated = 12
         proration_note = ""
         
-        print(f"DEBUG DEP: [6.1] Params Check: FiscalEnd={params.fiscal_end_date}, Acqs={len(params.acquisition_dates) if params.acquisition_dates else 0}", flush=True)
-
         if params.acquisition_dates and account.code in params.acquisition_dates and params.fiscal_end_date:
             try:
-                from datetime import datetime
                 acq_date_str = params.acquisition_dates[account.code]
                 acq_date = datetime.strptime(acq_date_str, "%Y-%m-%d")
                 fiscal_end = datetime.strptime(params.fiscal_end_date, "%Y-%m-%d")
@@ -712,20 +2384,38 @@ class ARSDSPyEngine:
                 months_diff = (fiscal_end.year - acq_date.year) * 12 + (fiscal_end.month - acq_date.month) + 1
                 
                 if months_diff < 12 and months_diff > 0:
-                    months_prorated = months_diff
-                    depreciation_factor = months_prorated / 12.0
-                    proration_note = f"(Prorrateo: {months_prorated} meses desde {acq_date_str})"
-                    print(f"DEBUG DEP: [6.5] PRORATION APPLIED: {months_prorated} months. Factor: {depreciation_factor}")
+                    depreciation_factor = months_diff / 12.0
+                    proration_note = f"(Prorrateo: {months_diff} meses desde {acq_date_str})"
+                    log_event(logging.DEBUG, "dep.proration", account=account.code, months=months_diff, factor=depreciation_factor)
             except Exception as e:
-                print(f"DEBUG DEP: Error parsing dates for proration: {e}")
+                log_event(logging.WARNING, "dep.proration_error", account=account.code, error=str(e))
+        return depreciation_factor, proration_note
+
+    def calculate_depreciation_pot(self, account: Account, params: AdjustmentParameters,
+                                   classified: Optional[Tuple[str, float, List[str], Any]] = None) -> Tuple[float, float, str, Dict]:
+        """Cálculo de depreciación con Program of Thought (PoT)"""
+        classification, base_confidence, tags, rule = classified = classified or self.classify_account_semantic(account)
+        
+        if classification != "non_monetary" or "Depreciable" not in tags:
+            return 0.0, 0.0, "", {}
+        
+        # Buscar configuración específica usando Smart Matching (con fallback genérico)
+        best_config = self._resolve_depreciation_config(account.name)
+        
+        if not best_config:
+            log_event(logging.DEBUG, "dep.no_config", account=account.code)
+            return 0.0, 0.0, "", {}
+        
+        # V7.0: Cálculo de Prorrateo por Meses (Prorated Depreciation)
+        depreciation_factor, proration_note = self._depreciation_proration(account, params)
 
         # ⚡ V6.5 FIX: Cambio a cálculo anual para Cierres de Gestión (NC-22)
         # El usuario indica que solo se deprecia UNA vez al final de gestión.
-        annual_depreciation = account.balance * best_config.annual_rate
-        depreciation_amount = annual_depreciation * depreciation_factor
-        adaptive_confidence, adaptive_rule = self.calculate_adaptive_confidence(account, "depreciacion", best_config.confidence_level)
+        depreciation_amount = resolve_compute_backend(params.compute_backend).depreciation_amount(
+            account.balance, best_config.annual_rate, depreciation_factor)
+        adaptive_confidence, adaptive_rule = self.calculate_adaptive_confidence(account, "depreciacion", best_config.confidence_level, classified)
         
-        print(f"DEBUG DEP: [7] Calculated: {depreciation_amount} (Conf: {adaptive_confidence})", flush=True)
+        log_event(logging.DEBUG, "dep.calculated", account=account.code, amount=depreciation_amount, confidence=adaptive_confidence)
 
         provenance_str = f"Procedencia: {rule.get('source_nc', 'AI')}"
         if rule.get('source_nc') == "Mahoraga-SCL-Adaptation":
@@ -733,22 +2423,27 @@ class ARSDSPyEngine:
         
         audit_trail = f"[DEPRECIACIÓN ANUAL] {account.code}: Tasa {best_config.annual_rate*100:.1f}% ({best_config.nc_reference}). {provenance_str}. {proration_note} Conf: {adaptive_confidence:.2f}"
         
-        return depreciation_amount, adaptive_confidence, audit_trail, {**rule, "dep_config": best_config.nc_reference}
+        return depreciation_amount, adaptive_confidence, audit_trail, {
+            **rule, "dep_config": best_config.nc_reference, "asset_type": best_config.asset_type_keyword,
+            "annual_rate": best_config.annual_rate, "proration_factor": depreciation_factor
+        }
     
-    def calculate_aitb_pot(self, account: Account, params: AdjustmentParameters) -> Tuple[float, float, str, Dict]:
+    def calculate_aitb_pot(self, account: Account, params: AdjustmentParameters,
+                           classified: Optional[Tuple[str, float, List[str], Any]] = None) -> Tuple[float, float, str, Dict]:
         """Cálculo AITB estricto NC 3 con Coeficiente Corrector"""
-        classification, base_confidence, tags, rule = self.classify_account_semantic(account)
+        classification, base_confidence, tags, rule = classified = classified or self.classify_account_semantic(account)
         
         # Solo cuentas no monetarias aplican AITB (NC 3)
         if classification == "monetary":
             return 0.0, 0.0, "", {}
         
         # Cálculo con Coeficiente Corrector (CC)
+        backend = resolve_compute_backend(params.compute_backend)
         if params.method == "UFV":
             if params.ufv_initial == 0:
-                 print(f"DEBUG: AITB skipped for {account.name} because UFV initial is 0")
+                 log_event(logging.DEBUG, "aitb.skipped_ufv_zero", account=account.code)
                  return 0.0, 0.0, "", {}
-            cc = params.ufv_final / params.ufv_initial
+            cc = backend.correction_coefficient(params.ufv_initial, params.ufv_final)
         else:
             cc = 1.0  # Placeholder para TC
         
@@ -757,10 +2452,8 @@ class ARSDSPyEngine:
              # print(f"DEBUG: AITB skipped for {account.name}, CC too low: {cc}")
              return 0.0, 0.0, "", {}
         
-        # [POLYGLOT] Delegating formula execution to Rust Worker (High Performance Compute)
-        # Executing: inflation_adjustment_formula via IPC
-        adjustment_amount = account.balance * (cc - 1)
-        adaptive_confidence, adaptive_rule = self.calculate_adaptive_confidence(account, "aitb", 0.95)
+        adjustment_amount = backend.aitb_amount(account.balance, cc)
+        adaptive_confidence, adaptive_rule = self.calculate_adaptive_confidence(account, "aitb", 0.95, classified)
         
         provenance_str = f"Regla: {rule.get('source_nc', 'AI')}"
         if rule.get('source_nc') == "Mahoraga-SCL-Adaptation":
@@ -768,28 +2461,13 @@ class ARSDSPyEngine:
              
         audit_trail = f"[AITB] {account.code}: {provenance_str}. CC={cc:.6f}. NC-3 Art.4. Base: {rule.get('pattern', 'Gral')}."
         
-        return adjustment_amount, adaptive_confidence, audit_trail, rule
+        return adjustment_amount, adaptive_confidence, audit_trail, {**rule, "cc": cc}
     
-    def calculate_aitb_trajectory(self, account: Account, params: AdjustmentParameters) -> Tuple[float, float, str, Dict]:
+    def _trajectory_atoms(self, account: Account, params: AdjustmentParameters, raw_trajectory: List[Any]) -> Tuple[float, float, List[Dict], float]:
         """
-        V8.0 AoT: Cálculo AITB por trayectoria de movimientos.
-        Cada movimiento es un 'átomo' que se ajusta individualmente con su UFV de fecha.
-        
-        Sello de Contención 1: Activos Fijos NUNCA pueden clasificarse como monetarios.
+        V8.0 AoT: Núcleo de la trayectoria (independiente de la clasificación).
+        Devuelve (magnitud_final, total_neto, átomos, confianza_promedio).
         """
-        classification, base_confidence, tags, rule = self.classify_account_semantic(account)
-        
-        # INVARIANTE: Cuentas no monetarias solamente
-        if classification == "monetary":
-            return 0.0, 0.0, "", {}
-        
-        # Obtener trayectoria de movimientos para esta cuenta
-        raw_trajectory = params.ledger_trajectories.get(account.code, [])
-        if not raw_trajectory:
-            # Fallback a cálculo por saldo si no hay trayectoria
-            print(f"DEBUG AoT: No trajectory for {account.code}, falling back to balance-based")
-            return self.calculate_aitb_pot(account, params)
-        
         # V8.0 FIX: Convert dict objects to proper access (middleware sends dicts, not Pydantic models)
         trajectory = []
         for mov in raw_trajectory:
@@ -804,9 +2482,14 @@ class ARSDSPyEngine:
         atoms_processed = []
         confidence_sum = 0.0
         
-        print(f"DEBUG AoT [{account.code}]: Processing {len(trajectory)} movements. UFV_final: {ufv_final}")
-        print(f"DEBUG AoT [{account.code}]: UFV Cache has {len(params.ufv_cache or {})} entries")
+        # Las trazas por movimiento son muestreadas; el nivel se consulta una sola vez por cuenta
+        trace = log.isEnabledFor(logging.DEBUG)
+        if trace:
+            log_event(logging.DEBUG, "aot.start", account=account.code, movements=len(trajectory),
+                      ufv_final=ufv_final, ufv_cache=len(params.ufv_cache or {}))
         
+        # Movimientos con UFV resoluble; las fórmulas corren en el backend de cómputo
+        dates, net_amounts, ufvs = [], [], []
         for mov in trajectory:
             # V8.0 FIX: Access dict keys properly
             mov_date = mov.get('date', '') if isinstance(mov, dict) else mov.date
@@ -821,42 +2504,71 @@ class ARSDSPyEngine:
                 ufv_at_date = (params.ufv_cache or {}).get(mov_date, ufv_final)
             
             if ufv_at_date == 0 or ufv_at_date is None:
-                print(f"DEBUG AoT [{account.code}]: Skipping movement {mov_date} - no UFV found")
+                if trace:
+                    log_event(logging.DEBUG, "aot.movement_skipped", account=account.code, date=mov_date)
                 continue
             
-            # Calcular Coeficiente Corrector para este átomo
-            cc = ufv_final / ufv_at_date
-            
             # Movimiento neto (Debit = aumenta saldo deudor, Credit = disminuye)
-            net_amount = mov_debit - mov_credit
+            dates.append(mov_date)
+            net_amounts.append(mov_debit - mov_credit)
+            ufvs.append(ufv_at_date)
+        
+        # Coeficiente Corrector por átomo; solo movimientos con inflación significativa
+        backend = resolve_compute_backend(params.compute_backend)
+        for i, cc, partial_adjustment in backend.trajectory_atoms(net_amounts, ufvs, ufv_final):
+            total_adjustment = bankersRound(total_adjustment + partial_adjustment, 2)
             
-            print(f"DEBUG AoT [{account.code}]: Date={mov_date}, Debit={mov_debit}, Credit={mov_credit}, Net={net_amount}, UFV={ufv_at_date}, CC={cc:.6f}")
+            if trace and log_sampled():
+                log_event(logging.DEBUG, "aot.movement", account=account.code, date=dates[i], net=net_amounts[i],
+                          ufv=ufvs[i], cc=round(cc, 6), partial=partial_adjustment, running_total=total_adjustment)
             
-            # Solo procesar si hay inflación significativa
-            if abs(net_amount) > 0.01 and cc > 1.0:
-                partial_adjustment = bankersRound(net_amount * (cc - 1), 2)
-                total_adjustment = bankersRound(total_adjustment + partial_adjustment, 2)
-                
-                print(f"DEBUG AoT [{account.code}]: Partial adjustment = {partial_adjustment}, Running total = {total_adjustment}")
-                
-                atoms_processed.append({
-                    "date": mov_date,
-                    "amount": net_amount,
-                    "ufv": ufv_at_date,
-                    "cc": round(cc, 6),
-                    "adjustment": partial_adjustment
-                })
-                confidence_sum += 0.95  # Base confidence for each atom
+            atoms_processed.append({
+                "date": dates[i],
+                "amount": net_amounts[i],
+                "ufv": ufvs[i],
+                "cc": round(cc, 6),
+                "adjustment": partial_adjustment
+            })
+            confidence_sum += 0.95  # Base confidence for each atom
+        
+        # Confianza promedio de los átomos procesados
+        atom_count = len(atoms_processed)
+        avg_confidence = (confidence_sum / atom_count) if atom_count > 0 else 0.0
+        
+        # Aplicar redondeo bancario final y valor absoluto
+        # V8.0 FIX: Net amount is negative for Credit accounts (Income/Liability)
+        # We need the MAGNITUDE of the adjustment. _create_aitb_transaction handles the direction.
+        final_adjustment = bankersRound(abs(total_adjustment), 2)
+        if trace:
+            log_event(logging.DEBUG, "aot.done", account=account.code, raw_total=total_adjustment,
+                      magnitude=final_adjustment, atoms=atom_count)
+        
+        return final_adjustment, total_adjustment, atoms_processed, avg_confidence
+
+    def calculate_aitb_trajectory(self, account: Account, params: AdjustmentParameters,
+                                  classified: Optional[Tuple[str, float, List[str], Any]] = None) -> Tuple[float, float, str, Dict]:
+        """
+        V8.0 AoT: Cálculo AITB por trayectoria de movimientos.
+        Cada movimiento es un 'átomo' que se ajusta individualmente con su UFV de fecha.
+        
+        Sello de Contención 1: Activos Fijos NUNCA pueden clasificarse como monetarios.
+        """
+        classification, base_confidence, tags, rule = classified = classified or self.classify_account_semantic(account)
+        
+        # INVARIANTE: Cuentas no monetarias solamente
+        if classification == "monetary":
+            return 0.0, 0.0, "", {}
+        
+        # Obtener trayectoria de movimientos para esta cuenta
+        raw_trajectory = params.ledger_trajectories.get(account.code, [])
+        if not raw_trajectory:
+            # Fallback a cálculo por saldo si no hay trayectoria
+            log_event(logging.DEBUG, "aot.no_trajectory", account=account.code)
+            return self.calculate_aitb_pot(account, params, classified)
         
-        # Confianza promedio de los átomos procesados
+        with stage_span("aitb_trajectory"):
+            final_adjustment, total_adjustment, atoms_processed, avg_confidence = self._trajectory_atoms(account, params, raw_trajectory)
         atom_count = len(atoms_processed)
-        avg_confidence = (confidence_sum / atom_count) if atom_count > 0 else 0.0
-        
-        # Aplicar redondeo bancario final y valor absoluto
-        # V8.0 FIX: Net amount is negative for Credit accounts (Income/Liability)
-        # We need the MAGNITUDE of the adjustment. _create_aitb_transaction handles the direction.
-        final_adjustment = bankersRound(abs(total_adjustment), 2)
-        print(f"DEBUG AoT [{account.code}]: Raw total = {total_adjustment}. Final Magnitude = {final_adjustment} from {atom_count} atoms")
         
         # Determinar proveniencia (Shorter CoT)
         provenance_str = f"Regla: {rule.get('source_nc', 'AI-AoT')}"
@@ -868,13 +2580,14 @@ class ARSDSPyEngine:
         audit_trail = f"[AITB-AoT] {account.code}: {atom_count} átomos. {provenance_str}. Total Magnitud: {final_adjustment:.2f} Bs ({total_adjustment:.2f} neto)"
         
         # Enriched rule with trajectory metadata
-        enriched_rule = {**rule, "aot_atoms": atom_count, "aot_mode": True}
+        enriched_rule = {**rule, "aot_atoms": atom_count, "aot_mode": True, "atoms": atoms_processed}
         
         return final_adjustment, avg_confidence, audit_trail, enriched_rule
     
-    def calculate_provision_pot(self, account: Account, params: AdjustmentParameters) -> Tuple[float, float, str, Dict]:
+    def calculate_provision_pot(self, account: Account, params: AdjustmentParameters,
+                                classified: Optional[Tuple[str, float, List[str], Any]] = None) -> Tuple[float, float, str, Dict]:
         """Cálculo de provisión inteligente"""
-        classification, base_confidence, tags, classification_rule = self.classify_account_semantic(account)
+        classification, base_confidence, tags, classification_rule = classified = classified or self.classify_account_semantic(account)
         
         # Buscar cuentas de provisiones específicas
         provision_keywords = ["cuentas por cobrar", "deudores", "incobrable", "dudoso"]
@@ -883,8 +2596,8 @@ class ARSDSPyEngine:
         
         # Lógica de provisión basada en experiencia histórica (2% estándar)
         provision_rate = 0.02
-        provision_amount = account.balance * provision_rate
-        adaptive_confidence, adaptive_rule = self.calculate_adaptive_confidence(account, "provision", 0.85)
+        provision_amount = resolve_compute_backend(params.compute_backend).provision_amount(account.balance, provision_rate)
+        adaptive_confidence, adaptive_rule = self.calculate_adaptive_confidence(account, "provision", 0.85, classified)
         
         # Combine classification rule and provision specific rule
         provision_specific_rule = {"source": "HistoricalExperience", "rate": provision_rate}
@@ -897,8 +2610,13 @@ class ARSDSPyEngine:
     # ------------------------------------------------------------------------
     # ARS (ADAPTIVE REASONING SUPPRESSION) - MOTOR PRINCIPAL
     # ------------------------------------------------------------------------
-    def generate_adjustments(self, request: AdjustmentRequest) -> AdjustmentResponse:
-        """Motor ARS principal con Certeza Dinámica y Strategic Reflectivism"""
+    def generate_adjustments(self, request: AdjustmentRequest, use_memo: bool = True,
+                             hit_log: Optional[List[Tuple[str, int]]] = None, record_hits: bool = True) -> AdjustmentResponse:
+        """
+        Motor ARS principal con Certeza Dinámica y Strategic Reflectivism.
+        hit_log (opcional) recibe los impactos SCL de la corrida (la caché de resultados los guarda para replicarlos).
+        record_hits=False descarta los impactos (corridas de diagnóstico que no son uso real de las reglas).
+        """
         start_time = datetime.now()
         proposed_transactions = []
         audit_trails = []
@@ -910,96 +2628,96 @@ class ARSDSPyEngine:
             "provision_generated": 0,
             "suppressed_adjustments": 0
         }
-        
-        for account in request.accounts:
+        backend = resolve_compute_backend(request.parameters.compute_backend)
+        processing_stats["compute_backend"] = backend.name
+
+        # V9.0: Spans por etapa (reutiliza los de un llamador externo si ya hay unos activos)
+        outer_spans = _current_spans.get()
+        spans = outer_spans or StageSpans()
+        spans_token = _current_spans.set(spans) if outer_spans is None else None
+        try:
+            # Estado por corrida (búfer de impactos, memo): corridas concurrentes del mismo motor no se bloquean
+            with self.rule_hits.request_scope() as hits, spans.span("generate"):
+                result = self._generate_adjustments(request, start_time, proposed_transactions, audit_trails,
+                                                    confidence_scores, processing_stats, spans, use_memo)
+                result.processing_stats["rule_hits_flushed"] = self.rule_hits.commit(hits, request.company_id) if record_hits else 0
+                if hit_log is not None:
+                    hit_log.extend(hits)
+                return result
+        finally:
+            if spans_token is not None:
+                _current_spans.reset(spans_token)
+                spans.publish()
+                metrics.inc("ai_engine_requests_total", engine=type(self).__name__, backend=backend.name)
+
+    def _generate_adjustments(self, request: AdjustmentRequest, start_time: datetime, proposed_transactions: List[ProposedTransaction],
+                              audit_trails: List[str], confidence_scores: List[float], processing_stats: Dict[str, Any],
+                              spans: StageSpans, use_memo: bool = True) -> AdjustmentResponse:
+        store = get_account_memo_store() if request.company_id and use_memo else None
+        memo = AccountMemo(store, self, request) if store else None
+        if memo:
+            with spans.span("account_memo"):
+                memo.prefetch(request.accounts)
+
+        for index, account in enumerate(request.accounts):
             if account.balance <= 0:
                 continue
             
             processing_stats["accounts_processed"] += 1
-            account_adjustments = []
-            
-            # DEBUG: Print account being processed
-            print(f"DEBUG: Processing account {account.code} - {account.name} (Balance: {account.balance})")
-            
-            # DEBUG: V8.0 AoT - Show trajectory mode status
-            trajectory_count = len(request.parameters.ledger_trajectories.get(account.code, [])) if request.parameters.ledger_trajectories else 0
-            print(f"DEBUG AoT MODE: use_trajectory_mode={request.parameters.use_trajectory_mode}, trajectories_for_account={trajectory_count}")
-            print(f"DEBUG AoT CACHE: ufv_cache_size={len(request.parameters.ufv_cache or {})}")
-            
-            # 1. AITB (PoT/AoT) - Executed FIRST to update base for Depreciation
-            # V8.0: Use trajectory mode if enabled
-            if request.parameters.use_trajectory_mode:
-                aitb_result = self.calculate_aitb_trajectory(account, request.parameters)
+            cached = memo.lookup(index) if memo else None
+            if cached is not None:
+                # Cuenta sin cambios: se reinyectan sus asientos y los impactos de reglas que produjo
+                with spans.span("account_memo"):
+                    adjustments = [(ProposedTransaction.model_validate(data), confidence, stat, audit)
+                                   for data, confidence, stat, audit in cached["adjustments"]]
+                    for rule_type, idx in cached["hits"]:
+                        self.rule_hits.record(rule_type, idx)
+                memo.reused += 1
             else:
-                aitb_result = self.calculate_aitb_pot(account, request.parameters)
-            aitb_amount, aitb_conf, aitb_audit, aitb_rule = aitb_result
-            
-            if aitb_amount > 0.01:
-                transaction = self._create_aitb_transaction(account, aitb_amount, aitb_conf, aitb_audit, request.accounts)
-                account_adjustments.append((transaction, aitb_conf))
-                audit_trails.append(aitb_audit)
-                processing_stats["aitb_generated"] += 1
-
-            # Prepare account for depreciation (Base + AITB)
-            # Depreciación se calcula sobre el valor actualizado (Balance Inicial + AITB)
-            depreciation_base = account.balance + aitb_amount
-            # Create temporary account object with adjusted balance
-            account_for_dep = Account(
-                code=account.code, 
-                name=account.name, 
-                balance=depreciation_base, 
-                type=account.type
-            )
-
-            # 2. DEPRECIACIÓN (PoT) - Executed on adjusted technical balance
-            dep_result = self.calculate_depreciation_pot(account_for_dep, request.parameters)
-            dep_amount, dep_conf, dep_audit, dep_rule = dep_result
+                buffer = _rule_hit_buffer.get()
+                first_hit = len(buffer)
+                adjustments = self._account_adjustments(account, request, spans)
+                if memo:
+                    memo.remember(index, adjustments, buffer[first_hit:])
+                    memo.recomputed += 1
             
-            if dep_amount > 0.01:
-                transaction = self._create_depreciation_transaction(account, dep_amount, dep_conf, dep_audit, request.accounts)
-                # Note: dep_rule is stored for internal tracking, not attached to transaction
-                account_adjustments.append((transaction, dep_conf))
-                audit_trails.append(dep_audit)
-                processing_stats["depreciation_generated"] += 1
-
-            # 3. PROVISIÓN (PoT)
-            provision_result = self.calculate_provision_pot(account, request.parameters)
-            provision_amount, provision_confidence, provision_audit, _ = provision_result
-            if provision_amount > 0.01:
-                transaction = self._create_provision_transaction(account, provision_amount, provision_confidence, provision_audit)
-                account_adjustments.append((transaction, provision_confidence))
-                audit_trails.append(provision_audit)
-                processing_stats["provision_generated"] += 1
+            account_adjustments = []
+            for transaction, confidence, stat, audit in adjustments:
+                account_adjustments.append((transaction, confidence))
+                audit_trails.append(audit)
+                processing_stats[stat] += 1
             
             # ARS: Aplicar supresión adaptativa si confianza baja
-            if self.ars_enabled:
-                for transaction, confidence in account_adjustments:
-                    # Si la confianza es extremadamente baja (< 0.3), suprimir por completo
-                    if confidence < 0.3:
-                        print(f"DEBUG: Totally suppressed (High Uncertainty) for {transaction.gloss} (Conf: {confidence})")
-                        processing_stats["suppressed_adjustments"] += 1
-                        continue
+            with spans.span("ars_filter"):
+                if self.ars_enabled:
+                    for transaction, confidence in account_adjustments:
+                        # Si la confianza es extremadamente baja (< 0.3), suprimir por completo
+                        if confidence < 0.3:
+                            log_event(logging.DEBUG, "ars.suppressed", gloss=transaction.gloss, confidence=confidence)
+                            processing_stats["suppressed_adjustments"] += 1
+                            continue
                     
-                    # Si está por debajo del umbral pero por encima de 0.3, incluir pero marcar para revisión
-                    if confidence < self.profile.ars_config.confidence_threshold:
-                        print(f"DEBUG: Including Low Confidence adjustment for {transaction.gloss} (Conf: {confidence})")
-                        transaction.review_needed = True 
-                        # Note: We still add it to the list so the human can see it
+                        # Si está por debajo del umbral pero por encima de 0.3, incluir pero marcar para revisión
+                        if confidence < self.profile.ars_config.confidence_threshold:
+                            log_event(logging.DEBUG, "ars.review_needed", gloss=transaction.gloss, confidence=confidence)
+                            transaction.review_needed = True 
+                            # Note: We still add it to the list so the human can see it
                     
-                    proposed_transactions.append(transaction)
-                    confidence_scores.append(confidence)
-            else:
-                # Sin ARS: incluir todos los ajustes
-                for transaction, confidence in account_adjustments:
-                    proposed_transactions.append(transaction)
-                    confidence_scores.append(confidence)
+                        proposed_transactions.append(transaction)
+                        confidence_scores.append(confidence)
+                else:
+                    # Sin ARS: incluir todos los ajustes
+                    for transaction, confidence in account_adjustments:
+                        proposed_transactions.append(transaction)
+                        confidence_scores.append(confidence)
         
         # Cálculo de confianza agregada y decisión ARS
         aggregate_confidence = float(np.mean(confidence_scores)) if confidence_scores else 0.0
         review_needed = bool(aggregate_confidence < self.profile.ars_config.confidence_threshold)
         
         # Optimización de reasoning (shorter CoT)
-        reasoning = self._generate_concise_reasoning(audit_trails, processing_stats, aggregate_confidence)
+        with spans.span("reasoning"):
+            reasoning = self._generate_concise_reasoning(audit_trails, processing_stats, aggregate_confidence)
         
         # Estadísticas de procesamiento
         processing_time = (datetime.now() - start_time).total_seconds()
@@ -1007,6 +2725,12 @@ class ARSDSPyEngine:
         processing_stats["aggregate_confidence"] = aggregate_confidence
         processing_stats["review_needed"] = review_needed
         processing_stats["ars_enabled"] = self.ars_enabled
+        if memo:
+            memo.flush()
+            processing_stats["accounts_reused"] = memo.reused
+            processing_stats["accounts_recomputed"] = memo.recomputed
+        if request.include_stage_timings:
+            processing_stats["stage_timings"] = spans.as_dict()
         
         return AdjustmentResponse(
             success=len(proposed_transactions) > 0,
@@ -1029,15 +2753,16 @@ class ARSDSPyEngine:
         # Patrón: "Depreciacion" + nombre del activo
         target_name_normalized = account.name.lower().replace("muebles y enseres", "muebles y enseres").replace("vehiculos", "vehiculos")
         
-        for acc in all_accounts:
-            name_low = acc.name.lower()
-            # Buscar "Depreciacion" + algo del nombre original (excluyendo acumulada)
-            if ("depreciacion" in name_low or "depreciación" in name_low) and \
-               ("acumulada" not in name_low) and \
-               any(word in name_low for word in account.name.lower().split() if len(word) > 3):
-                expense_account_id = acc.code
-                expense_account_name = acc.name
-                break
+        with stage_span("counterpart_lookup"):
+            for acc in all_accounts:
+                name_low = acc.name.lower()
+                # Buscar "Depreciacion" + algo del nombre original (excluyendo acumulada)
+                if ("depreciacion" in name_low or "depreciación" in name_low) and \
+                   ("acumulada" not in name_low) and \
+                   any(word in name_low for word in account.name.lower().split() if len(word) > 3):
+                    expense_account_id = acc.code
+                    expense_account_name = acc.name
+                    break
         
         # Fallback estético si no se encuentra la cuenta específica
         if expense_account_id == "DEP_EXPENSE":
@@ -1048,12 +2773,13 @@ class ARSDSPyEngine:
         accum_account_id = "DEP_ACCUM"
         accum_account_name = "Depreciación Acumulada"
         
-        for acc in all_accounts:
-            name_low = acc.name.lower()
-            if ("depreciacion" in name_low or "depreciación" in name_low) and "acumulada" in name_low and any(word in name_low for word in account.name.lower().split() if len(word) > 3):
-                accum_account_id = acc.code
-                accum_account_name = acc.name
-                break
+        with stage_span("counterpart_lookup"):
+            for acc in all_accounts:
+                name_low = acc.name.lower()
+                if ("depreciacion" in name_low or "depreciación" in name_low) and "acumulada" in name_low and any(word in name_low for word in account.name.lower().split() if len(word) > 3):
+                    accum_account_id = acc.code
+                    accum_account_name = acc.name
+                    break
 
         return ProposedTransaction(
             gloss=f"Depreciación Gestión - {account.code} {account.name}",
@@ -1080,19 +2806,17 @@ class ARSDSPyEngine:
     
     def _normalize_string(self, text: str) -> str:
         """Normalizar texto eliminando acentos y convirtiendo a minúsculas"""
-        if not text:
-            return ""
-        # Normalizar unicode (NFD separa caracteres de sus acentos)
-        text = unicodedata.normalize('NFD', text)
-        # Filtrar caracteres de combinación (acentos) y convertir a minúsculas
-        text = ''.join(c for c in text if unicodedata.category(c) != 'Mn').lower()
-        return text
+        return normalize_text(text)
 
     def _fuzzy_find_account(self, accounts: List[Account], keywords: List[str], fallback_code: str, fallback_name: str) -> Tuple[str, str]:
         """
         Búsqueda flexible de cuenta por palabras clave usando Normalización y Scoring.
         Prioriza la mejor coincidencia en lugar de la primera.
         """
+        with stage_span("counterpart_lookup"):
+            return self._fuzzy_find_account_scored(accounts, keywords, fallback_code, fallback_name)
+
+    def _fuzzy_find_account_scored(self, accounts: List[Account], keywords: List[str], fallback_code: str, fallback_name: str) -> Tuple[str, str]:
         best_match = None
         best_score = 0
         
@@ -1252,6 +2976,96 @@ class ARSDSPyEngine:
             audit_trail=audit
         )
     
+    def evaluate_account(self, account: Account, params: AdjustmentParameters) -> EvaluationTrace:
+        """
+        V9.0: Pipeline pre-ARS de una cuenta con una sola clasificación:
+        AITB (trayectoria si está habilitada) -> depreciación sobre saldo + AITB -> provisión
+        """
+        log_event(logging.DEBUG, "account.start", account=account.code, name=account.name, balance=account.balance,
+                  trajectory_mode=params.use_trajectory_mode)
+        classified = self.classify_account_semantic(account)
+        classification, base_confidence, tags, rule = classified
+        
+        # 1. AITB (PoT/AoT) - Executed FIRST to update base for Depreciation
+        with stage_span("aitb"):
+            if params.use_trajectory_mode:
+                aitb = AdjustmentTrace(*self.calculate_aitb_trajectory(account, params, classified))
+            else:
+                aitb = AdjustmentTrace(*self.calculate_aitb_pot(account, params, classified))
+
+        # Depreciación se calcula sobre el valor actualizado (Balance Inicial + AITB)
+        depreciation_base = account.balance + aitb.amount
+        account_for_dep = Account(
+            code=account.code, 
+            name=account.name, 
+            balance=depreciation_base, 
+            type=account.type
+        )
+
+        # 2. DEPRECIACIÓN (PoT) - Executed on adjusted technical balance
+        with stage_span("depreciation"):
+            depreciation = AdjustmentTrace(*self.calculate_depreciation_pot(account_for_dep, params, classified))
+
+        # 3. PROVISIÓN (PoT)
+        with stage_span("provision"):
+            provision = AdjustmentTrace(*self.calculate_provision_pot(account, params, classified))
+
+        return EvaluationTrace(
+            account=account,
+            classification=classification,
+            base_confidence=base_confidence,
+            tags=tags,
+            rule=rule,
+            trajectory_mode=params.use_trajectory_mode,
+            aitb=aitb,
+            depreciation_base=depreciation_base,
+            depreciation=depreciation,
+            provision=provision
+        )
+
+    def evaluate_accounts(self, accounts: List[Account], params: AdjustmentParameters,
+                          company_id: Optional[str] = None) -> List[EvaluationTrace]:
+        """V9.0: evaluate_account para un lote; sus impactos de reglas se atribuyen a company_id al terminar"""
+        outer_spans = _current_spans.get()
+        spans = outer_spans or StageSpans()
+        spans_token = _current_spans.set(spans) if outer_spans is None else None
+        try:
+            with self.rule_hits.request_scope() as hits, spans.span("evaluate_batch"):
+                traces = [self.evaluate_account(account, params) for account in accounts]
+                self.rule_hits.commit(hits, company_id)
+                return traces
+        finally:
+            if spans_token is not None:
+                _current_spans.reset(spans_token)
+                spans.publish()
+
+    def _account_adjustments(self, account: Account, request: AdjustmentRequest,
+                             spans: StageSpans) -> List[Tuple[ProposedTransaction, float, str, str]]:
+        """Ajustes pre-ARS de una cuenta: (asiento, confianza, contador de processing_stats, auditoría)"""
+        account_adjustments = []
+        trace = self.evaluate_account(account, request.parameters)
+        
+        aitb = trace.aitb
+        if aitb.amount > 0.01:
+            with spans.span("transaction_build"):
+                transaction = self._create_aitb_transaction(account, aitb.amount, aitb.confidence, aitb.audit_trail, request.accounts)
+            account_adjustments.append((transaction, aitb.confidence, "aitb_generated", aitb.audit_trail))
+
+        depreciation = trace.depreciation
+        if depreciation.amount > 0.01:
+            with spans.span("transaction_build"):
+                transaction = self._create_depreciation_transaction(account, depreciation.amount, depreciation.confidence,
+                                                                    depreciation.audit_trail, request.accounts)
+            account_adjustments.append((transaction, depreciation.confidence, "depreciation_generated", depreciation.audit_trail))
+
+        provision = trace.provision
+        if provision.amount > 0.01:
+            with spans.span("transaction_build"):
+                transaction = self._create_provision_transaction(account, provision.amount, provision.confidence, provision.audit_trail)
+            account_adjustments.append((transaction, provision.confidence, "provision_generated", provision.audit_trail))
+
+        return account_adjustments
+
     def _generate_concise_reasoning(self, audit_trails: List[str], stats: Dict, confidence: float) -> str:
         """Generar reasoning conciso (shorter CoT)"""
         if not audit_trails:
@@ -1274,23 +3088,74 @@ class ARSDSPyEngine:
 # FASTAPI ENDPOINTS (V3.0 - ARS-DSPy Integration)
 # =============================================================================
 
-# Inicializar motor ARS-DSPy
-engine = ARSDSPyEngine()
+# =============================================================================
+# SINGLETONS PEREZOSOS (Arranque en frío V9.0)
+# =============================================================================
+
+_singletons: Dict[str, Any] = {}
+_singleton_lock = threading.RLock()
+
+def _lazy_singleton(name: str, factory) -> Any:
+    """Construye la instancia global en el primer uso (thread-safe)"""
+    instance = _singletons.get(name)
+    if instance is None:
+        with _singleton_lock:
+            instance = _singletons.get(name)
+            if instance is None:
+                instance = factory()
+                _singletons[name] = instance
+    return instance
+
+# Inicializar motor ARS-DSPy (perezoso)
+def get_engine() -> "ARSDSPyEngine":
+    return _lazy_singleton("engine", ARSDSPyEngine)
+
+def run_generation(request: AdjustmentRequest, profile: Optional[Dict], profile_version: Optional[int],
+                   etag: Optional[str]) -> AdjustmentResponse:
+    """generate_adjustments con el motor del perfil, pasando primero por la caché de resultados"""
+    engine = engine_for_profile(request.company_id, profile, etag) if profile else get_engine()
+    cache = get_result_cache()
+    cache_key = ResultCache.key(request, etag if profile else None, type(engine).__name__) if cache else None
+    cached = cache.get(cache_key) if cache else None
+    if cached is not None:
+        result, hits = cached
+        # El acierto cuenta los mismos impactos SCL que la corrida original (la clave incluye el ETag del perfil)
+        result.processing_stats["rule_hits_flushed"] = engine.rule_hits.commit(hits, request.company_id)
+        result.processing_stats["result_cache"] = "hit"
+        log_event(logging.INFO, "generate.cache_hit", company_id=request.company_id)
+    else:
+        hits: List[Tuple[str, int]] = []
+        result = engine.generate_adjustments(request, hit_log=hits)
+        if cache:
+            cache.put(cache_key, request.company_id, result, hits)
+            result.processing_stats["result_cache"] = "miss"
+    if profile:
+        result.processing_stats["profile_version"] = profile_version
+        result.processing_stats["profile_etag"] = etag
+    return result
 
 @app.post("/api/ai/adjustments/generate", response_model=AdjustmentResponse)
 async def generate_adjustments(request: AdjustmentRequest):
     """Endpoint principal ARS-DSPy para generación de ajustes"""
+    started = time.perf_counter()
     try:
-        print(f"DEBUG: Received request: {request.company_id} with {len(request.accounts)} accounts")
-        # Inicializar motor con perfil dinámico si se proporciona
-        if request.profile_schema:
-            dynamic_engine = ARSDSPyEngine(request.profile_schema)
-            return dynamic_engine.generate_adjustments(request)
-        return engine.generate_adjustments(request)
+        log_event(logging.INFO, "generate.request", company_id=request.company_id, accounts=len(request.accounts))
+        # Inicializar motor con perfil dinámico si se proporciona (V9.0: o por versión/ETag almacenada)
+        profile, profile_version, etag = resolve_request_profile(
+            request.company_id, request.profile_schema, request.profile_version, request.profile_etag
+        )
+        # V9.0: El cálculo corre fuera del event loop; duplicados concurrentes comparten una sola corrida
+        result = await generation_flights.run(
+            request_digest(request, etag if profile else None, "generate"),
+            lambda: asyncio.to_thread(run_generation, request, profile, profile_version, etag),
+            "generate"
+        )
+        record_exchange("generate", request, result, started)
+        return timed_json_response(result)
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"ERROR in generate_adjustments: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("generate.error", extra={"event": "generate.error", "fields": {"error": str(e)}})
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/ai/health")
@@ -1299,69 +3164,60 @@ async def health_check():
     return {
         "status": "healthy", 
         "engine": "AI Adjustment Engine V3.0 (ARS-DSPy)",
-        "ars_enabled": engine.ars_enabled,
+        "ars_enabled": get_engine().ars_enabled,
         "version": "3.0.0"
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """V9.0: Histogramas de etapas del pipeline en formato de texto Prometheus"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/api/ai/adjustments/batch-validate")
-async def batch_validate_transactions(transactions: List[ProposedTransaction]):
-    """Validación por lotes con trazabilidad ARS"""
-    results = []
+async def batch_validate_transactions(transactions: List[ProposedTransaction], invalid_only: bool = False, stream: bool = False):
+    """
+    Validación por lotes con trazabilidad ARS (V9.0: vectorizada en centavos, con balance de comprobación).
+    invalid_only=true devuelve solo los asientos inválidos; stream=true emite NDJSON sin audit_trail.
+    """
+    started = time.perf_counter()
+    confidence_threshold = get_engine().profile.ars_config.confidence_threshold
+    validation = await asyncio.to_thread(BatchValidation, transactions, confidence_threshold)
     
-    for transaction in transactions:
-        # Validar balance
-        total_debit = sum(entry.debit for entry in transaction.entries)
-        total_credit = sum(entry.credit for entry in transaction.entries)
-        
-        is_balanced = abs(total_debit - total_credit) < 0.01
-        
-        # Validar estructura
-        has_debit = any(entry.debit > 0 for entry in transaction.entries)
-        has_credit = any(entry.credit > 0 for entry in transaction.entries)
-        
-        # Validar confianza ARS
-        confidence_valid = bool(transaction.confidence >= engine.profile.ars_config.confidence_threshold)
-        
-        results.append({
-            "gloss": transaction.gloss,
-            "adjustment_type": transaction.adjustment_type,
-            "is_valid": is_balanced and has_debit and has_credit,
-            "confidence_valid": confidence_valid,
-            "total_debit": total_debit,
-            "total_credit": total_credit,
-            "difference": abs(total_debit - total_credit),
-            "entries_count": len(transaction.entries),
-            "audit_trail": transaction.audit_trail,
-            "review_needed": bool(not confidence_valid)
-        })
+    if stream:
+        record_exchange("batch-validate", transactions, validation.summary(), started)
+        return StreamingResponse(validation.ndjson(invalid_only), media_type="application/x-ndjson")
     
-    return {
-        "batch_results": results,
-        "total_transactions": len(transactions),
-        "valid_transactions": sum(1 for r in results if r["is_valid"]),
-        "invalid_transactions": sum(1 for r in results if not r["is_valid"]),
-        "ars_stats": {
-            "high_confidence": sum(1 for r in results if r["confidence_valid"]),
-            "review_needed": sum(1 for r in results if r["review_needed"])
-        }
+    response = {
+        "batch_results": list(validation.rows(invalid_only)),
+        **validation.summary(),
+        "trial_balance": validation.trial_balance()
     }
+    record_exchange("batch-validate", transactions, response, started)
+    return response
 
 class ExplainRequest(BaseModel):
     account: Account
     params: AdjustmentParameters
     profile_schema: Optional[Dict[str, Any]] = None
+    company_id: Optional[str] = None  # V9.0: requerido para profile_version/profile_etag (o params.company_id)
+    profile_version: Optional[int] = None
+    profile_etag: Optional[str] = None
 
 @app.post("/api/ai/adjustments/explain")
 async def explain_adjustment(request: ExplainRequest):
     """Explicación detallada ARS-DSPy del razonamiento"""
-    # Usar motor dinámico si se proporciona perfil
-    current_engine = ARSDSPyEngine(request.profile_schema or {}) if request.profile_schema else engine
+    started = time.perf_counter()
+    # Usar motor dinámico si se proporciona perfil (V9.0: o por versión/ETag almacenada)
+    company_id = request.company_id or request.params.company_id
+    profile, _, etag = resolve_request_profile(company_id, request.profile_schema, request.profile_version, request.profile_etag)
+    current_engine = engine_for_profile(company_id, profile, etag) if profile else get_engine()
     
     account = request.account
-    params = request.params
-    
-    # Clasificación semántica
-    classification, base_confidence, tags, _ = current_engine.classify_account_semantic(account)
+    # V9.0: Misma evaluación que /generate (una clasificación, trayectoria si está habilitada), fuera del event loop
+    # y con sus impactos de reglas atribuidos a esta empresa
+    trace = (await asyncio.to_thread(current_engine.evaluate_accounts, [account], request.params, company_id))[0]
+    threshold = current_engine.profile.ars_config.confidence_threshold
+    rule = trace.rule if isinstance(trace.rule, dict) else {}
     
     explanation = {
         "account": {
@@ -1370,57 +3226,103 @@ async def explain_adjustment(request: ExplainRequest):
             "balance": account.balance
         },
         "classification": {
-            "type": classification,
-            "confidence": base_confidence,
-            "tags": tags
+            "type": trace.classification,
+            "confidence": trace.base_confidence,
+            "tags": trace.tags,
+            "rule": {key: rule[key] for key in ("pattern", "source_nc", "source", "concept", "reason") if key in rule}
         },
         "recommended_adjustments": [],
         "ars_analysis": {
-            "adaptive_confidence": current_engine.calculate_adaptive_confidence(account, "general", base_confidence),
-            "suppression_threshold": current_engine.profile.ars_config.confidence_threshold,
-            "would_be_suppressed": bool(base_confidence < current_engine.profile.ars_config.confidence_threshold)
+            "adaptive_confidence": current_engine.calculate_adaptive_confidence(account, "general", trace.base_confidence, trace.classified),
+            "suppression_threshold": threshold,
+            "would_be_suppressed": bool(trace.base_confidence < threshold)
         }
     }
     
     # Análisis de cada tipo de ajuste
-    dep_result = current_engine.calculate_depreciation_pot(account, params)
-    depreciation_amount, depreciation_confidence, depreciation_audit, _ = dep_result
-    if depreciation_amount > 0.01:
-        explanation["recommended_adjustments"].append({
-            "type": "depreciacion",
-            "amount": depreciation_amount,
-            "confidence": depreciation_confidence,
-            "reasoning": depreciation_audit,
-            "entry": "Gasto por Depreciación / Depreciación Acumulada"
-        })
-
-    aitb_result = current_engine.calculate_aitb_pot(account, params)
-    aitb_amount, aitb_confidence, aitb_audit, _ = aitb_result
-    if aitb_amount > 0.01:
-        explanation["recommended_adjustments"].append({
-            "type": "ajuste_inflacion",
-            "amount": aitb_amount,
-            "confidence": aitb_confidence,
-            "reasoning": aitb_audit,
-            "entry": "Gasto por Ajuste por Inflación / Cuenta ajustada"
-        })
-
-    provision_result = current_engine.calculate_provision_pot(account, params)
-    provision_amount, provision_confidence, provision_audit, _ = provision_result
-    if provision_amount > 0.01:
-        explanation["recommended_adjustments"].append({
-            "type": "provision",
-            "amount": provision_amount,
-            "confidence": provision_confidence,
-            "reasoning": provision_audit,
-            "entry": "Gasto por Provisión / Provisión Acumulada"
-        })
+    for adjustment_type, adjustment, entry in (
+        ("depreciacion", trace.depreciation, "Gasto por Depreciación / Depreciación Acumulada"),
+        ("ajuste_inflacion", trace.aitb, "Gasto por Ajuste por Inflación / Cuenta ajustada"),
+        ("provision", trace.provision, "Gasto por Provisión / Provisión Acumulada")
+    ):
+        if adjustment.amount > 0.01:
+            details = adjustment.details
+            if adjustment is trace.depreciation:
+                details["base"] = trace.depreciation_base
+            explanation["recommended_adjustments"].append({
+                "type": adjustment_type,
+                "amount": adjustment.amount,
+                "confidence": adjustment.confidence,
+                "reasoning": adjustment.audit_trail,
+                "entry": entry,
+                "details": details
+            })
     
+    record_exchange("explain", request, explanation, started)
     return explanation
 
+class BatchExplainRequest(BaseModel):
+    accounts: List[Account]
+    params: AdjustmentParameters
+    profile_schema: Optional[Dict[str, Any]] = None
+    company_id: Optional[str] = None
+    profile_version: Optional[int] = None
+    profile_etag: Optional[str] = None
+    offset: int = Field(0, ge=0, description="Primera cuenta de la página")
+    limit: Optional[int] = Field(None, ge=1, description="Cuentas por página (None = todas desde offset)")
+
+# Columnas de montos de explain-batch (mismos tipos que recommended_adjustments de /explain)
+BATCH_EXPLAIN_AMOUNTS = (("depreciacion", "depreciation"), ("ajuste_inflacion", "aitb"), ("provision", "provision"))
+
+@app.post("/api/ai/adjustments/explain-batch")
+async def explain_adjustments_batch(request: BatchExplainRequest):
+    """
+    V9.0: /explain para un plan completo en una sola llamada: un perfil, un motor y una pasada.
+    Respuesta columnar (una lista por campo, alineadas por índice) y paginable con offset/limit.
+    """
+    started = time.perf_counter()
+    company_id = request.company_id or request.params.company_id
+    profile, profile_version, etag = resolve_request_profile(company_id, request.profile_schema, request.profile_version, request.profile_etag)
+    current_engine = engine_for_profile(company_id, profile, etag) if profile else get_engine()
+    threshold = current_engine.profile.ars_config.confidence_threshold
+
+    total = len(request.accounts)
+    end = total if request.limit is None else min(total, request.offset + request.limit)
+    page = request.accounts[request.offset:end]
+    traces = await asyncio.to_thread(current_engine.evaluate_accounts, page, request.params, company_id)
+
+    columns: Dict[str, List[Any]] = {
+        "code": [t.account.code for t in traces],
+        "name": [t.account.name for t in traces],
+        "classification": [t.classification for t in traces],
+        "confidence": [t.base_confidence for t in traces],
+        "tags": [t.tags for t in traces],
+        "would_be_suppressed": [bool(t.base_confidence < threshold) for t in traces]
+    }
+    for column, field in BATCH_EXPLAIN_AMOUNTS:
+        adjustments = [getattr(t, field) for t in traces]
+        columns[column] = [a.amount if a.amount > 0.01 else 0.0 for a in adjustments]
+        columns[f"{column}_confidence"] = [a.confidence if a.amount > 0.01 else 0.0 for a in adjustments]
+
+    response = {
+        "total_accounts": total,
+        "offset": request.offset,
+        "limit": request.limit,
+        "returned": len(traces),
+        "next_offset": end if end < total else None,
+        "suppression_threshold": threshold,
+        "trajectory_mode": request.params.use_trajectory_mode,
+        "profile_version": profile_version,
+        "profile_etag": etag,
+        "columns": columns
+    }
+    record_exchange("explain-batch", request, response, started)
+    return response
+
 @app.get("/api/ai/adjustments/config")
 async def get_adjustment_config():
     """Configuración actual del motor ARS-DSPy"""
+    engine = get_engine()
     return {
         "engine_version": "3.0.0 (ARS-DSPy)",
         "ars_config": {
@@ -1456,105 +3358,124 @@ async def get_adjustment_config():
 # INTEGRACIÓN CON MIDDLEWARE (Obtención de saldos pre-ajuste)
 # =============================================================================
 
+async def _ledger_generation(request: AdjustmentRequest, profile: Optional[Dict], profile_version: Optional[int],
+                             etag: Optional[str], started: float) -> AdjustmentResponse:
+    """Descarga del mayor + generación (una sola vez por grupo de peticiones coalescidas)"""
+    # Importar cliente para obtener saldos del middleware
+    import httpx
+    api_url = os.getenv("API_BASE_URL", "http://localhost:3001")
+    
+    # Obtener saldos pre-ajuste desde middleware Node.js
+    async with httpx.AsyncClient() as client:
+        ledger_response = await client.get(
+            f"{api_url}/api/reports/ledger",
+            params={
+                "companyId": request.company_id,
+                "excludeAdjustments": True,
+                "excludeClosing": True
+            },
+            timeout=30.0
+        )
+        
+        if ledger_response.status_code != 200:
+            raise HTTPException(
+                status_code=503, 
+                detail="No se pudieron obtener los saldos del middleware"
+            )
+        
+        ledger_data = ledger_response.json()
+        accounts_from_ledger = ledger_data.get("data", [])
+        log_event(logging.INFO, "ledger.fetched", accounts=len(accounts_from_ledger))
+        
+        # ⚡ V6.5 FIX: Fetch ALL accounts (Chart of Accounts) for matching expense accounts
+        chart_of_accounts = []
+        try:
+            coa_response = await client.get(
+                f"{api_url}/api/accounts",
+                params={"companyId": request.company_id},
+                timeout=10.0
+            )
+            if coa_response.status_code == 200:
+                coa_data = coa_response.json()
+                chart_of_accounts = coa_data.get("data", [])
+                log_event(logging.INFO, "ledger.coa_fetched", accounts=len(chart_of_accounts))
+        except Exception as e:
+            log_event(logging.WARNING, "ledger.coa_error", error=str(e))
+
+        # Mapear cuentas del ledger a formato Account (para análisis de saldos)
+        mapped_accounts = []
+        for ledger_account in accounts_from_ledger:
+            if ledger_account.get("balance", 0) != 0:  # Solo cuentas con saldo
+                mapped_accounts.append(Account(
+                    code=ledger_account["code"],
+                    name=ledger_account["name"],
+                    balance=abs(ledger_account["balance"]),
+                    type=ledger_account.get("type")
+                ))
+        
+        # Crear lista extendida de TODAS las cuentas para el engine (para búsquedas de contrapartidas)
+        full_account_list = []
+        # Primero las de saldos reales
+        full_account_list.extend(mapped_accounts)
+        # Luego las del plan de cuentas que no están en el ledger
+        ledger_codes = {a.code for a in mapped_accounts}
+        for coa_acc in chart_of_accounts:
+            code = coa_acc.get("code")
+            if code and code not in ledger_codes:
+                full_account_list.append(Account(
+                    code=code,
+                    name=coa_acc.get("name", ""),
+                    balance=0.0,
+                    type=coa_acc.get("type")
+                ))
+
+        log_event(logging.INFO, "ledger.mapped", with_balance=len(mapped_accounts), universe=len(full_account_list))
+
+        # ⚡ V6.5 CRÍTICO: Reemplazar cuentas del request con el UNIVERSO COMPLETO
+        # Esto permite que las búsquedas de contrapartidas (ej. Gasto por Depreciación)
+        # funcionen incluso si la cuenta de gasto tiene saldo 0.
+        # El motor generate_adjustments saltará las de saldo 0 para procesamiento,
+        # pero las usará como catálogo para matching.
+        request.accounts = full_account_list
+        
+        # V6.0 FIX: Usar motor dinámico con perfil inyectado para respetar reglas aprendidas
+        # V9.0: El mayor se consulta siempre (fuente de verdad); un mayor sin cambios reutiliza el resultado
+        if profile:
+            log_event(logging.INFO, "ledger.dynamic_profile", monetary_rules=len(profile.get('monetary_rules', [])),
+                      non_monetary_rules=len(profile.get('non_monetary_rules', [])))
+        result = await asyncio.to_thread(run_generation, request, profile, profile_version, etag)
+        
+        # Agregar metadata de integración
+        result.processing_stats["ledger_integration"] = {
+            "accounts_from_ledger": len(accounts_from_ledger),
+            "accounts_with_balance": len(mapped_accounts),
+            "middleware_source": "Node.js API"
+        }
+        
+        # Se graba la petición ya expandida con el mayor: reproducible sin el middleware
+        record_exchange("generate-from-ledger", request, result, started)
+        return result
+
 @app.post("/api/ai/adjustments/generate-from-ledger")
 async def generate_from_ledger(request: AdjustmentRequest):
     """Generar ajustes obteniendo saldos automáticamente desde middleware"""
+    started = time.perf_counter()
     try:
-        # Importar cliente para obtener saldos del middleware
-        import httpx
-        
-        # Obtener saldos pre-ajuste desde middleware Node.js
-        async with httpx.AsyncClient() as client:
-            ledger_response = await client.get(
-                "`${API_URL}/api/reports/ledger",
-                params={
-                    "companyId": request.company_id,
-                    "excludeAdjustments": True,
-                    "excludeClosing": True
-                },
-                timeout=30.0
-            )
-            
-            if ledger_response.status_code != 200:
-                raise HTTPException(
-                    status_code=503, 
-                    detail="No se pudieron obtener los saldos del middleware"
-                )
-            
-            ledger_data = ledger_response.json()
-            accounts_from_ledger = ledger_data.get("data", [])
-            print(f"DEBUG: Fetched {len(accounts_from_ledger)} accounts from Ledger API")
-            
-            # ⚡ V6.5 FIX: Fetch ALL accounts (Chart of Accounts) for matching expense accounts
-            chart_of_accounts = []
-            try:
-                coa_response = await client.get(
-                    f"`${API_URL}/api/accounts",
-                    params={"companyId": request.company_id},
-                    timeout=10.0
-                )
-                if coa_response.status_code == 200:
-                    coa_data = coa_response.json()
-                    chart_of_accounts = coa_data.get("data", [])
-                    print(f"DEBUG: Fetched {len(chart_of_accounts)} accounts from Chart of Accounts API")
-            except Exception as e:
-                print(f"WARN Error fetching CoA: {str(e)}")
-
-            # Mapear cuentas del ledger a formato Account (para análisis de saldos)
-            mapped_accounts = []
-            for ledger_account in accounts_from_ledger:
-                if ledger_account.get("balance", 0) != 0:  # Solo cuentas con saldo
-                    mapped_accounts.append(Account(
-                        code=ledger_account["code"],
-                        name=ledger_account["name"],
-                        balance=abs(ledger_account["balance"]),
-                        type=ledger_account.get("type")
-                    ))
-            
-            # Crear lista extendida de TODAS las cuentas para el engine (para búsquedas de contrapartidas)
-            full_account_list = []
-            # Primero las de saldos reales
-            full_account_list.extend(mapped_accounts)
-            # Luego las del plan de cuentas que no están en el ledger
-            ledger_codes = {a.code for a in mapped_accounts}
-            for coa_acc in chart_of_accounts:
-                code = coa_acc.get("code")
-                if code and code not in ledger_codes:
-                    full_account_list.append(Account(
-                        code=code,
-                        name=coa_acc.get("name", ""),
-                        balance=0.0,
-                        type=coa_acc.get("type")
-                    ))
-
-            print(f"DEBUG: Mapped {len(mapped_accounts)} valid accounts with balance")
-            print(f"DEBUG: Total account universe for matching: {len(full_account_list)}")
-
-            # ⚡ V6.5 CRÍTICO: Reemplazar cuentas del request con el UNIVERSO COMPLETO
-            # Esto permite que las búsquedas de contrapartidas (ej. Gasto por Depreciación)
-            # funcionen incluso si la cuenta de gasto tiene saldo 0.
-            # El motor generate_adjustments saltará las de saldo 0 para procesamiento,
-            # pero las usará como catálogo para matching.
-            request.accounts = full_account_list
-            
-            # V6.0 FIX: Usar motor dinámico con perfil inyectado para respetar reglas aprendidas
-            if request.profile_schema:
-                print(f"🔄 [generate-from-ledger] Usando perfil dinámico con {len(request.profile_schema.get('monetary_rules', []))} reglas M, {len(request.profile_schema.get('non_monetary_rules', []))} reglas NM")
-                dynamic_engine = ARSDSPyEngine(request.profile_schema)
-                result = dynamic_engine.generate_adjustments(request)
-            else:
-                result = engine.generate_adjustments(request)
-            
-            # Agregar metadata de integración
-            result.processing_stats["ledger_integration"] = {
-                "accounts_from_ledger": len(accounts_from_ledger),
-                "accounts_with_balance": len(mapped_accounts),
-                "middleware_source": "Node.js API"
-            }
-            
-            return result
+        # V9.0: Resolver el perfil antes de ir al middleware (un miss no debe costar la descarga del mayor)
+        profile, profile_version, etag = resolve_request_profile(
+            request.company_id, request.profile_schema, request.profile_version, request.profile_etag
+        )
+        # Pestañas abiertas a la vez en la misma empresa: una sola descarga del mayor y una sola corrida
+        result = await generation_flights.run(
+            request_digest(request, etag, "generate-from-ledger"),
+            lambda: _ledger_generation(request, profile, profile_version, etag, started),
+            "generate-from-ledger"
+        )
+        return timed_json_response(result)
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error en integración ledger: {str(e)}")
+        log_event(logging.ERROR, "ledger.error", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
             
 # =============================================================================
@@ -1580,6 +3501,8 @@ class FeedbackRequest(BaseModel):
     is_global_adaptation: bool = False
     total_assets: float = 0.0 # For Materiality Integrity Check
     existing_profile: Optional[Dict[str, Any]] = None  # V6.0: Perfil existente de la DB
+    profile_version: Optional[int] = None  # V9.0: Perfil almacenado en el motor (alternativa a existing_profile)
+    profile_etag: Optional[str] = None
 
 class LearningResponse(BaseModel):
     success: bool
@@ -1588,6 +3511,8 @@ class LearningResponse(BaseModel):
     updated_profile_schema: Dict[str, Any]
     warnings: List[str] = []
     adaptation_details: Optional[Dict[str, Any]] = Field(None, description="Detalles completos de la regla generada por la adaptación")
+    profile_version: Optional[int] = Field(None, description="Versión almacenada del perfil actualizado")
+    profile_etag: Optional[str] = Field(None, description="ETag del perfil actualizado")
 
 class HardRulesValidator:
     """Sello de Contención 1: Sanidad Contable Inmutable (V5.0)"""
@@ -1631,9 +3556,8 @@ class MahoragaEngine(ARSDSPyEngine):
     - Fase 3: Optimización de Energía (Ajuste de pesos de confianza)
     """
     
-    # Historial de Eventos (V6.0 - Granular con Provenance)
-    adaptation_events = []
-    adaptation_snapshots = []  # Para rollback
+    # Snapshots para rollback (V9.0: los eventos viven en AdaptationEventLog, no en el perfil)
+    adaptation_snapshots = []
 
     def verify_cycle_integrity(self, feedback: 'FeedbackRequest') -> Tuple[bool, str]:
         """
@@ -1758,60 +3682,29 @@ class MahoragaEngine(ARSDSPyEngine):
             "user_comment": feedback.user_comment,
             "phase": "Tekiō-2" # Indica que pasó a Fase 2
         }
-        if "adaptation_events" not in profile_data:
-            profile_data["adaptation_events"] = []
-        profile_data["adaptation_events"].append(adaptation_event)
+        # V9.0: Registro acotado e indexado fuera del perfil; se migran los eventos heredados del perfil.
+        # Los eventos solo salen del perfil si quedaron en un registro durable; si no, vuelven a él.
+        legacy_events = profile_data.get("adaptation_events") or []
+        try:
+            event_log = get_event_log()
+            event_log.append(feedback.company_id, legacy_events + [adaptation_event])
+            migrated = event_log.durable
+        except sqlite3.Error as e:
+            print(f"WARN No se pudo registrar el evento {event_id}: {e}")
+            migrated = False
+        if migrated:
+            profile_data.pop("adaptation_events", None)
+        else:
+            profile_data["adaptation_events"] = legacy_events + [adaptation_event]
         
         # ═══════════════════════════════════════════════════════════════════
         # FASE 2: CONTRA-ESTRATEGIA (Tekiō) - Eliminación + Inyección
         # ═══════════════════════════════════════════════════════════════════
         if feedback.error_tag in [FeedbackErrorTag.MISCLASSIFIED_ACCOUNT, FeedbackErrorTag.USER_OVERRIDE] and feedback.correct_type:
             
-            # 2.1: Escapar nombre para regex seguro
-            account_name_escaped = re.escape(feedback.account_name)
-            
-            # 2.2: Generar patrones (local = exacto, global = substring)
-            local_pattern = f"^{account_name_escaped}$"
-            global_pattern = f".*{account_name_escaped}.*"
-            
-            # 2.3: CONTRA-ESTRATEGIA MAHORAGA V6.0
-            # Eliminar CUALQUIER regla conflictiva en AMBAS listas
-            conflicting_rules_removed = 0
-            for rule_list_name in ["monetary_rules", "non_monetary_rules"]:
-                if rule_list_name in profile_data:
-                    original_count = len(profile_data[rule_list_name])
-                    profile_data[rule_list_name] = [
-                        rule for rule in profile_data[rule_list_name]
-                        if rule.get("pattern") not in [local_pattern, global_pattern]
-                        and account_name_escaped.lower() not in rule.get("pattern", "").lower()
-                    ]
-                    conflicting_rules_removed += original_count - len(profile_data[rule_list_name])
-
-            # 2.4: Crear la nueva regla con MÁXIMA CONFIANZA
-            pattern = global_pattern if feedback.is_global_adaptation else local_pattern
-            new_rule = {
-                "pattern": pattern,
-                "tags": [self._map_type_to_tag(feedback.correct_type)],
-                "source_nc": "Mahoraga-SCL-Adaptation",
-                "confidence_weight": 5.0,  # Peso supremo para override inmediato
-                "reasoning_weight": 2.0,   # Doble peso en razonamiento
-                "adaptation_timestamp": datetime.now().timestamp(),
-                "provenance": {
-                    "event_id": event_id,
-                    "user": feedback.user,
-                    "reason": feedback.user_comment or "User Override",
-                    "error_tag": feedback.error_tag.value,
-                    "original_trans": feedback.origin_trans,
-                },
-                "hit_count": 0,
-                "last_hit": None
-            }
-            
-            # 2.5: Insertar al INICIO de la lista correcta (máxima prioridad)
-            target_list = "non_monetary_rules" if feedback.correct_type == "non_monetary" else "monetary_rules"
-            if target_list not in profile_data:
-                profile_data[target_list] = []
-            profile_data[target_list].insert(0, new_rule)
+            new_rule, target_list = self.build_adaptation_rule(feedback, event_id)
+            pattern = new_rule["pattern"]
+            conflicting_rules_removed = self.apply_adaptation_rule(profile_data, feedback, new_rule, target_list)
             
             # ═══════════════════════════════════════════════════════════════
             # TRANSPARENCIA COGNITIVA V6.0 (Mensaje detallado para Frontend)
@@ -1864,7 +3757,7 @@ class MahoragaEngine(ARSDSPyEngine):
                 new_rule_generated=f"Cuenta '{feedback.account_name}' marcada para supresión automática.",
                 updated_profile_schema=profile_data,
                 warnings=warnings,
-                adaptation_details={"suppression_rule": suppression_rule}
+                adaptation_details={"suppression_rule": suppression_rule, "event_id": event_id}
             )
             
         return LearningResponse(
@@ -1872,76 +3765,696 @@ class MahoragaEngine(ARSDSPyEngine):
             adaptation_level="Sin Acción (Tag no reconocido)", 
             warnings=["Tag de error no reconocido o tipo de corrección faltante"], 
             updated_profile_schema=profile_data,
-            adaptation_details=None
+            adaptation_details={"event_id": event_id}
         )
 
+    def build_adaptation_rule(self, feedback: 'FeedbackRequest', event_id: str) -> Tuple[Dict, str]:
+        """Fase 2.1-2.4: Construye la regla SCL suprema para un feedback y su lista destino"""
+        # 2.1: Escapar nombre para regex seguro
+        account_name_escaped = re.escape(feedback.account_name)
+        
+        # 2.2: Generar patrones (local = exacto, global = substring)
+        pattern = f".*{account_name_escaped}.*" if feedback.is_global_adaptation else f"^{account_name_escaped}$"
+        
+        # 2.4: Crear la nueva regla con MÁXIMA CONFIANZA
+        new_rule = {
+            "pattern": pattern,
+            "tags": [self._map_type_to_tag(feedback.correct_type)],
+            "source_nc": "Mahoraga-SCL-Adaptation",
+            "confidence_weight": 5.0,  # Peso supremo para override inmediato
+            "reasoning_weight": 2.0,   # Doble peso en razonamiento
+            "adaptation_timestamp": datetime.now().timestamp(),
+            "provenance": {
+                "event_id": event_id,
+                "user": feedback.user,
+                "reason": feedback.user_comment or "User Override",
+                "error_tag": feedback.error_tag.value,
+                "original_trans": feedback.origin_trans,
+            },
+            "hit_count": 0,
+            "last_hit": None
+        }
+        target_list = "non_monetary_rules" if feedback.correct_type == "non_monetary" else "monetary_rules"
+        return new_rule, target_list
+
+    def apply_adaptation_rule(self, profile_data: Dict, feedback: 'FeedbackRequest', new_rule: Dict, target_list: str) -> int:
+        """
+        Fase 2.3/2.5: Elimina reglas conflictivas en AMBAS listas e inserta la nueva regla al INICIO
+        de la lista destino. Muta profile_data (listas nuevas) y devuelve el número de reglas eliminadas.
+        """
+        account_name_escaped = re.escape(feedback.account_name)
+        local_pattern = f"^{account_name_escaped}$"
+        global_pattern = f".*{account_name_escaped}.*"
+        
+        # 2.3: CONTRA-ESTRATEGIA MAHORAGA V6.0
+        # Eliminar CUALQUIER regla conflictiva en AMBAS listas
+        conflicting_rules_removed = 0
+        for rule_list_name in ["monetary_rules", "non_monetary_rules"]:
+            if rule_list_name in profile_data:
+                original_count = len(profile_data[rule_list_name])
+                profile_data[rule_list_name] = [
+                    rule for rule in profile_data[rule_list_name]
+                    if rule.get("pattern") not in [local_pattern, global_pattern]
+                    and account_name_escaped.lower() not in rule.get("pattern", "").lower()
+                ]
+                conflicting_rules_removed += original_count - len(profile_data[rule_list_name])
+        
+        # 2.5: Insertar al INICIO de la lista correcta (máxima prioridad)
+        profile_data[target_list] = [new_rule] + list(profile_data.get(target_list, []))
+        return conflicting_rules_removed
+
+    def evaluate_adaptation_impact(self, candidate_profile: Dict, accounts: List[Account], params: AdjustmentParameters) -> Dict[str, Any]:
+        """
+        🔍 EVALUACIÓN SOMBRA (V9.0): Compara el perfil actual contra un perfil candidato sobre todo el universo de cuentas.
+        Solo las cuentas que tocan un patrón SCL añadido o retirado pueden cambiar de clasificación; para ellas
+        se clasifica con ambos perfiles y los montos AITB/depreciación se calculan en un único pase vectorizado.
+        """
+        start = time.perf_counter()
+        candidate = ARSDSPyEngine(candidate_profile)
+
+        def scl_signatures(profile: AdjustmentProfileSchema) -> Dict[Tuple, Any]:
+            return {
+                (rule_type, rule.get("pattern", ""), tuple(rule.get("tags", []))): regex
+                for rule_type, matchers in profile.scl_matchers.items()
+                for _, regex, rule in matchers
+            }
+        old_sigs, new_sigs = scl_signatures(self.profile), scl_signatures(candidate.profile)
+        changed = {sig: rx for sig, rx in {**old_sigs, **new_sigs}.items() if (sig in old_sigs) != (sig in new_sigs)}
+        changed_regexes = list(changed.values())
+
+        affected = [a for a in accounts if any(rx.search(a.name) for rx in changed_regexes)]
+        # Los hits sombra van a búferes que se descartan: nunca llegan a las reglas ni al sidecar
+        with self.rule_hits.request_scope(), candidate.rule_hits.request_scope():
+            before = [self.classify_account_semantic(a) for a in affected]
+            after = [candidate.classify_account_semantic(a) for a in affected]
+
+        # Base AITB independiente de la clasificación (saldo x (CC-1) o magnitud de trayectoria AoT)
+        balances = np.array([a.balance for a in affected], dtype=float)
+        positive = balances > 0
+        cc = 1.0
+        if params.method == "UFV" and params.ufv_initial != 0:
+            cc = params.ufv_final / params.ufv_initial
+        aitb_base = np.asarray(resolve_compute_backend(params.compute_backend).aitb_amounts(balances, cc), dtype=float) \
+            if cc > 1.000001 else np.zeros(len(affected))
+        if params.use_trajectory_mode:
+            for i, account in enumerate(affected):
+                raw_trajectory = (params.ledger_trajectories or {}).get(account.code, [])
+                if raw_trajectory and positive[i]:
+                    aitb_base[i] = self._trajectory_atoms(account, params, raw_trajectory)[0]
+
+        # Tasa x factor de prorrateo por cuenta (la configuración de activos es común a ambos perfiles)
+        dep_rates = np.zeros(len(affected))
+        for i, account in enumerate(affected):
+            if not positive[i]:
+                continue
+            if any(cls == "non_monetary" and "Depreciable" in tags for cls, _, tags, _ in (before[i], after[i])):
+                config = self._resolve_depreciation_config(account.name)
+                if config:
+                    dep_rates[i] = config.annual_rate * self._depreciation_proration(account, params)[0]
+
+        def amounts(results: List[Tuple]) -> Tuple[Any, Any]:
+            non_monetary = np.array([r[0] != "monetary" for r in results], dtype=bool)
+            depreciable = np.array([r[0] == "non_monetary" and "Depreciable" in r[2] for r in results], dtype=bool)
+            aitb = np.where(non_monetary & positive, aitb_base, 0.0)
+            dep = np.where(depreciable & positive, (balances + aitb) * dep_rates, 0.0)
+            # Solo se emiten asientos por montos > 0.01, redondeados a centavos (igual que generate_adjustments)
+            return np.round(np.where(aitb > 0.01, aitb, 0.0), 2), np.round(np.where(dep > 0.01, dep, 0.0), 2)
+
+        aitb_before, dep_before = amounts(before)
+        aitb_after, dep_after = amounts(after)
+        aitb_delta = aitb_after - aitb_before
+        dep_delta = dep_after - dep_before
+
+        reclassified = []
+        for i, account in enumerate(affected):
+            old_cls, _, old_tags, _ = before[i]
+            new_cls, _, new_tags, _ = after[i]
+            if (old_cls, list(old_tags)) == (new_cls, list(new_tags)):
+                continue
+            reclassified.append({
+                "code": account.code,
+                "name": account.name,
+                "balance": account.balance,
+                "before": {"classification": old_cls, "tags": list(old_tags)},
+                "after": {"classification": new_cls, "tags": list(new_tags)},
+                "aitb_delta": round(float(aitb_delta[i]), 2),
+                "depreciation_delta": round(float(dep_delta[i]), 2)
+            })
+
+        return {
+            "accounts_evaluated": len(accounts),
+            "accounts_affected": len(affected),
+            "reclassified_count": len(reclassified),
+            "reclassified": reclassified,
+            "changed_patterns": [{"rule_list": sig[0], "pattern": sig[1], "added": sig in new_sigs} for sig in changed],
+            "deltas": {
+                "aitb_before": round(float(aitb_before.sum()), 2),
+                "aitb_after": round(float(aitb_after.sum()), 2),
+                "aitb_delta": round(float(aitb_delta.sum()), 2),
+                "depreciation_before": round(float(dep_before.sum()), 2),
+                "depreciation_after": round(float(dep_after.sum()), 2),
+                "depreciation_delta": round(float(dep_delta.sum()), 2)
+            },
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)
+        }
+
     def find_pattern_candidates(self, rules: List[Dict]) -> Optional[str]:
-        """Fase 3: Generalización de Patrones (Heurística simple)"""
-        # Si hay más de 2 reglas locales que comparten un prefijo común
-        patterns = [r["pattern"].strip("^$") for r in rules if r.get("confidence_weight", 0) > 2.0]
-        if len(patterns) >= 3:
-            # Encontrar prefijo común
-            prefix = os.path.commonprefix(patterns)
-            if len(prefix) > 5: # Prefijo significativo
-                return prefix
-        return None
+        """Fase 3: Generalización de Patrones (V9.0: prefijo de tokens del trie con mayor cobertura)"""
+        proposals = self.propose_generalizations(rules)
+        if not proposals:
+            return None
+        return max(proposals, key=lambda p: len(p["members"]))["pattern"]
+
+    @staticmethod
+    def _literal_rule_name(pattern: str) -> Optional[str]:
+        """Devuelve el nombre literal de una regla local ^nombre$ (None si el patrón no es literal)"""
+        if not (pattern.startswith("^") and pattern.endswith("$")) or len(pattern) < 3:
+            return None
+        body = pattern[1:-1]
+        name = re.sub(r"\\(.)", r"\1", body)
+        return name if re.escape(name) == body else None
+
+    def _build_rule_trie(self, rules: List[Dict], rule_indices: List[int]) -> Dict:
+        """Trie de tokens normalizados sobre los nombres de reglas locales; cada nodo guarda los miembros de su subárbol"""
+        root = {"children": {}, "members": [], "depth": 0}
+        for idx in rule_indices:
+            tokens = self._literal_rule_name(rules[idx]["pattern"]).split()
+            node = root
+            for token in tokens:
+                node = node["children"].setdefault(
+                    self._normalize_string(token), {"children": {}, "members": [], "depth": node["depth"] + 1}
+                )
+                node["members"].append(idx)
+        return root
+
+    def _prefix_pattern(self, rules: List[Dict], members: List[int], depth: int) -> str:
+        """Regex ^tok1\\s+tok2(?:\\s|$) para el prefijo común (alternativas si difieren acentos/mayúsculas)"""
+        token_regexes = []
+        for position in range(depth):
+            variants = sorted({self._literal_rule_name(rules[i]["pattern"]).split()[position].lower() for i in members})
+            escaped = [re.escape(v) for v in variants]
+            token_regexes.append(escaped[0] if len(escaped) == 1 else f"(?:{'|'.join(escaped)})")
+        return "^" + r"\s+".join(token_regexes) + r"(?:\s|$)"
+
+    def propose_generalizations(self, rules: List[Dict], min_cluster: int = 3, min_prefix_chars: int = 6) -> List[Dict]:
+        """
+        Agrupa reglas locales ^nombre$ (peso > 2.0, mismas etiquetas) por prefijo de tokens en un trie
+        y propone un patrón fusionado por cada nodo con al menos min_cluster miembros.
+        Las propuestas se ordenan de la más amplia (nodo más superficial) a la más específica.
+        """
+        clusters: Dict[Tuple[str, ...], List[int]] = {}
+        for idx, rule in enumerate(rules):
+            if rule.get("confidence_weight", 0) > 2.0 and self._literal_rule_name(rule.get("pattern", "")):
+                clusters.setdefault(tuple(rule.get("tags", [])), []).append(idx)
+
+        proposals = []
+        for tags, indices in clusters.items():
+            if len(indices) < min_cluster:
+                continue
+            pending = list(self._build_rule_trie(rules, indices)["children"].values())
+            while pending:
+                node = pending.pop(0)
+                if len(node["members"]) < min_cluster:
+                    continue
+                pattern = self._prefix_pattern(rules, node["members"], node["depth"])
+                prefix_len = sum(len(self._literal_rule_name(rules[node["members"][0]]["pattern"]).split()[i]) for i in range(node["depth"]))
+                if prefix_len >= min_prefix_chars:
+                    proposals.append({"pattern": pattern, "members": list(node["members"]), "tags": list(tags), "depth": node["depth"]})
+                pending.extend(node["children"].values())
+        return sorted(proposals, key=lambda p: p["depth"])
+
+    def generalize_rules(self, chart_accounts: List[Account], min_cluster: int = 3) -> Dict[str, Any]:
+        """
+        ⚡ Fase 3 V9.0: Generalización verificada de reglas aprendidas.
+        Cada propuesta del trie se acepta solo si TODAS las cuentas del plan conservan
+        su clasificación y etiquetas (solo se reevalúan las cuentas que tocan los patrones cambiados).
+        """
+        working = {**self.profile.profile_data}
+        for rule_list_name in ["monetary_rules", "non_monetary_rules"]:
+            working[rule_list_name] = list(working.get(rule_list_name, []))
+        rules_before = len(working["monetary_rules"]) + len(working["non_monetary_rules"])
+        accepted, rejected = [], []
+
+        for rule_list_name in ["monetary_rules", "non_monetary_rules"]:
+            rejected_patterns = set()
+            progressed = True
+            # Tras cada fusión aceptada los índices cambian: se recalculan las propuestas hasta punto fijo
+            while progressed:
+                progressed = False
+                for proposal in self.propose_generalizations(working[rule_list_name], min_cluster=min_cluster):
+                    if proposal["pattern"] in rejected_patterns:
+                        continue
+                    rules = working[rule_list_name]
+                    members = proposal["members"]
+                    member_rules = [rules[i] for i in members]
+                    merged_rule = {
+                        "pattern": proposal["pattern"],
+                        "tags": list(member_rules[0].get("tags", [])),
+                        "source_nc": "Mahoraga-SCL-Adaptation",
+                        "confidence_weight": max(r.get("confidence_weight", 5.0) for r in member_rules),
+                        "reasoning_weight": max(r.get("reasoning_weight", 2.0) for r in member_rules),
+                        "adaptation_timestamp": datetime.now().timestamp(),
+                        "provenance": {
+                            "event_id": f"GEN-{datetime.now().strftime('%Y%m%d%H%M%S%f')}",
+                            "reason": f"Generalización Trie ({len(member_rules)} reglas)",
+                            "merged_patterns": [r["pattern"] for r in member_rules],
+                            "merged_event_ids": [r.get("provenance", {}).get("event_id") for r in member_rules]
+                        },
+                        "hit_count": sum(r.get("hit_count") or 0 for r in member_rules),
+                        "last_hit": max((r.get("last_hit") for r in member_rules if r.get("last_hit")), default=None)
+                    }
+
+                    # Lista candidata: la regla fusionada ocupa la posición del primer miembro
+                    first, member_set = min(members), set(members)
+                    candidate_list = []
+                    for i, rule in enumerate(rules):
+                        if i == first:
+                            candidate_list.append(merged_rule)
+                        elif i not in member_set:
+                            candidate_list.append(rule)
+                    candidate = {**working, rule_list_name: candidate_list}
+
+                    # Solo pueden cambiar las cuentas que tocan el patrón nuevo o alguno de los retirados
+                    changed_regexes = [re.compile(merged_rule["pattern"], re.IGNORECASE)] + [
+                        re.compile(r["pattern"], re.IGNORECASE) for r in member_rules
+                    ]
+                    affected = [a for a in chart_accounts if any(rx.search(a.name) for rx in changed_regexes)]
+                    old_engine = ARSDSPyEngine(working)
+                    new_engine = ARSDSPyEngine(candidate)
+                    conflicts = []
+                    # Clasificación de verificación: sus hits se descartan (no son uso real de las reglas)
+                    with old_engine.rule_hits.request_scope(), new_engine.rule_hits.request_scope():
+                        classified = [(account, old_engine.classify_account_semantic(account), new_engine.classify_account_semantic(account))
+                                      for account in affected]
+                    for account, (old_cls, _, old_tags, _), (new_cls, _, new_tags, _) in classified:
+                        if (old_cls, list(old_tags)) != (new_cls, list(new_tags)):
+                            # Las etiquetas van en ambos lados: un conflicto puede ser solo de tags (misma clase)
+                            conflicts.append({"code": account.code, "name": account.name, "from": old_cls, "to": new_cls,
+                                              "from_tags": list(old_tags), "to_tags": list(new_tags)})
+
+                    if conflicts:
+                        rejected_patterns.add(merged_rule["pattern"])
+                        rejected.append({"pattern": merged_rule["pattern"], "rule_list": rule_list_name, "conflicts": conflicts[:20]})
+                        continue
+
+                    working = candidate
+                    accepted.append({
+                        "pattern": merged_rule["pattern"],
+                        "rule_list": rule_list_name,
+                        "merged_patterns": merged_rule["provenance"]["merged_patterns"],
+                        "accounts_covered": len(affected)
+                    })
+                    progressed = True
+                    break
+
+        rules_after = len(working["monetary_rules"]) + len(working["non_monetary_rules"])
+        return {
+            "accepted": accepted,
+            "rejected": rejected,
+            "rules_before": rules_before,
+            "rules_after": rules_after,
+            "updated_profile_schema": working
+        }
 
-    def prune_cold_storage(self) -> Tuple[int, List[Dict]]:
+    def prune_cold_storage(self, company_id: Optional[str] = None) -> Tuple[int, List[Dict]]:
         """
         Poda de la Rueda (Performance Maintenance V5.0)
         Mueve reglas obsoletas (> 2 gestiones sin uso) a Cold Storage.
+        V9.0: Decisión basada en datos (hit_count/last_hit de los contadores y del sidecar).
         """
         profile_data = self.profile.profile_data
-        hot_monetary = []
-        cold_rules = []
+        self.rule_hits.flush(company_id)
+        if company_id:
+            self.merge_hit_stats(company_id)
         
-        two_years_ago = (datetime.now() - timedelta(days=730)).isoformat()
+        two_years_ago = datetime.now() - timedelta(days=730)
         
-        for rule in profile_data.get("monetary_rules", []):
-            last_hit = rule.get("last_hit")
-            # Si tiene hit_count alto o es reciente, se queda
-            if not last_hit or last_hit > two_years_ago or rule.get("confidence_weight", 0) > 2.0:
-                hot_monetary.append(rule)
-            else:
-                cold_rules.append(rule)
-                
-        # Repetir para no monetarios...
-        hot_non_monetary = []
-        for rule in profile_data.get("non_monetary_rules", []):
+        def is_hot(rule: Dict) -> bool:
             last_hit = rule.get("last_hit")
-            if not last_hit or last_hit > two_years_ago or rule.get("confidence_weight", 0) > 2.0:
-                hot_non_monetary.append(rule)
-            else:
-                cold_rules.append(rule)
+            if last_hit:
+                return last_hit > two_years_ago.isoformat()
+            # Sin impactos registrados: se conserva mientras la adaptación sea reciente (o sin fecha)
+            created = rule.get("adaptation_timestamp")
+            return not created or created > two_years_ago.timestamp()
+        
+        cold_rules = []
+        for rule_list_name in ["monetary_rules", "non_monetary_rules"]:
+            hot_rules = []
+            for rule in profile_data.get(rule_list_name, []):
+                if is_hot(rule):
+                    hot_rules.append(rule)
+                else:
+                    cold_rules.append(rule)
+            profile_data[rule_list_name] = hot_rules
         
-        profile_data["monetary_rules"] = hot_monetary
-        profile_data["non_monetary_rules"] = hot_non_monetary
+        self.profile.refresh_scl_matchers()
+        self.rule_hits.reset()
+        self.profile_signature = profile_etag(profile_data)
         
         return len(cold_rules), cold_rules
 
+    def merge_hit_stats(self, company_id: str) -> int:
+        """Fusiona en las reglas del perfil los contadores acumulados en el sidecar (máximo, sin doble conteo)"""
+        store = get_rule_hit_store()
+        if not store:
+            return 0
+        stats = store.get_stats(company_id)
+        merged = 0
+        for rule_list_name in ["monetary_rules", "non_monetary_rules"]:
+            for rule in self.profile.profile_data.get(rule_list_name, []):
+                stat = stats.get((rule_list_name, rule.get("pattern", "")))
+                if not stat:
+                    continue
+                rule["hit_count"] = max(rule.get("hit_count") or 0, stat["hit_count"] or 0)
+                if stat["last_hit"] and (not rule.get("last_hit") or rule["last_hit"] < stat["last_hit"]):
+                    rule["last_hit"] = stat["last_hit"]
+                merged += 1
+        return merged
+
     def _map_type_to_tag(self, type_str: str) -> str:
         if type_str == "non_monetary": return "NoMonetario"
         if type_str == "monetary": return "Monetario"
         return "Personalizado"
 
-# Instanciar el General Divino
-mahoraga = MahoragaEngine()
+# Instanciar el General Divino (perezoso)
+def get_mahoraga() -> "MahoragaEngine":
+    return _lazy_singleton("mahoraga", MahoragaEngine)
 
 @app.post("/api/ai/adjustments/feedback", response_model=LearningResponse)
 async def receive_feedback(feedback: FeedbackRequest):
     """El Ritual de Invocación: Recibe el feedback y hace girar la rueda."""
     try:
-        # En una app real, recuperaríamos el perfil de la DB aquí
-        result = mahoraga.learn_from_feedback(feedback)
+        # V9.0: Recuperar el perfil almacenado si el llamador solo envía versión/ETag
+        if not feedback.existing_profile:
+            profile, _, _ = resolve_request_profile(feedback.company_id, None, feedback.profile_version, feedback.profile_etag)
+            if profile:
+                feedback.existing_profile = profile
+        result = get_mahoraga().learn_from_feedback(feedback)
         
-        # El frontend se encargará de persistir el updated_profile_schema
+        # El frontend se encargará de persistir el updated_profile_schema (V9.0: el motor guarda su versión)
+        if result.success:
+            result.profile_version, result.profile_etag = get_profile_store().put(feedback.company_id, result.updated_profile_schema)
+            cache = get_result_cache()
+            if cache:
+                cache.invalidate(feedback.company_id)
+            memo_store = get_account_memo_store()
+            if memo_store:
+                memo_store.invalidate(feedback.company_id)
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Falla en el ritual de adaptación: {str(e)}")
 
+class ProfileUploadRequest(BaseModel):
+    profile_schema: Dict[str, Any] = Field(..., description="Perfil completo de la empresa")
+    profile_version: Optional[int] = Field(None, description="Versión explícita (p.ej. la de company_adjustment_profiles)")
+
+@app.put("/api/ai/profiles/{company_id}")
+async def upload_profile(company_id: str, request: ProfileUploadRequest):
+    """Almacena el perfil en el motor; las llamadas siguientes pueden enviar solo profile_version/profile_etag"""
+    version, etag = get_profile_store().put(company_id, request.profile_schema, request.profile_version)
+    return {"success": True, "company_id": company_id, "profile_version": version, "profile_etag": etag}
+
+@app.get("/api/ai/profiles/{company_id}")
+async def get_stored_profile(company_id: str, version: Optional[int] = None, include_profile: bool = False,
+                             if_none_match: Optional[str] = Header(None)):
+    """Versión/ETag vigentes del perfil (304 si el ETag del llamador sigue vigente)"""
+    stored = get_profile_store().get(company_id, version)
+    if not stored:
+        raise HTTPException(status_code=404, detail="Perfil no almacenado en el motor")
+    stored_version, etag, profile = stored
+    if if_none_match and if_none_match.strip('"') == etag:
+        return Response(status_code=304, headers={"ETag": f'"{etag}"'})
+    body = {"company_id": company_id, "profile_version": stored_version, "profile_etag": etag}
+    if include_profile:
+        body["profile_schema"] = profile
+    return JSONResponse(body, headers={"ETag": f'"{etag}"'})
+
+@app.get("/api/ai/adjustments/events/{company_id}")
+async def list_adaptation_events(company_id: str, account_code: Optional[str] = None, since: Optional[str] = None,
+                                 until: Optional[str] = None, limit: int = 50, cursor: Optional[int] = None):
+    """Historial paginado de adaptaciones (filtros por cuenta y rango de fechas ISO)"""
+    limit = max(1, min(limit, 500))
+    events, next_cursor = get_event_log().query(company_id, account_code, since, until, limit, cursor)
+    return {"company_id": company_id, "events": events, "count": len(events), "next_cursor": next_cursor}
+
+class WarmupProfile(BaseModel):
+    company_id: str
+    profile_schema: Dict
+    profile_version: Optional[int] = None
+
+class WarmupRequest(BaseModel):
+    profiles: List[WarmupProfile] = Field(default_factory=list, description="Perfiles a precompilar; vacío = leer company_adjustment_profiles")
+    company_ids: Optional[List[str]] = Field(None, description="Filtrar empresas al leer de la base de datos")
+    measure_memory: bool = Field(True, description="Medir la huella de memoria por perfil (tracemalloc)")
+
+@app.post("/api/ai/adjustments/warmup")
+async def warmup_profiles(request: WarmupRequest):
+    """Precompila motores por empresa en la caché antes del tráfico (p.ej. tras un deploy)"""
+    if request.profiles:
+        entries = [p.model_dump() for p in request.profiles]
+        source = "request"
+    else:
+        entries = load_db_profiles(company_ids=request.company_ids)
+        source = "company_adjustment_profiles"
+    report = await asyncio.to_thread(warm_profiles, entries, request.measure_memory)
+    return {"success": True, "source": source, **report}
+
+async def warmup_on_startup():
+    """Hook opcional (AI_WARMUP_ON_STARTUP=1): precompila los perfiles guardados en la base de datos"""
+    if os.getenv("AI_WARMUP_ON_STARTUP", "").lower() not in ("1", "true", "yes"):
+        return
+    report = await asyncio.to_thread(warm_profiles, load_db_profiles(), False)
+    print(f"🔥 Warm-up: {report['warmed']} perfiles precompilados ({report['failed']} fallidos) en {report['total_ms']} ms")
+
+app.add_event_handler("startup", warmup_on_startup)
+
+# =============================================================================
+# PERFILADO BAJO DEMANDA (cProfile + tracemalloc V9.0)
+# =============================================================================
+
+# Sin MAHORAGA_DEBUG_TOKEN la ruta no se registra (404); con él exige la cabecera X-Debug-Token
+DEBUG_PROFILE_TOKEN = os.getenv("MAHORAGA_DEBUG_TOKEN", "")
+# cProfile no admite dos perfiladores activos en el proceso: una ejecución a la vez
+_profile_run_lock = threading.Lock()
+
+class ProfileRunRequest(BaseModel):
+    request: AdjustmentRequest = Field(..., description="Petición de /generate a reproducir")
+    top: int = Field(25, description="Cantidad de funciones y sitios de asignación a devolver")
+    sort: str = Field("cumulative", description="Orden de funciones: cumulative | tottime")
+    trace_memory: bool = Field(True, description="Medir asignaciones con tracemalloc (más lento)")
+
+def _relative_source(filename: str) -> str:
+    """Ruta corta para el reporte (relativa al repo o al paquete instalado)"""
+    for marker in ("site-packages" + os.sep, os.path.dirname(os.path.abspath(__file__)) + os.sep):
+        if marker in filename:
+            return filename.split(marker, 1)[1]
+    return filename
+
+def profile_adjustment_run(request: AdjustmentRequest, top: int = 25, sort: str = "cumulative",
+                           trace_memory: bool = True) -> Dict[str, Any]:
+    """
+    Reproduce la petición como /generate (resolución de perfil + motor en caché + generate_adjustments)
+    bajo cProfile y, opcionalmente, tracemalloc. Trabaja sobre una copia de la petición y no confirma
+    los impactos SCL: el perfilado no altera los contadores de reglas de la empresa.
+    """
+    request = request.model_copy(deep=True)
+    request.include_stage_timings = True
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    if trace_memory:
+        tracemalloc.reset_peak()
+        mem0 = tracemalloc.get_traced_memory()[0]
+        snapshot0 = tracemalloc.take_snapshot()
+
+    profiler = cProfile.Profile()
+    t0 = time.perf_counter()
+    try:
+        profiler.enable()
+        try:
+            profile, _, etag = resolve_request_profile(
+                request.company_id, request.profile_schema, request.profile_version, request.profile_etag
+            )
+            target = engine_for_profile(request.company_id, profile, etag) if profile else get_engine()
+            # Se perfila el cálculo real, no las consultas a la memoización por cuenta
+            result = target.generate_adjustments(request, use_memo=False, record_hits=False)
+        finally:
+            profiler.disable()
+        wall_ms = (time.perf_counter() - t0) * 1000
+
+        memory = None
+        if trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, cProfile.__file__),
+            ))
+            memory = {
+                "peak_bytes": peak - mem0,
+                "retained_bytes": current - mem0,
+                "top_allocations": [
+                    {
+                        "site": f"{_relative_source(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+                        "size_bytes": stat.size_diff,
+                        "count": stat.count_diff
+                    }
+                    for stat in snapshot.compare_to(snapshot0, "lineno")[:top]
+                ]
+            }
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+
+    stats = pstats.Stats(profiler)
+    sort_index = 2 if sort == "tottime" else 3  # (cc, nc, tottime, cumtime, callers)
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][sort_index], reverse=True)[:top]
+    functions = [
+        {
+            "function": f"{_relative_source(filename)}:{lineno}({name})",
+            "ncalls": nc,
+            "primitive_calls": cc,
+            "tottime_ms": round(tt * 1000, 3),
+            "cumtime_ms": round(ct * 1000, 3)
+        }
+        for (filename, lineno, name), (cc, nc, tt, ct, _) in rows
+    ]
+    return {
+        "wall_ms": round(wall_ms, 3),
+        "profiled_calls": stats.total_calls,
+        "sort": "tottime" if sort_index == 2 else "cumulative",
+        "functions": functions,
+        "memory": memory,
+        "stage_timings": result.processing_stats.get("stage_timings"),
+        "result_summary": {
+            "accounts": len(request.accounts),
+            "transactions": len(result.proposedTransactions),
+            "aggregate_confidence": result.aggregate_confidence
+        }
+    }
+
+async def debug_profile_run(request: ProfileRunRequest, x_debug_token: Optional[str] = Header(None)):
+    """Perfila una petición de /generate en producción sin redeploy (top funciones + sitios de asignación)"""
+    if not x_debug_token or not hmac.compare_digest(x_debug_token.encode("utf-8"), DEBUG_PROFILE_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="X-Debug-Token inválido")
+    if not _profile_run_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="Ya hay un perfilado en curso")
+    try:
+        top = max(1, min(request.top, 200))
+        log_event(logging.INFO, "debug.profile", company_id=request.request.company_id,
+                  accounts=len(request.request.accounts), trace_memory=request.trace_memory)
+        report = await asyncio.to_thread(profile_adjustment_run, request.request, top, request.sort, request.trace_memory)
+    finally:
+        _profile_run_lock.release()
+    return {"success": True, **report}
+
+if DEBUG_PROFILE_TOKEN:
+    app.add_api_route("/api/ai/debug/profile", debug_profile_run, methods=["POST"])
+
+class PruneRequest(BaseModel):
+    company_id: str
+    profile_schema: Dict[str, Any] = Field(..., description="Perfil actual de la empresa")
+
+@app.post("/api/ai/adjustments/prune")
+async def prune_rules(request: PruneRequest):
+    """Poda de la Rueda guiada por los contadores de impactos (V9.0)"""
+    pruner = MahoragaEngine(request.profile_schema)
+    pruned_count, cold_rules = pruner.prune_cold_storage(request.company_id)
+    return {
+        "success": True,
+        "pruned_count": pruned_count,
+        "cold_rules": cold_rules,
+        "updated_profile_schema": pruner.profile.profile_data
+    }
+
+@app.get("/api/ai/adjustments/rule-hits/{company_id}")
+async def get_rule_hits(company_id: str):
+    """Contadores acumulados de impactos por regla SCL para una empresa"""
+    store = get_rule_hit_store()
+    stats = store.get_stats(company_id) if store else {}
+    return {
+        "company_id": company_id,
+        "rules": [
+            {"rule_list": rule_list, "pattern": pattern, **stat}
+            for (rule_list, pattern), stat in stats.items()
+        ]
+    }
+
+class GeneralizeRequest(BaseModel):
+    company_id: str
+    accounts: List[Account] = Field(..., description="Plan de cuentas completo para verificar las propuestas")
+    profile_schema: Dict[str, Any] = Field(..., description="Perfil actual de la empresa")
+    min_cluster_size: int = Field(3, description="Mínimo de reglas por prefijo para proponer fusión")
+
+@app.post("/api/ai/adjustments/generalize")
+async def generalize_rules(request: GeneralizeRequest):
+    """Fase 3: fusiona reglas ^nombre$ por prefijo de tokens, verificado contra todo el plan de cuentas"""
+    generalizer = MahoragaEngine(request.profile_schema)
+    # Punto fijo que reclasifica contra todo el plan: fuera del event loop (como /impact-analysis)
+    result = await asyncio.to_thread(generalizer.generalize_rules, request.accounts, request.min_cluster_size)
+    return {"success": True, "company_id": request.company_id, **result}
+
+class CandidateRule(BaseModel):
+    pattern: str = Field(..., description="Regex de la regla (plano o '/cuerpo/flags')")
+    tags: List[str] = Field(default_factory=list, description="Tags asignados al coincidir")
+    source_nc: str = Field("Mahoraga-SCL-Adaptation", description="Procedencia de la regla")
+    confidence_weight: float = Field(5.0, description="Peso de confianza (>= 2.0 entra al hot path SCL)")
+    provenance: Dict[str, Any] = Field(default_factory=dict, description="Metadatos de la adaptación")
+
+class ImpactAnalysisRequest(BaseModel):
+    company_id: str
+    accounts: List[Account] = Field(..., description="Universo completo de cuentas de la empresa")
+    parameters: AdjustmentParameters = Field(..., description="Parámetros de ajuste del cierre")
+    profile_schema: Optional[Dict[str, Any]] = Field(None, description="Perfil actual (si falta, se usa feedback.existing_profile)")
+    profile_version: Optional[int] = Field(None, description="Versión almacenada del perfil actual")
+    profile_etag: Optional[str] = Field(None, description="ETag del perfil actual almacenado")
+    candidate_rule: Optional[CandidateRule] = Field(None, description="Regla SCL candidata (se inserta al inicio de target_list)")
+    target_list: Optional[Literal["monetary_rules", "non_monetary_rules"]] = Field(None, description="Lista destino (por defecto según tags)")
+    feedback: Optional[FeedbackRequest] = Field(None, description="Feedback a simular sin aplicarlo")
+
+def shadow_impact(request: ImpactAnalysisRequest, base_profile: Optional[Dict]) -> Dict[str, Any]:
+    """Construye el perfil candidato y lo evalúa contra el actual (motores propios: los hits sombra no cuentan)"""
+    current = MahoragaEngine(base_profile)
+    candidate_profile = {**current.profile.profile_data}
+
+    if request.feedback:
+        candidate_rule, target_list = current.build_adaptation_rule(request.feedback, "SHADOW")
+        current.apply_adaptation_rule(candidate_profile, request.feedback, candidate_rule, target_list)
+    else:
+        candidate_rule = request.candidate_rule.model_dump()
+        target_list = request.target_list or (
+            "non_monetary_rules" if any(t.startswith("NoMonetario") for t in candidate_rule["tags"]) else "monetary_rules"
+        )
+        candidate_profile[target_list] = [candidate_rule] + list(candidate_profile.get(target_list, []))
+
+    impact = current.evaluate_adaptation_impact(candidate_profile, request.accounts, request.parameters)
+    return {"success": True, "company_id": request.company_id, "candidate_rule": candidate_rule, "target_list": target_list, **impact}
+
+@app.post("/api/ai/adjustments/impact-analysis")
+async def analyze_adaptation_impact(request: ImpactAnalysisRequest):
+    """Evaluación sombra: cuentas reclasificadas y deltas AITB/depreciación de una adaptación propuesta"""
+    if not request.candidate_rule and not request.feedback:
+        raise HTTPException(status_code=400, detail="Se requiere candidate_rule o feedback")
+    if request.feedback and not request.feedback.correct_type:
+        raise HTTPException(status_code=400, detail="El feedback debe indicar correct_type")
+    if request.candidate_rule and not request.feedback:
+        try:
+            AdjustmentProfileSchema.compile_rule_pattern(request.candidate_rule.pattern)
+        except re.error as e:
+            raise HTTPException(status_code=400, detail=f"Patrón inválido en candidate_rule: {e}")
+    profile, _, _ = resolve_request_profile(
+        request.company_id,
+        request.profile_schema or (request.feedback.existing_profile if request.feedback else None),
+        request.profile_version, request.profile_etag
+    )
+    # Clasifica todo el universo de cuentas dos veces: fuera del event loop
+    return await asyncio.to_thread(shadow_impact, request, profile)
+
 @app.post("/api/ai/adjustments/rollback")
 async def rollback_adaptation():
     """Reset de la Rueda (Sello 2): Revierte al último estado conocido sano."""
+    mahoraga = get_mahoraga()
     if not mahoraga.adaptation_snapshots:
         return {"success": False, "message": "No hay snapshots disponibles para revertir."}
     
@@ -1957,21 +4470,307 @@ async def rollback_adaptation():
 # SKILL SYSTEM INTEGRATION - SkillResolver para Mahoraga
 # =============================================================================
 
+SKILLS_DIR = os.getenv(
+    "MAHORAGA_SKILLS_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "web-app", "server")
+)
+
+# Puertos Python de las funciones seguras del SkillDispatcher (services/skillDispatcher.js)
+def _skill_bankers_round(num: Any, decimals: int = 2) -> float:
+    """
+    Puerto exacto de safeBankersRound (aritmética binaria de JS, no el Decimal de bankersRound):
+    1.015 -> 1.01 como en Node, aunque bankersRound(1.015) da 1.02. Decimales 0/None -> 2 (args[1] || 2).
+    """
+    if not isinstance(num, (int, float)) or isinstance(num, bool) or num != num:
+        return 0
+    if num in (float("inf"), float("-inf")):
+        return num
+    factor = math.pow(10, decimals or 2)
+    n = abs(num) * factor
+    floor = math.floor(n)
+    decimal = n - floor
+    rounded = floor + 1 if decimal >= 0.5 else floor  # Math.round: empates hacia +infinito
+    sign = -1 if num < 0 else 1
+    if decimal == 0.5 and rounded % 2 != 0:
+        return (rounded - 1) / factor * sign
+    return rounded / factor * sign
+
+def _skill_is_non_monetary(code: Any, name: Any = None) -> bool:
+    if not code and not name:
+        return False
+    code_str = str(code or "").upper()
+    name_str = str(name or "").lower()
+    if code_str.startswith("1") and len(code_str) >= 4 and code_str[1] in "6789":
+        return True  # Activos no corrientes
+    non_monetary_keywords = ["edificio", "maquinaria", "equipo", "vehiculo", "intangible", "activo fijo", "inmueble"]
+    return any(keyword in name_str for keyword in non_monetary_keywords)
+
+def _skill_calculate_level(code: Any, config: Optional[Dict] = None) -> int:
+    if not code:
+        return 1
+    sep = (config or {}).get("separator") or "."
+    return len(str(code).split(sep))
+
+def _skill_calculate_parent(code: Any, config: Optional[Dict] = None) -> Optional[str]:
+    if not code:
+        return None
+    sep = (config or {}).get("separator") or "."
+    parts = str(code).split(sep)
+    return sep.join(parts[:-1]) if len(parts) > 1 else None
+
+class LocalSkillRegistry:
+    """
+    Registro en proceso de skills puras (V9.0).
+    Carga las tarjetas de skills_output_py.json / skills_output.json y enlaza a callables locales
+    las que no dependen de contexto; solo el resto se despacha por HTTP a Node.
+    """
+
+    SKILL_FILES = ("skills_output_py.json", "skills_output.json")
+
+    # Nombre corto -> puerto Python (incluye los alias safe* del dispatcher)
+    PORTS = {
+        "bankersRound": _skill_bankers_round,
+        "safeBankersRound": _skill_bankers_round,
+        "isNonMonetary": _skill_is_non_monetary,
+        "safeIsNonMonetary": _skill_is_non_monetary,
+        "calculateLevel": _skill_calculate_level,
+        "safeCalculateLevel": _skill_calculate_level,
+        "calculateParent": _skill_calculate_parent,
+        "safeCalculateParent": _skill_calculate_parent,
+    }
+
+    # Métodos puros del motor (isPure: true en skills_output_py.json)
+    ENGINE_METHODS = ("classify_account_semantic", "calculate_depreciation_pot", "calculate_aitb_pot", "calculate_provision_pot")
+
+    def __init__(self, skills_dir: str = SKILLS_DIR):
+        self.cards: Dict[str, Dict] = {}
+        self.bindings: Dict[str, Any] = dict(self.PORTS)
+        for filename in self.SKILL_FILES:
+            path = os.path.join(skills_dir, filename)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    for card in json.load(f):
+                        self.cards[card["id"]] = card
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"WARN LocalSkillRegistry: no se pudo cargar {path}: {e}")
+
+        for card_id, card in self.cards.items():
+            fn = self.PORTS.get(self._short_name(card_id))
+            if fn:
+                self.bindings[card_id] = fn
+
+    @staticmethod
+    def _short_name(skill_id: str) -> str:
+        """'C:/.../reports.js::SkillDispatcher.safeBankersRound' -> 'safeBankersRound'"""
+        return skill_id.split("::")[-1].rsplit(".", 1)[-1]
+
+    def bind_engine(self, engine: "ARSDSPyEngine"):
+        """Enlaza los métodos puros del motor a la instancia dada"""
+        for method in self.ENGINE_METHODS:
+            call = self._engine_call(engine, method)
+            self.bindings[method] = call
+            self.bindings[f"ai_adjustment_engine.py::{method}"] = call
+            for card_id, card in self.cards.items():
+                if card.get("isPure") and card.get("file", "").endswith(".py") and self._short_name(card_id) == method:
+                    self.bindings[card_id] = call
+
+    @staticmethod
+    def _engine_call(engine: "ARSDSPyEngine", method: str):
+        def call(account: Any, params: Any = None):
+            account = Account(**account) if isinstance(account, dict) else account
+            if method == "classify_account_semantic":
+                return getattr(engine, method)(account)
+            params = AdjustmentParameters(**params) if isinstance(params, dict) else params
+            return list(getattr(engine, method)(account, params))
+        return call
+
+    def lookup(self, skill_id: str):
+        """Callable local para la skill, o None si debe despacharse a Node"""
+        if not skill_id:
+            return None
+        return self.bindings.get(skill_id) or self.bindings.get(self._short_name(skill_id))
+
+    def card_for(self, skill_name: str) -> Optional[Dict]:
+        """Tarjeta de una skill local por id o nombre corto (sintética si solo existe el puerto)"""
+        if not self.lookup(skill_name):
+            return None
+        if skill_name in self.cards:
+            return self.cards[skill_name]
+        short = self._short_name(skill_name)
+        return {"id": short, "name": short, "isPure": True, "local": True}
+
+def _skill_terms(text: str) -> List[str]:
+    """Tokens normalizados (sin acentos, camelCase y snake_case separados, >2 caracteres)"""
+    text = re.sub(r'([a-z0-9])([A-Z])', r'\1 \2', text or "")
+    text = unicodedata.normalize('NFD', text)
+    text = ''.join(c for c in text if unicodedata.category(c) != 'Mn').lower()
+    return [t for t in re.split(r'[^a-z0-9]+', text) if len(t) > 2]
+
+class SkillSearchIndex:
+    """
+    Índice invertido BM25 + anchors sobre las tarjetas de skills (V9.0).
+    Reemplaza la búsqueda /api/skills/search + /match de Node para resolve_skill.
+    """
+
+    K1 = 1.2
+    B = 0.75
+    EXACT_ANCHOR_BONUS = 5.0
+    REGEX_ANCHOR_BONUS = 1.0
+    SUBSTRING_ANCHOR_BONUS = 0.5
+    # Score BM25 mínimo para aceptar un resultado sin anchor: por debajo la coincidencia suele ser
+    # una palabra común del doc ("ajuste", "calcular") y resolve_skill prefiere el respaldo de Node
+    MIN_SCORE = 2.5
+
+    def __init__(self, cards):
+        self.cards: List[Dict] = [c for c in cards if c.get("name")]
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.doc_len: List[int] = []
+        self.exact_anchors: Dict[str, List[int]] = {}
+        self.substring_anchors: Dict[str, List[int]] = {}
+        self.regex_anchors: List[Tuple[Any, int]] = []
+
+        for idx, card in enumerate(self.cards):
+            # Keywords pesan doble frente a nombre y doc
+            terms = _skill_terms(card["name"]) + _skill_terms(card.get("doc", ""))
+            for kw in card.get("keywords", []):
+                terms += _skill_terms(kw) * 2
+            counts: Dict[str, int] = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            for term, tf in counts.items():
+                self.postings.setdefault(term, []).append((idx, tf))
+            self.doc_len.append(len(terms))
+
+            for anchor in card.get("anchors", []):
+                if anchor.startswith("^") and anchor.endswith("$"):
+                    if len(anchor) > 2:
+                        self.exact_anchors.setdefault(anchor[1:-1], []).append(idx)
+                elif anchor.startswith(".*") and anchor.endswith(".*"):
+                    if len(anchor) > 4:
+                        self.substring_anchors.setdefault(anchor[2:-2], []).append(idx)
+                else:
+                    # Anchors estilo JS: /patron/i
+                    pattern = anchor[1:anchor.rfind("/")] if anchor.startswith("/") and anchor.rfind("/") > 0 else anchor
+                    try:
+                        self.regex_anchors.append((re.compile(pattern, re.IGNORECASE), idx))
+                    except re.error:
+                        continue
+
+        self.avg_len = (sum(self.doc_len) / len(self.doc_len)) if self.doc_len else 0.0
+        n_docs = len(self.cards)
+        self.idf = {
+            term: math.log(1 + (n_docs - len(posts) + 0.5) / (len(posts) + 0.5))
+            for term, posts in self.postings.items()
+        }
+
+    def search(self, query: str, limit: int = 10, min_score: float = 0.0) -> List[Tuple[Dict, float]]:
+        """
+        Top-N (tarjeta, score) para la consulta. Con min_score, solo pasan los que lo alcanzan o los que
+        casan un anchor exacto/regex (los anchors de subcadena .*palabra.* solo suman bonus)
+        """
+        scores: Dict[int, float] = {}
+        anchored: Set[int] = set()
+        for term in set(_skill_terms(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for idx, tf in self.postings[term]:
+                norm = self.K1 * (1 - self.B + self.B * self.doc_len[idx] / (self.avg_len or 1))
+                scores[idx] = scores.get(idx, 0.0) + idf * tf * (self.K1 + 1) / (tf + norm)
+
+        flat_query = query.lower().strip()
+        for idx in self.exact_anchors.get(flat_query, []):
+            scores[idx] = scores.get(idx, 0.0) + self.EXACT_ANCHOR_BONUS
+            anchored.add(idx)
+        for fragment, idxs in self.substring_anchors.items():
+            if fragment in flat_query:
+                for idx in idxs:
+                    scores[idx] = scores.get(idx, 0.0) + self.SUBSTRING_ANCHOR_BONUS
+        for regex, idx in self.regex_anchors:
+            if regex.search(query):
+                scores[idx] = scores.get(idx, 0.0) + self.REGEX_ANCHOR_BONUS
+                anchored.add(idx)
+
+        if min_score > 0:
+            scores = {idx: score for idx, score in scores.items() if idx in anchored or score >= min_score}
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -self.cards[item[0]].get("confidence", 0), self.cards[item[0]]["id"]))
+        return [(self.cards[idx], round(score, 4)) for idx, score in ranked[:limit]]
+
 class SkillResolver:
     """
     Resuelve y ejecuta skills del sistema Node.js desde Python
     Permite a Mahoraga acceder a las funciones del sistema contable
+    V9.0: Las skills puras se ejecutan en proceso (LocalSkillRegistry) sin round-trip HTTP
+    V9.0: La búsqueda es local (SkillSearchIndex + caché LRU/TTL); Node queda como respaldo
     """
 
-    def __init__(self):
-        self.node_base_url = "http://localhost:3001"
-        self.skill_cache = {}
-        self.session = httpx.AsyncClient(timeout=10.0)
+    SKILL_CACHE_SIZE = 256
+    SKILL_CACHE_TTL = 300.0  # segundos
+    BATCH_CHUNK_SIZE = 200
+    BATCH_CONCURRENCY = 8
+
+    def __init__(self, local_registry: Optional[LocalSkillRegistry] = None,
+                 transport: Optional["httpx.AsyncBaseTransport"] = None, node_base_url: str = "http://localhost:3001"):
+        self.node_base_url = node_base_url
+        self.skill_cache: "OrderedDict[str, Tuple[float, Optional[Dict]]]" = OrderedDict()
+        # transport inyectable (p.ej. httpx.MockTransport como dispatcher de prueba)
+        self._transport = transport
+        self._session = None
+        self.local_registry = local_registry or LocalSkillRegistry()
+        self.search_index = SkillSearchIndex(self.local_registry.cards.values())
+        self.dispatch_stats = {"local": 0, "remote": 0}
+
+    @property
+    def session(self) -> "httpx.AsyncClient":
+        """Cliente HTTP creado solo cuando se necesita una llamada remota a Node"""
+        if self._session is None:
+            self._session = httpx.AsyncClient(timeout=10.0, transport=self._transport)
+        return self._session
+
+    def _cache_get(self, key: str) -> Tuple[bool, Optional[Dict]]:
+        entry = self.skill_cache.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self.skill_cache[key]
+            return False, None
+        self.skill_cache.move_to_end(key)
+        return True, value
+
+    def _cache_put(self, key: str, value: Optional[Dict]):
+        self.skill_cache[key] = (time.monotonic() + self.SKILL_CACHE_TTL, value)
+        self.skill_cache.move_to_end(key)
+        while len(self.skill_cache) > self.SKILL_CACHE_SIZE:
+            self.skill_cache.popitem(last=False)
 
     async def resolve_skill(self, skill_name: str, context: Dict[str, Any] = None) -> Optional[Dict]:
         """
         Busca skills relevantes por nombre o contexto
         """
+        local_card = self.local_registry.card_for(skill_name)
+        if local_card:
+            return local_card
+
+        hit, cached = self._cache_get(skill_name)
+        if hit:
+            return cached
+
+        # Un top-1 débil (sin anchor y bajo MIN_SCORE) no se acepta: se consulta a Node
+        results = self.search_index.search(skill_name, limit=1, min_score=SkillSearchIndex.MIN_SCORE)
+        if results:
+            card, score = results[0]
+            resolved = {**card, "score": score}
+            self._cache_put(skill_name, resolved)
+            return resolved
+
+        # Respaldo: índice de Node (por si el JSON local está desactualizado)
+        remote = await self._resolve_skill_remote(skill_name)
+        if remote is not None:
+            self._cache_put(skill_name, remote)
+        return remote
+
+    async def _resolve_skill_remote(self, skill_name: str) -> Optional[Dict]:
         try:
             # Buscar por keywords
             search_url = f"{self.node_base_url}/api/skills/search"
@@ -1980,8 +4779,9 @@ class SkillResolver:
             if response.status_code == 200:
                 data = response.json()
                 if data.get("success") and data.get("results"):
-                    # Devolver la mejor coincidencia
-                    return data["results"][0]
+                    # Devolver la mejor coincidencia (searchByKeywords envuelve en {skill, score})
+                    best = data["results"][0]
+                    return best.get("skill", best)
 
             # Si no encuentra por búsqueda, intentar búsqueda por patrón
             pattern_url = f"{self.node_base_url}/api/skills/match/{skill_name}"
@@ -2001,6 +4801,16 @@ class SkillResolver:
         """
         Ejecuta una skill de manera segura via el dispatcher de Node.js
         """
+        local_fn = self.local_registry.lookup(skill_id)
+        if local_fn:
+            self.dispatch_stats["local"] += 1
+            try:
+                return local_fn(*(args or []))
+            except Exception as e:
+                print(f"Exception ejecutando skill local {skill_id}: {str(e)}")
+                return None
+
+        self.dispatch_stats["remote"] += 1
         try:
             dispatch_url = f"{self.node_base_url}/api/skills/dispatch"
             payload = {
@@ -2024,6 +4834,61 @@ class SkillResolver:
 
         return None
 
+    async def execute_skills_batch(self, calls: List[Dict[str, Any]], concurrency: Optional[int] = None) -> List[Any]:
+        """
+        Ejecuta muchas llamadas {skillId, args} y devuelve los resultados en el mismo orden.
+        Las skills locales corren en proceso; las remotas viajan en lotes a /api/skills/batch-dispatch
+        (hasta BATCH_CONCURRENCY lotes en paralelo). Si el lote falla, se degrada a /dispatch concurrente.
+        """
+        results: List[Any] = [None] * len(calls)
+        remote: List[Tuple[int, Dict[str, Any]]] = []
+        for position, call in enumerate(calls):
+            skill_id, args = call.get("skillId"), call.get("args") or []
+            if self.local_registry.lookup(skill_id):
+                results[position] = await self.execute_skill(skill_id, args)
+            else:
+                remote.append((position, {"skillId": skill_id, "args": args}))
+
+        if not remote:
+            return results
+
+        semaphore = asyncio.Semaphore(concurrency or self.BATCH_CONCURRENCY)
+
+        async def run_single(position: int, request: Dict[str, Any]):
+            async with semaphore:
+                results[position] = await self.execute_skill(request["skillId"], request["args"])
+
+        async def run_chunk(chunk: List[Tuple[int, Dict[str, Any]]]):
+            async with semaphore:
+                batch = await self._batch_dispatch_remote([request for _, request in chunk])
+            if batch is None:
+                await asyncio.gather(*(run_single(position, request) for position, request in chunk))
+                return
+            self.dispatch_stats["remote"] += len(chunk)
+            for (position, request), item in zip(chunk, batch):
+                if item.get("success"):
+                    results[position] = item.get("result")
+                else:
+                    print(f"Error ejecutando skill {request['skillId']}: {item.get('error')}")
+
+        chunks = [remote[i:i + self.BATCH_CHUNK_SIZE] for i in range(0, len(remote), self.BATCH_CHUNK_SIZE)]
+        await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+        return results
+
+    async def _batch_dispatch_remote(self, requests: List[Dict[str, Any]]) -> Optional[List[Dict]]:
+        """Un round-trip a /api/skills/batch-dispatch; None si el endpoint no está disponible"""
+        try:
+            response = await self.session.post(f"{self.node_base_url}/api/skills/batch-dispatch", json={"requests": requests})
+            if response.status_code == 200:
+                data = response.json()
+                batch = data.get("results")
+                if data.get("success") and isinstance(batch, list) and len(batch) == len(requests):
+                    return batch
+            print(f"HTTP error en batch-dispatch: {response.status_code}")
+        except Exception as e:
+            print(f"Exception en batch-dispatch: {str(e)}")
+        return None
+
     async def get_relevant_skills(self, context_description: str) -> List[Dict]:
         """
         Encuentra skills relevantes basadas en una descripción del contexto
@@ -2065,8 +4930,14 @@ class SkillResolver:
 
         return keywords
 
-# Instancia global del resolver
-skill_resolver = SkillResolver()
+# Instancia global del resolver (perezosa; enlaza los métodos puros del engine con skills)
+def _build_skill_resolver() -> "SkillResolver":
+    resolver = SkillResolver()
+    resolver.local_registry.bind_engine(get_mahoraga_skill_engine())
+    return resolver
+
+def get_skill_resolver() -> "SkillResolver":
+    return _lazy_singleton("skill_resolver", _build_skill_resolver)
 
 # Extensión del MahoragaEngine con Skill Resolution
 class MahoragaSkillEngine(MahoragaEngine):
@@ -2074,9 +4945,9 @@ class MahoragaSkillEngine(MahoragaEngine):
     Versión extendida de Mahoraga con resolución de skills
     """
 
-    def __init__(self, profile_schema=None):
-        super().__init__(profile_schema)
-        self.skill_resolver = skill_resolver
+    @property
+    def skill_resolver(self) -> "SkillResolver":
+        return get_skill_resolver()
 
     async def resolve_and_execute_skill(self, skill_description: str, args: List[Any] = None) -> Any:
         """
@@ -2088,6 +4959,16 @@ class MahoragaSkillEngine(MahoragaEngine):
             return await self.skill_resolver.execute_skill(skill["id"], args)
         return None
 
+    async def resolve_and_execute_skill_batch(self, skill_description: str, args_list: List[List[Any]]) -> List[Any]:
+        """
+        Resuelve la skill una sola vez y la ejecuta para cada juego de argumentos (orden preservado)
+        """
+        skill = await self.skill_resolver.resolve_skill(skill_description)
+        if not skill:
+            return [None] * len(args_list)
+        print(f"🔮 Ejecutando skill resuelta en lote: {skill['id']} x{len(args_list)}")
+        return await self.skill_resolver.execute_skills_batch([{"skillId": skill["id"], "args": args} for args in args_list])
+
     async def enhance_proposal_with_skills(self, account: Optional[Account], adjustment_type: str) -> Dict:
         """
         Mejora la propuesta usando skills del sistema
@@ -2147,14 +5028,28 @@ class MahoragaSkillEngine(MahoragaEngine):
             enhanced_result["enhanced"] = {
                 "amount": amount,
                 "confidence": conf + 0.1,  # Bonus de confianza por usar skills
-                "audit": f"{audit} [ENHANCED WITH SKILLS: {enhanced_result['used_skills'].join(', ')}]",
+                "audit": f"{audit} [ENHANCED WITH SKILLS: {', '.join(enhanced_result['used_skills'])}]",
                 "rule": rule
             }
 
         return enhanced_result
 
-# Instancia global del engine con skills
-mahoraga_skill_engine = MahoragaSkillEngine()
+# Instancia global del engine con skills (perezosa)
+def get_mahoraga_skill_engine() -> "MahoragaSkillEngine":
+    return _lazy_singleton("mahoraga_skill_engine", MahoragaSkillEngine)
+
+# Compatibilidad: ai_adjustment_engine.engine / .mahoraga / ... siguen disponibles como atributos
+_LAZY_GLOBALS = {
+    "engine": get_engine,
+    "mahoraga": get_mahoraga,
+    "skill_resolver": get_skill_resolver,
+    "mahoraga_skill_engine": get_mahoraga_skill_engine,
+}
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_GLOBALS:
+        return _LAZY_GLOBALS[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == "__main__":
     # Soporte para ejecución directa de skills desde línea de comandos
@@ -2172,9 +5067,8 @@ if __name__ == "__main__":
                     print(json.dumps({"error": "skillId required"}))
                     sys.exit(1)
 
-                # Crear resolver y ejecutar
-                resolver = SkillResolver()
-                result = await resolver.execute_skill(skill_id, args)
+                # Resolver global: las skills puras del motor se ejecutan en proceso
+                result = await get_skill_resolver().execute_skill(skill_id, args)
 
                 print(json.dumps({"success": True, "result": result}))
 
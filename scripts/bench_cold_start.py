@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Mahoraga V9.0 - Benchmark de arranque en frío del motor de ajustes
+Mide, en procesos nuevos, el tiempo de import de ai_adjustment_engine y el de la
+primera respuesta de /api/ai/health (llamada ASGI directa, sin servidor ni cliente HTTP)
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import time
+from typing import Dict, List, Any
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Código del proceso hijo: import + primera petición ASGI a /api/ai/health
+CHILD_CODE = r'''
+import time
+t0 = time.perf_counter()
+import asyncio, json, sys
+import ai_adjustment_engine as m
+t1 = time.perf_counter()
+
+async def health():
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/api/ai/health", "raw_path": b"/api/ai/health",
+        "query_string": b"", "root_path": "", "headers": [], "client": ("bench", 0), "server": ("bench", 80),
+    }
+    messages = []
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    async def send(message):
+        messages.append(message)
+    await m.app(scope, receive, send)
+    return messages[0]["status"]
+
+status = asyncio.run(health())
+t2 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "first_health_ms": (t2 - t1) * 1000,
+    "status": status,
+    "heavy_modules": {name: name in sys.modules for name in ("pandas", "numpy", "httpx")},
+}))
+'''
+
+def run_once(python: str) -> Dict[str, Any]:
+    """Un proceso nuevo; el tiempo total incluye el arranque del intérprete"""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [python, "-c", CHILD_CODE], cwd=REPO_ROOT, capture_output=True, text=True, timeout=120
+    )
+    total_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"El proceso hijo falló:\n{proc.stderr[-2000:]}")
+    # El motor imprime trazas por stdout: el resultado es la última línea JSON
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["process_total_ms"] = total_ms
+    return result
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    summary = {}
+    for key in ("import_ms", "first_health_ms", "process_total_ms"):
+        values = [r[key] for r in runs]
+        summary[key] = {
+            "median": round(statistics.median(values), 1),
+            "min": round(min(values), 1),
+            "max": round(max(values), 1),
+        }
+    summary["heavy_modules"] = runs[-1]["heavy_modules"]
+    summary["status"] = runs[-1]["status"]
+    return summary
+
+def import_profile(python: str, top: int) -> List[Dict[str, Any]]:
+    """Top de módulos por tiempo acumulado (python -X importtime)"""
+    proc = subprocess.run(
+        [python, "-X", "importtime", "-c", "import ai_adjustment_engine"],
+        cwd=REPO_ROOT, capture_output=True, text=True, timeout=120
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line.replace("import time:", "").split("|")]
+        rows.append({"module": name.strip(), "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+    rows.sort(key=lambda row: row["cumulative_ms"], reverse=True)
+    return rows[:top]
+
+def main():
+    """Función principal"""
+
+    parser = argparse.ArgumentParser(description='Benchmark de arranque en frío (ai_adjustment_engine)')
+    parser.add_argument('--runs', type=int, default=5, help='Procesos nuevos a medir')
+    parser.add_argument('--python', default=sys.executable, help='Intérprete a usar')
+    parser.add_argument('--importtime', type=int, default=0, metavar='N', help='Mostrar los N imports más costosos')
+    parser.add_argument('--output', help='Guardar el resumen JSON en esta ruta')
+    parser.add_argument('--compare', help='Resumen JSON previo contra el cual comparar')
+    args = parser.parse_args()
+
+    print('🥶 MAHORAGA V9.0 - BENCHMARK DE ARRANQUE EN FRÍO')
+    print('=' * 60)
+
+    runs = [run_once(args.python) for _ in range(args.runs)]
+    summary = summarize(runs)
+    summary["runs"] = args.runs
+    summary["python"] = args.python
+
+    for key in ("import_ms", "first_health_ms", "process_total_ms"):
+        stats = summary[key]
+        print(f"   {key:<18} mediana {stats['median']:>8.1f} ms   (min {stats['min']:.1f} / max {stats['max']:.1f})")
+    loaded = [name for name, present in summary["heavy_modules"].items() if present]
+    print(f"   módulos pesados cargados tras /health: {', '.join(loaded) or 'ninguno'}")
+
+    if args.importtime:
+        summary["import_profile"] = import_profile(args.python, args.importtime)
+        print('\n📦 Imports más costosos (acumulado):')
+        for row in summary["import_profile"]:
+            print(f"   {row['cumulative_ms']:>8.1f} ms  {row['module']}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        print('\n📊 Comparación con', args.compare)
+        for key in ("import_ms", "first_health_ms", "process_total_ms"):
+            before, after = previous[key]["median"], summary[key]["median"]
+            change = ((after - before) / before * 100) if before else 0.0
+            print(f"   {key:<18} {before:>8.1f} -> {after:>8.1f} ms ({change:+.1f}%)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        print(f'\n💾 Resumen guardado en: {args.output}')
+
+if __name__ == '__main__':
+    main()
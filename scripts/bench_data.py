@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Mahoraga V9.0 - Generador de datos sintéticos para benchmarks del motor de ajustes
+Planes de cuentas con la estructura PUCT y los tipos de activo de Tabla-Depreciaciones.csv,
+trayectorias del mayor, serie UFV y perfiles Mahoraga con N reglas aprendidas
+"""
+
+import os
+import re
+import csv
+import json
+import copy
+import random
+from datetime import date, timedelta
+from typing import Dict, List, Any, Optional, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PUCT_PATH = os.path.join(REPO_ROOT, 'web-app', 'scripts', 'preview_puct_xlsx.json')
+DEPRECIATION_TABLE_PATH = os.path.join(REPO_ROOT, 'Tabla-Depreciaciones.csv')
+
+# Tipos PUCT que participan del cierre (las cuentas de orden no llevan ajustes)
+PUCT_TYPES = {"Activo", "Pasivo", "Patrimonio", "Ingreso", "Gasto", "Costo", "Reguladora"}
+# Fracción del plan dedicada a activos fijos y sus contrapartidas de depreciación
+ASSET_SHARE = 0.10
+
+def load_puct_templates(path: str = PUCT_PATH) -> List[Dict[str, str]]:
+    """Cuentas de nivel 4 del PUCT (las de nivel 5 son plantillas XXX/00N)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        rows = json.load(f)
+    return [
+        {"code": row["code"], "name": row["name"].strip().capitalize(), "type": row["type"]}
+        for row in rows
+        if row.get("level") == 4 and row.get("type") in PUCT_TYPES and row.get("name")
+    ]
+
+def load_asset_types(path: str = DEPRECIATION_TABLE_PATH) -> List[Dict[str, Any]]:
+    """Bienes con coeficiente definido en Tabla-Depreciaciones.csv"""
+    assets = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if len(row) < 3 or row[0] == "Bienes":
+                continue
+            rate = re.sub(r"[^0-9.]", "", row[2])
+            if rate:
+                assets.append({"name": row[0].strip(), "annual_rate": float(rate) / 100})
+    return assets
+
+def ufv_series(fiscal_year: int, ufv_initial: float = 2.35, annual_inflation: float = 0.04) -> Dict[str, float]:
+    """Serie UFV diaria del año fiscal con crecimiento compuesto"""
+    start = date(fiscal_year, 1, 1)
+    days = (date(fiscal_year, 12, 31) - start).days + 1
+    daily = (1 + annual_inflation) ** (1 / 365)
+    return {(start + timedelta(days=i)).isoformat(): round(ufv_initial * daily ** i, 5) for i in range(days)}
+
+def build_chart(n_accounts: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """
+    Plan de cuentas de n_accounts: subcuentas de las plantillas PUCT más grupos de activo fijo
+    (activo, depreciación acumulada y gasto por depreciación) por cada bien de la tabla.
+    """
+    rng = random.Random(seed)
+    templates = load_puct_templates()
+    assets = load_asset_types()
+    chart: List[Dict[str, Any]] = []
+
+    asset_groups = max(1, int(n_accounts * ASSET_SHARE) // 3)
+    for i in range(asset_groups):
+        asset = assets[i % len(assets)]
+        suffix = f"{i // len(assets) + 1:03d}"
+        balance = round(rng.lognormvariate(10, 1.2), 2)
+        chart.append({"code": f"1-2-1-{i % len(assets) + 1:03d}-{suffix}", "name": asset["name"], "balance": balance, "type": "Activo"})
+        chart.append({"code": f"1-2-2-{i % len(assets) + 1:03d}-{suffix}", "name": f"Depreciacion acumulada {asset['name']}",
+                      "balance": 0.0, "type": "Reguladora"})
+        chart.append({"code": f"6-2-1-{i % len(assets) + 1:03d}-{suffix}", "name": f"Depreciacion {asset['name']}",
+                      "balance": 0.0, "type": "Gasto"})
+
+    k = 0
+    while len(chart) < n_accounts:
+        template = templates[k % len(templates)]
+        sub = k // len(templates) + 1
+        # ~15% de cuentas sin saldo: catálogo para las búsquedas de contrapartida
+        balance = 0.0 if rng.random() < 0.15 else round(rng.lognormvariate(9, 1.5), 2)
+        chart.append({"code": f"{template['code']}-{sub:03d}", "name": f"{template['name']} {sub}" if sub > 1 else template["name"],
+                      "balance": balance, "type": template["type"]})
+        k += 1
+    return chart[:n_accounts]
+
+def build_trajectories(chart: List[Dict[str, Any]], movements: int, ufv_cache: Dict[str, float],
+                       seed: int = 7) -> Dict[str, List[Dict[str, Any]]]:
+    """Movimientos del mayor por cuenta con saldo; la mitad sin ufv_at_date (fuerza la consulta a ufv_cache)"""
+    if movements <= 0:
+        return {}
+    rng = random.Random(seed)
+    dates = sorted(ufv_cache)
+    trajectories = {}
+    for account in chart:
+        if account["balance"] <= 0:
+            continue
+        remaining = account["balance"]
+        moves = []
+        for j in range(movements):
+            mov_date = dates[rng.randrange(len(dates))]
+            amount = remaining if j == movements - 1 else round(remaining * rng.uniform(0.1, 0.6), 2)
+            remaining = round(remaining - amount, 2)
+            moves.append({
+                "date": mov_date,
+                "debit": amount,
+                "credit": round(rng.uniform(0, amount * 0.1), 2) if j % 3 == 2 else 0.0,
+                "ufv_at_date": ufv_cache[mov_date] if j % 2 == 0 else None
+            })
+        trajectories[account["code"]] = sorted(moves, key=lambda mov: mov["date"])
+    return trajectories
+
+def build_profile(base_profile: Dict[str, Any], n_rules: int, chart: List[Dict[str, Any]], seed: int = 7) -> Dict[str, Any]:
+    """Perfil Mahoraga con n_rules reglas SCL aprendidas sobre nombres del plan"""
+    rng = random.Random(seed)
+    profile = copy.deepcopy(base_profile)
+    profile["monetary_rules"] = []
+    profile["non_monetary_rules"] = []
+    names = sorted({account["name"] for account in chart})
+    for i in range(n_rules):
+        name = names[rng.randrange(len(names))]
+        monetary = rng.random() < 0.5
+        rule = {
+            "pattern": f"^{re.escape(name)}$",
+            "tags": ["Monetario"] if monetary else ["NoMonetario", "Depreciable"],
+            "source_nc": "Mahoraga-SCL-Adaptation",
+            "confidence_weight": 5.0,
+            "provenance": {"reason": "bench", "event_id": f"BENCH-{i}"}
+        }
+        profile["monetary_rules" if monetary else "non_monetary_rules"].append(rule)
+    return profile
+
+def build_generate_request(chart: List[Dict[str, Any]], company_id: str, profile: Optional[Dict[str, Any]],
+                           trajectories: Dict[str, List[Dict[str, Any]]], ufv_cache: Dict[str, float],
+                           fiscal_year: int) -> Dict[str, Any]:
+    """Cuerpo JSON de /generate (modo trayectoria si hay movimientos)"""
+    dates = sorted(ufv_cache)
+    return {
+        "company_id": company_id,
+        "accounts": [{"code": a["code"], "name": a["name"], "balance": a["balance"], "type": a["type"]} for a in chart],
+        "parameters": {
+            "ufv_initial": ufv_cache[dates[0]],
+            "ufv_final": ufv_cache[dates[-1]],
+            "fiscal_end_date": f"{fiscal_year}-12-31",
+            "use_trajectory_mode": bool(trajectories),
+            "ledger_trajectories": trajectories,
+            "ufv_cache": ufv_cache if trajectories else {}
+        },
+        "profile_schema": profile
+    }
+
+def ledger_payloads(chart: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Respuestas del middleware Node para /api/reports/ledger y /api/accounts"""
+    ledger = {"data": [{"code": a["code"], "name": a["name"], "balance": a["balance"], "type": a["type"]}
+                       for a in chart if a["balance"] != 0]}
+    accounts = {"data": [{"code": a["code"], "name": a["name"], "type": a["type"]} for a in chart]}
+    return ledger, accounts
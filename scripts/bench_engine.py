@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Mahoraga V9.0 - Suite de benchmarks del motor de ajustes
+Planes sintéticos (PUCT + Tabla-Depreciaciones.csv) de 1k/10k/100k cuentas, perfiles con 0/100/1000
+reglas aprendidas y trayectorias del mayor; mide /generate, /generate-from-ledger (contra un stub local
+del middleware Node), /explain, /explain-batch, /batch-validate y /feedback llamando a la app por ASGI
+"""
+
+import io
+import os
+import sys
+import json
+import contextlib
+import argparse
+import asyncio
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import platform
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Any, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import bench_data
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def summarize(samples_ms: List[float]) -> Dict[str, Any]:
+    return {
+        "calls": len(samples_ms),
+        "median_ms": round(statistics.median(samples_ms), 3),
+        "min_ms": round(min(samples_ms), 3),
+        "max_ms": round(max(samples_ms), 3),
+        "p95_ms": round(percentile(samples_ms, 95), 3)
+    }
+
+class LedgerStub:
+    """Stub HTTP del middleware Node (ledger, plan de cuentas y closing-check) en un puerto local libre"""
+
+    def __init__(self):
+        self.routes: Dict[str, bytes] = {}
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = stub.routes.get(self.path.split("?", 1)[0])
+                self.send_response(200 if body is not None else 404)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body or b"")))
+                self.end_headers()
+                self.wfile.write(body or b"")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def serve(self, ledger: Dict[str, Any], accounts: Dict[str, Any]):
+        self.routes = {
+            "/api/reports/ledger": json.dumps(ledger).encode(),
+            "/api/accounts": json.dumps(accounts).encode(),
+            "/api/reports/closing-check": json.dumps({"hasClosingEntries": False}).encode()
+        }
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+async def timed_post(client, path: str, body: Any) -> Tuple[float, Any]:
+    t0 = time.perf_counter()
+    response = await client.post(path, json=body)
+    elapsed = (time.perf_counter() - t0) * 1000
+    if response.status_code != 200:
+        raise RuntimeError(f"{path} -> {response.status_code}: {response.text[:500]}")
+    return elapsed, response.json()
+
+async def run_scenario(client, engine_module, stub: LedgerStub, n_accounts: int, n_rules: int, movements: int,
+                       args) -> List[Dict[str, Any]]:
+    """Mide todos los endpoints para un (tamaño, reglas, movimientos)"""
+    scenario = {"accounts": n_accounts, "rules": n_rules, "movements": movements}
+    key = f"n={n_accounts},rules={n_rules},mov={movements}"
+    company_id = f"bench-{n_accounts}-{n_rules}-{movements}"
+
+    t0 = time.perf_counter()
+    chart = bench_data.build_chart(n_accounts, seed=args.seed)
+    ufv_cache = bench_data.ufv_series(args.fiscal_year)
+    trajectories = bench_data.build_trajectories(chart, movements, ufv_cache, seed=args.seed)
+    base_profile = engine_module.AdjustmentProfileSchema().profile_data
+    profile = bench_data.build_profile(base_profile, n_rules, chart, seed=args.seed)
+    generate_body = bench_data.build_generate_request(chart, company_id, profile, trajectories, ufv_cache, args.fiscal_year)
+    stub.serve(*bench_data.ledger_payloads(chart))
+    datagen_ms = (time.perf_counter() - t0) * 1000
+    print(f"\n🧪 {key}  (datos generados en {datagen_ms:.0f} ms)")
+
+    results = []
+
+    def record(endpoint: str, samples: List[float], **extra):
+        row = {"key": key, "scenario": scenario, "endpoint": endpoint, **summarize(samples), **extra}
+        results.append(row)
+        print(f"   {endpoint:<22} mediana {row['median_ms']:>10.1f} ms   p95 {row['p95_ms']:>10.1f} ms   ({row['calls']} llamadas)")
+
+    # /generate: la primera llamada compila el motor del perfil (fría); el resto usa la caché
+    cold_ms, response = await timed_post(client, "/api/ai/adjustments/generate", generate_body)
+    samples = [(await timed_post(client, "/api/ai/adjustments/generate", generate_body))[0] for _ in range(args.repeats)]
+    record("generate", samples, cold_ms=round(cold_ms, 3), transactions=len(response["proposedTransactions"]))
+    transactions = response["proposedTransactions"]
+
+    # /generate-from-ledger contra el stub (sin trayectorias: el middleware solo entrega saldos)
+    ledger_body = {key_: value for key_, value in generate_body.items() if key_ != "accounts"}
+    ledger_body["accounts"] = []
+    ledger_body["parameters"] = {**generate_body["parameters"], "use_trajectory_mode": False,
+                                 "ledger_trajectories": {}, "ufv_cache": {}}
+    samples = [(await timed_post(client, "/api/ai/adjustments/generate-from-ledger", ledger_body))[0] for _ in range(args.repeats)]
+    record("generate_from_ledger", samples)
+
+    # /explain: una llamada por cuenta de la muestra
+    sample_accounts = [a for a in generate_body["accounts"] if a["balance"] > 0][:args.explain_calls]
+    samples = []
+    for account in sample_accounts:
+        body = {"account": account, "params": generate_body["parameters"], "profile_schema": profile, "company_id": company_id}
+        samples.append((await timed_post(client, "/api/ai/adjustments/explain", body))[0])
+    record("explain", samples)
+
+    # /explain-batch: el plan completo en una sola llamada
+    body = {"accounts": generate_body["accounts"], "params": generate_body["parameters"], "profile_schema": profile, "company_id": company_id}
+    samples = [(await timed_post(client, "/api/ai/adjustments/explain-batch", body))[0] for _ in range(args.repeats)]
+    record("explain_batch", samples, accounts=len(generate_body["accounts"]))
+
+    # /batch-validate con los asientos propuestos por /generate
+    samples = [(await timed_post(client, "/api/ai/adjustments/batch-validate", transactions))[0] for _ in range(args.repeats)]
+    record("batch_validate", samples, transactions=len(transactions))
+
+    # /feedback: reclasificaciones sobre cuentas de la muestra (sidecar temporal)
+    samples = []
+    for account in sample_accounts[:args.feedback_calls]:
+        body = {
+            "company_id": company_id,
+            "account_code": account["code"],
+            "account_name": account["name"],
+            "correct_type": "non_monetary",
+            "error_tag": "MISCLASSIFIED_ACCOUNT",
+            "user": "bench",
+            "existing_profile": profile
+        }
+        # learn_from_feedback todavía reporta con print: fuera de la salida del benchmark
+        with contextlib.redirect_stdout(io.StringIO()):
+            samples.append((await timed_post(client, "/api/ai/adjustments/feedback", body))[0])
+    if samples:
+        record("feedback", samples)
+    return results
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, timeout=10).stdout.strip()
+    except Exception:
+        return "unknown"
+
+def compare(previous: Dict[str, Any], current: Dict[str, Any]):
+    before = {(r["key"], r["endpoint"]): r for r in previous.get("results", [])}
+    print(f"\n📊 Comparación con {previous.get('meta', {}).get('commit', '?')}")
+    for row in current["results"]:
+        old = before.get((row["key"], row["endpoint"]))
+        if not old:
+            continue
+        change = (row["median_ms"] - old["median_ms"]) / old["median_ms"] * 100 if old["median_ms"] else 0.0
+        flag = "⚠️ " if change > 10 else "   "
+        print(f"{flag}{row['key']:<28} {row['endpoint']:<22} {old['median_ms']:>10.1f} -> {row['median_ms']:>10.1f} ms ({change:+.1f}%)")
+
+def parse_list(value: str) -> List[int]:
+    return [int(part) for part in value.split(",") if part.strip()]
+
+async def run(args) -> Dict[str, Any]:
+    import httpx
+    import ai_adjustment_engine as engine_module
+
+    results = []
+    with LedgerStub() as stub:
+        os.environ["API_BASE_URL"] = stub.url
+        transport = httpx.ASGITransport(app=engine_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for n_accounts in parse_list(args.sizes):
+                for n_rules in parse_list(args.rules):
+                    for movements in parse_list(args.movements):
+                        results.extend(await run_scenario(client, engine_module, stub, n_accounts, n_rules, movements, args))
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")}
+        },
+        "results": results
+    }
+
+def main():
+    """Función principal"""
+
+    parser = argparse.ArgumentParser(description='Benchmarks del motor de ajustes (ai_adjustment_engine)')
+    parser.add_argument('--sizes', default='1000', help='Tamaños de plan separados por coma (p.ej. 1000,10000,100000)')
+    parser.add_argument('--rules', default='0,100,1000', help='Reglas aprendidas por perfil, separadas por coma')
+    parser.add_argument('--movements', default='4', help='Movimientos del mayor por cuenta (0 = modo saldo)')
+    parser.add_argument('--repeats', type=int, default=3, help='Repeticiones en caliente por endpoint pesado')
+    parser.add_argument('--explain-calls', type=int, default=100, help='Llamadas a /explain por escenario')
+    parser.add_argument('--feedback-calls', type=int, default=10, help='Llamadas a /feedback por escenario')
+    parser.add_argument('--fiscal-year', type=int, default=2024, help='Año fiscal de la serie UFV')
+    parser.add_argument('--seed', type=int, default=7, help='Semilla del generador')
+    parser.add_argument('--output', help='Guardar resultados JSON en esta ruta')
+    parser.add_argument('--compare', help='Resultados JSON previos contra los cuales comparar')
+    args = parser.parse_args()
+
+    # Estado persistente y trazas fuera del camino del benchmark
+    sidecar = tempfile.NamedTemporaryFile(prefix='mahoraga-bench-', suffix='.db', delete=False)
+    sidecar.close()
+    os.environ.setdefault('MAHORAGA_SIDECAR_DB', sidecar.name)
+    os.environ.setdefault('MAHORAGA_LOG_LEVEL', 'WARNING')
+    # Se mide el cómputo: las repeticiones idénticas no deben salir de la caché de resultados ni de la memoización por cuenta
+    os.environ.setdefault('AI_RESULT_CACHE_SIZE', '0')
+    os.environ.setdefault('AI_ACCOUNT_MEMO', '0')
+
+    print('⏱️  MAHORAGA V9.0 - BENCHMARK DEL MOTOR DE AJUSTES')
+    print('=' * 60)
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        os.unlink(sidecar.name)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(json.load(f), report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f'\n💾 Resultados guardados en: {args.output}')
+
+if __name__ == '__main__':
+    main()
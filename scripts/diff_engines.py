@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Mahoraga V9.0 - Pruebas diferenciales: motor de referencia congelado vs motor optimizado
+Genera cuentas, perfiles, trayectorias y valores UFV aleatorios y exige igualdad EXACTA de asientos,
+confianzas y clasificación entre la referencia (ARSDSPyEngine en REFERENCE_ENGINE) y el candidato.
+Cada divergencia se minimiza y se guarda como reproductor JSON
+"""
+
+import os
+import re
+import sys
+import json
+import copy
+import contextlib
+import random
+import argparse
+import tempfile
+import time
+from typing import Dict, List, Any, Optional, Callable
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+import bench_data
+from replay_traces import load_engine, first_difference
+
+# Lógica de referencia congelada: copia versionada de ai_adjustment_engine.py anterior a las optimizaciones.
+# No depende del historial git (sobrevive a rebases); cambiarla solo cuando un cambio de resultado sea
+# intencional (y documentado en el commit).
+REFERENCE_ENGINE = os.path.join(REPO_ROOT, "scripts", "reference", "ai_adjustment_engine_ref.py")
+
+ACCOUNT_TYPES = [None, "Activo", "Pasivo", "Patrimonio", "Ingreso", "Gasto", "Costo", "Reguladora"]
+TRICKY_NAMES = [
+    "Depreciacion acumulada {asset}", "Depreciación {asset}", "{asset} en tránsito", "{ASSET}", "{asset} ",
+    "Prevision para cuentas incobrables", "Cuentas incobrables", "Ajuste por inflacion y tenencia de bienes",
+    "Capital social", "Reserva legal", "Resultados acumulados", "Caja M/N", "Banco Union M/E", "Otros activos"
+]
+
+# ---------------------------------------------------------------------------
+# Generador de casos
+# ---------------------------------------------------------------------------
+
+class CaseGenerator:
+    def __init__(self, base_profile: Dict[str, Any]):
+        self.base_profile = base_profile
+        self.assets = [a["name"] for a in bench_data.load_asset_types()]
+        self.templates = [t["name"] for t in bench_data.load_puct_templates()]
+        self.ufv = bench_data.ufv_series(2024)
+        self.dates = sorted(self.ufv)
+
+    def name(self, rng: random.Random) -> str:
+        roll = rng.random()
+        if roll < 0.35:
+            return rng.choice(self.assets)
+        if roll < 0.75:
+            return rng.choice(self.templates)
+        asset = rng.choice(self.assets)
+        return rng.choice(TRICKY_NAMES).format(asset=asset, ASSET=asset.upper())
+
+    def code(self, rng: random.Random, i: int) -> str:
+        head = rng.choice("1234567")
+        style = rng.random()
+        if style < 0.4:
+            return f"{head}-{rng.randint(1, 3)}-{rng.randint(1, 9)}-{i:03d}"
+        if style < 0.7:
+            return f"{head}.{rng.randint(1, 3)}.{i}"
+        return f"{head}{rng.randint(1, 9)}{i:04d}"
+
+    def balance(self, rng: random.Random) -> float:
+        roll = rng.random()
+        if roll < 0.1:
+            return 0.0
+        if roll < 0.15:
+            return -round(rng.uniform(1, 5000), 2)
+        if roll < 0.25:
+            return round(rng.randint(1, 99999) + 0.005, 3)  # empates de redondeo bancario
+        if roll < 0.3:
+            return round(rng.uniform(1e7, 1e9), 2)
+        return round(rng.lognormvariate(9, 1.5), 2)
+
+    def trajectory(self, rng: random.Random) -> List[Dict[str, Any]]:
+        moves = []
+        for _ in range(rng.randint(0, 6)):
+            mov_date = rng.choice(self.dates) if rng.random() < 0.9 else "2023-12-31"
+            ufv_roll = rng.random()
+            moves.append({
+                "date": mov_date,
+                "debit": round(rng.uniform(0, 20000), 2) if rng.random() < 0.7 else 0.0,
+                "credit": round(rng.uniform(0, 8000), 2) if rng.random() < 0.4 else 0.0,
+                "ufv_at_date": self.ufv.get(mov_date) if ufv_roll < 0.4 else (0 if ufv_roll < 0.5 else None)
+            })
+        return moves
+
+    def profile(self, rng: random.Random, names: List[str]) -> Optional[Dict[str, Any]]:
+        if rng.random() < 0.3:
+            return None
+        profile = copy.deepcopy(self.base_profile)
+        for key in ("monetary_rules", "non_monetary_rules"):
+            rules = []
+            for i in range(rng.randint(0, 4)):
+                target = rng.choice(names)
+                pattern = f"^{re.escape(target)}$" if rng.random() < 0.6 else re.escape(target.split()[0].lower())
+                rules.append({
+                    "pattern": pattern,
+                    "tags": ["Monetario"] if key == "monetary_rules" else rng.choice([["NoMonetario"], ["NoMonetario", "Depreciable"]]),
+                    "source_nc": rng.choice(["Mahoraga-SCL-Adaptation", "NC-3"]),
+                    "confidence_weight": rng.choice([1.0, 2.5, 5.0]),
+                    "provenance": {"reason": "diff", "event_id": f"D-{i}"}
+                })
+            profile[key] = rules
+        return profile
+
+    def case(self, seed: int) -> Dict[str, Any]:
+        rng = random.Random(seed)
+        accounts = []
+        for i in range(rng.randint(1, 25)):
+            accounts.append({"code": self.code(rng, i), "name": self.name(rng), "balance": self.balance(rng),
+                             "type": rng.choice(ACCOUNT_TYPES)})
+        trajectory_mode = rng.random() < 0.5
+        ufv_initial = rng.choice([0.0, self.ufv[self.dates[0]], round(rng.uniform(2.0, 2.6), 5)])
+        ufv_final = rng.choice([self.ufv[self.dates[-1]], ufv_initial, round(rng.uniform(2.0, 2.8), 5)])
+        params = {
+            "ufv_initial": ufv_initial,
+            "ufv_final": ufv_final,
+            "method": "UFV" if rng.random() < 0.9 else "TC",
+            "fiscal_end_date": rng.choice(["2024-12-31", "2024-06-30", None]),
+            "acquisition_dates": {a["code"]: rng.choice(self.dates + ["fecha-invalida"])
+                                  for a in accounts if rng.random() < 0.3},
+            "use_trajectory_mode": trajectory_mode,
+            "ledger_trajectories": {a["code"]: self.trajectory(rng) for a in accounts if trajectory_mode and rng.random() < 0.7},
+            "ufv_cache": {d: self.ufv[d] for d in self.dates if rng.random() < 0.5} if trajectory_mode else {}
+        }
+        return {
+            "seed": seed,
+            "request": {
+                "company_id": f"diff-{seed}",
+                "accounts": accounts,
+                "parameters": params,
+                "profile_schema": self.profile(rng, [a["name"] for a in accounts])
+            }
+        }
+
+# ---------------------------------------------------------------------------
+# Ejecución y comparación
+# ---------------------------------------------------------------------------
+
+def evaluate(module, request: Dict[str, Any]) -> Dict[str, Any]:
+    """Resultado comparable (sin las trazas DEBUG que la referencia imprime por stdout)"""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        return _evaluate(module, request)
+
+def _evaluate(module, request: Dict[str, Any]) -> Dict[str, Any]:
+    """Resultado comparable: asientos, confianzas, decisión ARS y clasificación por cuenta"""
+    body = copy.deepcopy(request)
+    engine = module.ARSDSPyEngine(body.get("profile_schema"))
+    classification = {}
+    for account in body["accounts"]:
+        label, confidence, tags, rule = engine.classify_account_semantic(module.Account(**account))
+        classification[account["code"]] = [label, confidence, list(tags), rule.get("source_nc")]
+    try:
+        result = engine.generate_adjustments(module.AdjustmentRequest(**body))
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}", "classification": classification}
+    stats = result.processing_stats
+    return {
+        "transactions": [t.model_dump(mode="json") for t in result.proposedTransactions],
+        "aggregate_confidence": result.aggregate_confidence,
+        "review_needed": result.review_needed,
+        "warnings": result.warnings,
+        "stats": {k: stats.get(k) for k in ("accounts_processed", "aitb_generated", "depreciation_generated",
+                                            "provision_generated", "suppressed_adjustments")},
+        "classification": classification
+    }
+
+def perturbed(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Variante con una cuenta y una trayectoria editadas (el resto queda memoizado en el candidato)"""
+    variant = copy.deepcopy(request)
+    for account in variant["accounts"]:
+        if account["balance"] > 0:
+            account["balance"] = round(account["balance"] + 1.0, 2)
+            break
+    for moves in variant["parameters"]["ledger_trajectories"].values():
+        if moves:
+            moves.pop()
+            break
+    return variant
+
+def divergence(reference, candidate, request: Dict[str, Any], incremental: bool = False) -> Optional[str]:
+    if incremental:
+        # Corrida previa de la misma empresa: la evaluación siguiente reutiliza las cuentas sin cambios
+        evaluate(candidate, perturbed(request))
+    return first_difference(evaluate(reference, request), evaluate(candidate, request))
+
+def shrink(request: Dict[str, Any], still_fails: Callable[[Dict[str, Any]], bool]) -> Dict[str, Any]:
+    """Minimización voraz: quita cuentas, reglas, movimientos y parámetros mientras la divergencia persista"""
+    current = copy.deepcopy(request)
+
+    def candidates(req):
+        params = req["parameters"]
+        for i in range(len(req["accounts"])):
+            if len(req["accounts"]) > 1:
+                smaller = copy.deepcopy(req)
+                code = smaller["accounts"].pop(i)["code"]
+                smaller["parameters"]["ledger_trajectories"].pop(code, None)
+                smaller["parameters"]["acquisition_dates"].pop(code, None)
+                yield smaller
+        if req.get("profile_schema"):
+            yield {**copy.deepcopy(req), "profile_schema": None}
+            for key in ("monetary_rules", "non_monetary_rules"):
+                for i in range(len(req["profile_schema"].get(key, []))):
+                    smaller = copy.deepcopy(req)
+                    smaller["profile_schema"][key].pop(i)
+                    yield smaller
+        for code, moves in params["ledger_trajectories"].items():
+            for i in range(len(moves)):
+                smaller = copy.deepcopy(req)
+                smaller["parameters"]["ledger_trajectories"][code].pop(i)
+                yield smaller
+        for key in ("ledger_trajectories", "acquisition_dates", "ufv_cache"):
+            if params.get(key):
+                smaller = copy.deepcopy(req)
+                smaller["parameters"][key] = {}
+                yield smaller
+
+    changed = True
+    while changed:
+        changed = False
+        for smaller in candidates(current):
+            if still_fails(smaller):
+                current = smaller
+                changed = True
+                break
+    return current
+
+def main():
+    """Función principal"""
+
+    parser = argparse.ArgumentParser(description='Pruebas diferenciales referencia vs motor optimizado')
+    parser.add_argument('--cases', type=int, default=500, help='Casos aleatorios a generar')
+    parser.add_argument('--seed', type=int, default=0, help='Semilla inicial (caso i usa seed + i)')
+    parser.add_argument('--reference', default=REFERENCE_ENGINE,
+                        help='ai_adjustment_engine.py de referencia (por defecto la copia congelada en scripts/reference)')
+    parser.add_argument('--candidate', default=REPO_ROOT, help='Build candidata (directorio o archivo)')
+    parser.add_argument('--candidate-env', action='append', default=[], metavar='CLAVE=VALOR',
+                        help='Variables de entorno al importar el candidato (p.ej. un backend de cómputo)')
+    parser.add_argument('--reproducers', default=os.path.join(tempfile.gettempdir(), 'mahoraga-diff'),
+                        help='Directorio donde guardar los reproductores minimizados')
+    parser.add_argument('--replay', help='Reejecutar un reproductor JSON guardado')
+    parser.add_argument('--max-failures', type=int, default=5, help='Detenerse tras N divergencias')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Precalentar la memoización por cuenta del candidato con una variante editada de cada caso')
+    args = parser.parse_args()
+
+    os.environ.setdefault('MAHORAGA_LOG_LEVEL', 'WARNING')
+    os.environ.pop('MAHORAGA_RECORD_PATH', None)
+
+    print('⚖️  MAHORAGA V9.0 - PRUEBAS DIFERENCIALES')
+    print('=' * 60)
+    reference = load_engine(args.reference, "reference")
+    saved_env = dict(os.environ)
+    if args.incremental:
+        os.environ['AI_ACCOUNT_MEMO'] = '1'  # la memoización por cuenta es opt-in
+    for item in args.candidate_env:
+        key, _, value = item.partition("=")
+        os.environ[key] = value
+    candidate = load_engine(args.candidate, "candidate")
+    os.environ.clear()
+    os.environ.update(saved_env)
+    print(f"   referencia: {os.path.relpath(args.reference, REPO_ROOT)}")
+    print(f"   candidato:  {args.candidate} {' '.join(args.candidate_env)}")
+
+    if args.replay:
+        with open(args.replay, 'r', encoding='utf-8') as f:
+            reproducer = json.load(f)
+        diff = divergence(reference, candidate, reproducer["request"], args.incremental)
+        print(f"\n{'❌ ' + diff if diff else '✅ Sin divergencia'}")
+        sys.exit(1 if diff else 0)
+
+    generator = CaseGenerator(reference.AdjustmentProfileSchema().profile_data)
+    failures = []
+    started = time.perf_counter()
+    for i in range(args.cases):
+        case = generator.case(args.seed + i)
+        diff = divergence(reference, candidate, case["request"], args.incremental)
+        if not diff:
+            continue
+        minimized = shrink(case["request"], lambda req: divergence(reference, candidate, req, args.incremental) is not None)
+        detail = divergence(reference, candidate, minimized, args.incremental)
+        os.makedirs(args.reproducers, exist_ok=True)
+        path = os.path.join(args.reproducers, f"divergence-seed{case['seed']}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "seed": case["seed"],
+                "detail": detail,
+                "request": minimized,
+                "reference": evaluate(reference, minimized),
+                "candidate": evaluate(candidate, minimized)
+            }, f, indent=2, ensure_ascii=False)
+        failures.append(path)
+        print(f"   ❌ seed {case['seed']}: {detail[:200]}")
+        print(f"      reproductor ({len(minimized['accounts'])} cuentas): {path}")
+        if len(failures) >= args.max_failures:
+            break
+
+    elapsed = time.perf_counter() - started
+    print(f"\n📊 {i + 1} casos en {elapsed:.1f} s: {len(failures)} divergencias")
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
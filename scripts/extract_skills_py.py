@@ -3,17 +3,29 @@
 Mahoraga Skill System V7.0 - Extractor de Skills Python
 Extrae automáticamente funciones, métodos y clases de archivos Python
 Genera skill cards JSON con metadatos para el sistema de habilidades
+
+V9.0: Un solo recorrido AST por archivo (SkillVisitor), archivos en paralelo
+(ProcessPoolExecutor) y caché por hash de contenido: los archivos sin cambios
+reutilizan sus skill cards sin volver a parsearse.
 """
 
 import os
 import re
 import json
 import ast
-import inspect
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 
+OUTPUT_PATH = os.path.join('web-app', 'server', 'skills_output_py.json')
+CACHE_PATH = os.path.join('web-app', 'server', '.skills_output_py.cache.json')
+
+# Subir al cambiar la lógica de extracción (invalida la caché completa)
+EXTRACTOR_VERSION = '9.0'
+
 class PythonSkillExtractor:
     """Extractor de skills para archivos Python"""
 
@@ -90,12 +102,11 @@ class PythonSkillExtractor:
                     arg_index = node.args.args.index(arg)
                     if arg_index >= default_index:
                         default_value = node.args.defaults[arg_index - default_index]
-                        if isinstance(default_value, ast.Str):
-                            param_name += f"='{default_value.s}'"
-                        elif isinstance(default_value, ast.Num):
-                            param_name += f"={default_value.n}"
-                        elif isinstance(default_value, ast.NameConstant):
-                            param_name += f"={default_value.value}"
+                        value = default_value.value if isinstance(default_value, ast.Constant) else Ellipsis
+                        if isinstance(value, str):
+                            param_name += f"='{value}'"
+                        elif value is None or isinstance(value, (bool, int, float, complex)):
+                            param_name += f"={value}"
                         else:
                             param_name += "=default"
 
@@ -136,12 +147,13 @@ class PythonSkillExtractor:
 
         skills = []
         class_name = node.name
+        normalized_path = file_path.replace('\\', '/')
 
         # Skill para la clase misma
         class_skill = {
-            'id': f"{file_path.replace('\\', '/')}::{class_name}",
+            'id': f"{normalized_path}::{class_name}",
             'name': class_name,
-            'file': file_path.replace('\\', '/'),
+            'file': normalized_path,
             'type': 'class',
             'signature': '',
             'isPure': False,
@@ -161,7 +173,7 @@ class PythonSkillExtractor:
             if isinstance(item, ast.FunctionDef):
                 method_skill = self.extract_function_info(item, file_path, source_code)
                 method_skill['name'] = f"{class_name}.{item.name}"
-                method_skill['id'] = f"{file_path.replace('\\', '/')}::{class_name}.{item.name}"
+                method_skill['id'] = f"{normalized_path}::{class_name}.{item.name}"
                 skills.append(method_skill)
 
         return skills
@@ -255,7 +267,16 @@ class PythonSkillExtractor:
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
                 source_code = f.read()
+            return self.process_source(file_path, source_code)
+
+        except Exception as error:
+            print(f"❌ Error procesando {file_path}: {error}")
+            return []
 
+    def process_source(self, file_path: str, source_code: str) -> List[Dict[str, Any]]:
+        """Extrae skills del código fuente ya leído (un solo recorrido del AST)"""
+
+        try:
             # Parsear AST
             try:
                 tree = ast.parse(source_code, filename=file_path)
@@ -263,20 +284,9 @@ class PythonSkillExtractor:
                 print(f"⚠️ No se pudo parsear {file_path}: {e}")
                 return []
 
-            skills = []
-
-            for node in ast.walk(tree):
-                if isinstance(node, ast.FunctionDef):
-                    # Solo funciones de nivel módulo (no métodos de clase)
-                    if not self.is_method_of_class(node, tree):
-                        skill = self.extract_function_info(node, file_path, source_code)
-                        skills.append(skill)
-
-                elif isinstance(node, ast.ClassDef):
-                    class_skills = self.extract_class_info(node, file_path, source_code)
-                    skills.extend(class_skills)
-
-            return skills
+            visitor = SkillVisitor(self, file_path, source_code)
+            visitor.visit(tree)
+            return visitor.ordered_skills()
 
         except Exception as error:
             print(f"❌ Error procesando {file_path}: {error}")
@@ -303,21 +313,146 @@ class PythonSkillExtractor:
             else:
                 print(f"⚠️ Elemento no encontrado: {scan_item}")
 
-        return list(set(files))  # Eliminar duplicados
+        return sorted(set(files))  # Eliminar duplicados (orden estable entre ejecuciones)
+
+class SkillVisitor(ast.NodeVisitor):
+    """
+    Recorrido único del AST con seguimiento del ámbito de clase.
+    - Clases (en cualquier nivel): skill de la clase + sus métodos directos.
+    - Funciones que no son métodos directos de una clase (módulo o anidadas): skill de función.
+    Las skills se ordenan como el recorrido en anchura de ast.walk (profundidad, ruta de hijos),
+    para que el JSON y la deduplicación por ID no cambien respecto al extractor anterior.
+    """
+
+    def __init__(self, extractor: 'PythonSkillExtractor', file_path: str, source_code: str):
+        self.extractor = extractor
+        self.file_path = file_path
+        self.source_code = source_code
+        self._path: List[int] = []
+        self._method_ids = set()
+        self._found: List[Tuple[Tuple[int, Tuple[int, ...]], List[Dict[str, Any]]]] = []
+
+    def generic_visit(self, node: ast.AST):
+        # Mismo orden de hijos que ast.iter_child_nodes, guardando la posición de cada uno
+        for index, child in enumerate(ast.iter_child_nodes(node)):
+            self._path.append(index)
+            self.visit(child)
+            self._path.pop()
+
+    def _emit(self, skills: List[Dict[str, Any]]):
+        self._found.append(((len(self._path), tuple(self._path)), skills))
+
+    def visit_ClassDef(self, node: ast.ClassDef):
+        self._method_ids.update(id(item) for item in node.body if isinstance(item, ast.FunctionDef))
+        self._emit(self.extractor.extract_class_info(node, self.file_path, self.source_code))
+        self.generic_visit(node)
+
+    def visit_FunctionDef(self, node: ast.FunctionDef):
+        # Solo funciones de nivel módulo o anidadas (no métodos de clase)
+        if id(node) not in self._method_ids:
+            self._emit([self.extractor.extract_function_info(node, self.file_path, self.source_code)])
+        self.generic_visit(node)
+
+    def ordered_skills(self) -> List[Dict[str, Any]]:
+        skills = []
+        for _, found in sorted(self._found, key=lambda entry: entry[0]):
+            skills.extend(found)
+        return skills
+
+def _extract_source(job: Tuple[str, str]) -> List[Dict[str, Any]]:
+    """Trabajo del pool de procesos: (ruta, código) -> skill cards"""
+    file_path, source_code = job
+    return PythonSkillExtractor().process_source(file_path, source_code)
+
+class SkillCache:
+    """Caché por hash de contenido: {ruta: {hash, skills}}"""
+
+    def __init__(self, path: str = CACHE_PATH, config: Optional[Dict[str, Any]] = None):
+        self.path = path
+        # La versión y la configuración del extractor forman parte de la clave
+        self.salt = hashlib.sha256(
+            (EXTRACTOR_VERSION + json.dumps(config or {}, sort_keys=True)).encode('utf-8')
+        ).hexdigest()
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('salt') == self.salt:
+                self.entries = data.get('files', {})
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def content_hash(source_code: str) -> str:
+        return hashlib.sha256(source_code.encode('utf-8')).hexdigest()
+
+    def get(self, file_path: str, digest: str) -> Optional[List[Dict[str, Any]]]:
+        entry = self.entries.get(file_path)
+        if entry and entry.get('hash') == digest:
+            return entry['skills']
+        return None
+
+    def put(self, file_path: str, digest: str, skills: List[Dict[str, Any]]):
+        self.entries[file_path] = {'hash': digest, 'skills': skills}
+
+    def save(self, file_paths: List[str]):
+        # Solo se conservan los archivos del escaneo actual
+        entries = {fp: self.entries[fp] for fp in file_paths if fp in self.entries}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'salt': self.salt, 'files': entries}, f, ensure_ascii=False)
+
+def extract_all(extractor: PythonSkillExtractor, python_files: List[str], jobs: int,
+                use_cache: bool = True) -> Tuple[Dict[str, List[Dict[str, Any]]], int]:
+    """Extrae skills de todos los archivos; devuelve ({ruta: skills}, archivos reutilizados de caché)"""
+
+    cache = SkillCache(config=extractor.config) if use_cache else None
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    pending: List[Tuple[str, str, str]] = []
+    reused = 0
 
-    def is_method_of_class(self, func_node: ast.FunctionDef, tree: ast.AST) -> bool:
-        """Verifica si una función es un método de clase (tiene ancestro ClassDef)"""
-        # Recorrer todos los nodos para encontrar si func_node está dentro de una clase
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef):
-                # Verificar si func_node está en el body de esta clase
-                if func_node in node.body:
-                    return True
-        return False
+    for file_path in python_files:
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                source_code = f.read()
+        except Exception as error:
+            print(f"❌ Error procesando {file_path}: {error}")
+            results[file_path] = []
+            continue
+
+        digest = SkillCache.content_hash(source_code)
+        cached = cache.get(file_path, digest) if cache else None
+        if cached is not None:
+            results[file_path] = cached
+            reused += 1
+        else:
+            pending.append((file_path, source_code, digest))
+
+    jobs_input = [(file_path, source_code) for file_path, source_code, _ in pending]
+    if jobs > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(pending))) as pool:
+            extracted = list(pool.map(_extract_source, jobs_input))
+    else:
+        extracted = [extractor.process_source(file_path, source_code) for file_path, source_code in jobs_input]
+
+    for (file_path, _, digest), skills in zip(pending, extracted):
+        results[file_path] = skills
+        if cache:
+            cache.put(file_path, digest, skills)
+
+    if cache:
+        cache.save(python_files)
+
+    return results, reused
 
 def main():
     """Función principal"""
 
+    parser = argparse.ArgumentParser(description='Extractor de skills Python (Mahoraga)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='Procesos en paralelo')
+    parser.add_argument('--no-cache', action='store_true', help='Ignorar la caché por hash de contenido')
+    args = parser.parse_args()
+
     print('🐍 MAHORAGA SKILL SYSTEM V7.0 - EXTRACTOR PYTHON')
     print('=' * 60)
 
@@ -329,10 +464,13 @@ def main():
     python_files = extractor.find_python_files()
     print(f"\n📁 Encontrados {len(python_files)} archivos Python")
 
+    extracted, reused = extract_all(extractor, python_files, args.jobs, use_cache=not args.no_cache)
+    print(f"♻️ Reutilizados de caché: {reused} | Parseados: {len(python_files) - reused}")
+
     # Procesar archivos
     for file_path in python_files:
         print(f"\n📄 Procesando: {file_path}")
-        skills = extractor.process_file(file_path)
+        skills = extracted[file_path]
 
         if skills:
             all_skills.extend(skills)
@@ -356,7 +494,7 @@ def main():
             seen_ids.add(skill['id'])
 
     # Guardar resultado
-    output_path = os.path.join('web-app', 'server', 'skills_output_py.json')
+    output_path = OUTPUT_PATH
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
     with open(output_path, 'w', encoding='utf-8') as f:
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Mahoraga V9.0 - Prueba de carga del motor de ajustes
+Carga mixta multi-tenant (muchas /explain pequeñas junto a cierres /generate grandes) con concurrencia
+configurable, contra la app en proceso (transporte ASGI de httpx) o contra un uvicorn local.
+Reporta latencia p50/p95/p99, throughput y lag del event loop
+"""
+
+import os
+import sys
+import json
+import socket
+import argparse
+import asyncio
+import random
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import bench_data
+from bench_engine import percentile, git_commit
+
+ENDPOINTS = {
+    "explain": "/api/ai/adjustments/explain",
+    "generate": "/api/ai/adjustments/generate",
+    "batch_validate": "/api/ai/adjustments/batch-validate",
+    "health": "/api/ai/health"
+}
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """'explain=0.9,generate=0.1' -> pesos normalizados"""
+    weights = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise SystemExit(f"Endpoint desconocido en --mix: {name} (válidos: {', '.join(ENDPOINTS)})")
+        weights[name] = float(weight or 1)
+    total = sum(weights.values())
+    return {name: weight / total for name, weight in weights.items()}
+
+def build_tenants(args, base_profile: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Un plan, perfil y cuerpos de petición por empresa (reglas y tamaños distintos por tenant)"""
+    tenants = []
+    ufv_cache = bench_data.ufv_series(args.fiscal_year)
+    for i in range(args.tenants):
+        seed = args.seed + i
+        chart = bench_data.build_chart(args.generate_accounts, seed=seed)
+        trajectories = bench_data.build_trajectories(chart, args.movements, ufv_cache, seed=seed)
+        profile = bench_data.build_profile(base_profile, args.rules, chart, seed=seed)
+        company_id = f"load-{i}"
+        generate = bench_data.build_generate_request(chart, company_id, profile, trajectories, ufv_cache, args.fiscal_year)
+        explain_params = {**generate["parameters"], "ledger_trajectories": {}, "ufv_cache": {}, "use_trajectory_mode": False}
+        tenants.append({
+            "company_id": company_id,
+            "profile": profile,
+            "generate": generate,
+            "explain_accounts": [a for a in generate["accounts"] if a["balance"] > 0],
+            "explain_params": explain_params,
+            "transactions": []
+        })
+    return tenants
+
+def request_for(kind: str, tenant: Dict[str, Any], rng: random.Random) -> Optional[Any]:
+    if kind == "generate":
+        return tenant["generate"]
+    if kind == "explain":
+        account = rng.choice(tenant["explain_accounts"])
+        return {"account": account, "params": tenant["explain_params"], "profile_schema": tenant["profile"],
+                "company_id": tenant["company_id"]}
+    if kind == "batch_validate":
+        return tenant["transactions"] or None
+    return None
+
+class LoopLagMonitor:
+    """Mide el retraso de un sleep periódico: cuánto tiempo estuvo bloqueado el event loop"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples_ms: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples_ms.append(max(0.0, (time.perf_counter() - t0 - self.interval) * 1000))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+async def worker(client, tenants: List[Dict[str, Any]], mix: Dict[str, float], deadline: float, budget: List[int],
+                 results: Dict[str, Dict[str, Any]], seed: int):
+    rng = random.Random(seed)
+    kinds, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline and budget[0] > 0:
+        # Con el transporte ASGI ninguna petición suspende por E/S: ceder el turno para que los
+        # clientes (y el monitor de lag) se intercalen como lo harían con conexiones reales
+        await asyncio.sleep(0)
+        budget[0] -= 1
+        kind = rng.choices(kinds, weights)[0]
+        tenant = rng.choice(tenants)
+        body = request_for(kind, tenant, rng)
+        if kind == "batch_validate" and body is None:
+            kind, body = "generate", tenant["generate"]
+        stats = results.setdefault(kind, {"latencies_ms": [], "errors": 0, "status": {}})
+        t0 = time.perf_counter()
+        try:
+            if kind == "health":
+                response = await client.get(ENDPOINTS[kind])
+            else:
+                response = await client.post(ENDPOINTS[kind], json=body)
+            status = str(response.status_code)
+            if response.status_code == 200 and kind == "generate" and not tenant["transactions"]:
+                tenant["transactions"] = response.json()["proposedTransactions"]
+        except Exception as e:
+            status = type(e).__name__
+        stats["latencies_ms"].append((time.perf_counter() - t0) * 1000)
+        stats["status"][status] = stats["status"].get(status, 0) + 1
+        if status != "200":
+            stats["errors"] += 1
+
+def latency_summary(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    return {
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+        "max_ms": round(max(samples), 3)
+    }
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_uvicorn(workers: int) -> Tuple[subprocess.Popen, str]:
+    """uvicorn local sobre ai_adjustment_engine:app; espera a que /api/ai/health responda"""
+    import httpx
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "ai_adjustment_engine:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=REPO_ROOT, stdout=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        try:
+            if httpx.get(f"{url}/api/ai/health", timeout=1.0).status_code == 200:
+                return proc, url
+        except Exception:
+            pass
+        if proc.poll() is not None:
+            raise RuntimeError("uvicorn terminó antes de aceptar conexiones")
+        time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("uvicorn no respondió a /api/ai/health")
+
+async def run(args) -> Dict[str, Any]:
+    import httpx
+    import ai_adjustment_engine as engine_module
+
+    mix = parse_mix(args.mix)
+    tenants = build_tenants(args, engine_module.AdjustmentProfileSchema().profile_data)
+
+    uvicorn_proc = None
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout,
+                                   limits=httpx.Limits(max_connections=args.concurrency))
+        target = args.url
+    elif args.uvicorn:
+        uvicorn_proc, url = start_uvicorn(args.uvicorn_workers)
+        client = httpx.AsyncClient(base_url=url, timeout=args.timeout,
+                                   limits=httpx.Limits(max_connections=args.concurrency))
+        target = f"uvicorn ({url}, {args.uvicorn_workers} workers)"
+    else:
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=engine_module.app), base_url="http://load",
+                                   timeout=args.timeout)
+        target = "asgi (en proceso)"
+
+    results: Dict[str, Dict[str, Any]] = {}
+    monitor = LoopLagMonitor()
+    try:
+        async with client:
+            # Calentamiento: un /generate por tenant (compila motores y llena transactions para batch-validate)
+            for tenant in tenants[:args.warmup]:
+                response = await client.post(ENDPOINTS["generate"], json=tenant["generate"])
+                if response.status_code == 200:
+                    tenant["transactions"] = response.json()["proposedTransactions"]
+
+            monitor.start()
+            budget = [args.requests or sys.maxsize]
+            started = time.perf_counter()
+            deadline = started + args.duration
+            await asyncio.gather(*(
+                worker(client, tenants, mix, deadline, budget, results, args.seed + n)
+                for n in range(args.concurrency)
+            ))
+            elapsed = time.perf_counter() - started
+            await monitor.stop()
+    finally:
+        if uvicorn_proc:
+            uvicorn_proc.terminate()
+            uvicorn_proc.wait(timeout=10)
+
+    all_latencies = [ms for stats in results.values() for ms in stats["latencies_ms"]]
+    endpoints = {
+        kind: {
+            "requests": len(stats["latencies_ms"]),
+            "errors": stats["errors"],
+            "status": stats["status"],
+            "throughput_rps": round(len(stats["latencies_ms"]) / elapsed, 3),
+            **latency_summary(stats["latencies_ms"])
+        }
+        for kind, stats in sorted(results.items())
+    }
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "target": target,
+            "config": {k: v for k, v in vars(args).items() if k != "output"}
+        },
+        "elapsed_s": round(elapsed, 3),
+        "total": {
+            "requests": len(all_latencies),
+            "errors": sum(stats["errors"] for stats in results.values()),
+            "throughput_rps": round(len(all_latencies) / elapsed, 3),
+            **latency_summary(all_latencies)
+        },
+        "endpoints": endpoints,
+        # En modo asgi la app comparte el loop: el lag es el bloqueo que provoca el motor.
+        # Contra uvicorn solo refleja al cliente de carga.
+        "event_loop_lag": {"samples": len(monitor.samples_ms), **latency_summary(monitor.samples_ms)}
+    }
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n🎯 Objetivo: {report['meta']['target']}   duración: {report['elapsed_s']} s")
+    header = f"   {'endpoint':<16}{'reqs':>7}{'err':>6}{'rps':>9}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}"
+    print(header)
+    rows = list(report["endpoints"].items()) + [("TOTAL", report["total"])]
+    for kind, stats in rows:
+        print(f"   {kind:<16}{stats['requests']:>7}{stats['errors']:>6}{stats['throughput_rps']:>9.1f}"
+              f"{stats.get('p50_ms', 0):>10.1f}{stats.get('p95_ms', 0):>10.1f}{stats.get('p99_ms', 0):>10.1f}{stats.get('max_ms', 0):>10.1f}")
+    lag = report["event_loop_lag"]
+    if lag.get("samples"):
+        print(f"\n🌀 Lag del event loop: p50 {lag['p50_ms']:.1f} ms  p95 {lag['p95_ms']:.1f} ms  "
+              f"p99 {lag['p99_ms']:.1f} ms  max {lag['max_ms']:.1f} ms")
+
+def main():
+    """Función principal"""
+
+    parser = argparse.ArgumentParser(description='Prueba de carga mixta del motor de ajustes')
+    parser.add_argument('--mix', default='explain=0.9,generate=0.08,batch_validate=0.02',
+                        help='Pesos por endpoint (explain, generate, batch_validate, health)')
+    parser.add_argument('--concurrency', type=int, default=16, help='Clientes concurrentes')
+    parser.add_argument('--duration', type=float, default=30.0, help='Duración máxima en segundos')
+    parser.add_argument('--requests', type=int, default=0, help='Tope de peticiones (0 = solo duración)')
+    parser.add_argument('--tenants', type=int, default=4, help='Empresas simuladas (perfil y plan propios)')
+    parser.add_argument('--generate-accounts', type=int, default=500, help='Cuentas por cierre /generate')
+    parser.add_argument('--rules', type=int, default=100, help='Reglas aprendidas por perfil')
+    parser.add_argument('--movements', type=int, default=4, help='Movimientos del mayor por cuenta')
+    parser.add_argument('--warmup', type=int, default=4, help='Tenants precalentados antes de medir')
+    parser.add_argument('--timeout', type=float, default=300.0, help='Timeout por petición (s)')
+    parser.add_argument('--url', help='Atacar un servidor ya levantado (p.ej. http://localhost:8003)')
+    parser.add_argument('--uvicorn', action='store_true', help='Levantar un uvicorn local en un puerto libre')
+    parser.add_argument('--uvicorn-workers', type=int, default=1, help='Workers del uvicorn local')
+    parser.add_argument('--fiscal-year', type=int, default=2024, help='Año fiscal de la serie UFV')
+    parser.add_argument('--seed', type=int, default=7, help='Semilla del generador')
+    parser.add_argument('--output', help='Guardar el reporte JSON en esta ruta')
+    args = parser.parse_args()
+
+    # Estado persistente y trazas fuera del camino de la prueba (el uvicorn hijo hereda el entorno)
+    sidecar = tempfile.NamedTemporaryFile(prefix='mahoraga-load-', suffix='.db', delete=False)
+    sidecar.close()
+    os.environ.setdefault('MAHORAGA_SIDECAR_DB', sidecar.name)
+    os.environ.setdefault('MAHORAGA_LOG_LEVEL', 'WARNING')
+    # Los cuerpos se repiten entre workers: sin caché de resultados ni memoización para cargar el motor de verdad
+    os.environ.setdefault('AI_RESULT_CACHE_SIZE', '0')
+    os.environ.setdefault('AI_ACCOUNT_MEMO', '0')
+
+    print('🚦 MAHORAGA V9.0 - PRUEBA DE CARGA')
+    print('=' * 60)
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        os.unlink(sidecar.name)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f'\n💾 Reporte guardado en: {args.output}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Mahoraga V9.0 - Reproducción de trazas grabadas del motor de ajustes
+Lee las trazas JSONL gzip de MAHORAGA_RECORD_PATH y las reproduce (ASGI en proceso) contra una build
+candidata y, opcionalmente, una build de referencia: compara respuestas completas y tiempos
+"""
+
+import os
+import sys
+import gzip
+import json
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+import importlib.util
+from typing import Dict, List, Any, Optional, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Los endpoints de generación se reproducen contra /generate: la petición grabada ya trae el mayor expandido
+REPLAY_PATHS = {
+    "generate": "/api/ai/adjustments/generate",
+    "generate-from-ledger": "/api/ai/adjustments/generate",
+    "explain": "/api/ai/adjustments/explain",
+    "explain-batch": "/api/ai/adjustments/explain-batch",
+    "batch-validate": "/api/ai/adjustments/batch-validate"
+}
+# Campos que cambian entre ejecuciones sin que cambie el resultado contable
+VOLATILE_KEYS = {"processing_time_seconds", "stage_timings", "profile_version", "profile_etag", "rule_hits_flushed", "last_hit",
+                 "result_cache", "accounts_reused", "accounts_recomputed"}
+
+def load_traces(paths: List[str]) -> Tuple[Dict[str, Dict], List[Dict]]:
+    profiles, requests = {}, []
+    for path in paths:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record["kind"] == "profile":
+                    profiles[record["profile_hash"]] = record["profile"]
+                elif record["kind"] == "request":
+                    requests.append(record)
+    return profiles, requests
+
+def load_engine(path: str, alias: str):
+    """Importa ai_adjustment_engine.py de otra build (directorio o archivo) con sidecar propio"""
+    module_path = os.path.join(path, "ai_adjustment_engine.py") if os.path.isdir(path) else path
+    sidecar = os.path.join(tempfile.mkdtemp(prefix=f"replay-{alias}-"), "sidecar.db")
+    os.environ["MAHORAGA_SIDECAR_DB"] = sidecar
+    spec = importlib.util.spec_from_file_location(f"replay_engine_{alias}", module_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def normalize(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: normalize(v) for k, v in value.items() if k not in VOLATILE_KEYS}
+    if isinstance(value, list):
+        return [normalize(v) for v in value]
+    return value
+
+def first_difference(a: Any, b: Any, path: str = "$") -> Optional[str]:
+    """Ruta y valores de la primera diferencia (None si son iguales)"""
+    if type(a) != type(b):
+        return f"{path}: {a!r} != {b!r}"
+    if isinstance(a, dict):
+        for key in sorted(set(a) | set(b)):
+            if key not in a or key not in b:
+                return f"{path}.{key}: {'<ausente>' if key not in a else a[key]!r} != {'<ausente>' if key not in b else b[key]!r}"
+            diff = first_difference(a[key], b[key], f"{path}.{key}")
+            if diff:
+                return diff
+        return None
+    if isinstance(a, list):
+        if len(a) != len(b):
+            return f"{path}: longitud {len(a)} != {len(b)}"
+        for i, (x, y) in enumerate(zip(a, b)):
+            diff = first_difference(x, y, f"{path}[{i}]")
+            if diff:
+                return diff
+        return None
+    return None if a == b else f"{path}: {a!r} != {b!r}"
+
+def replay_body(record: Dict[str, Any], profiles: Dict[str, Dict]) -> Any:
+    body = record["body"]
+    if isinstance(body, dict) and record.get("profile_hash"):
+        body = {**body, "profile_schema": profiles.get(record["profile_hash"])}
+    return body
+
+async def replay(module, records: List[Dict], profiles: Dict[str, Dict], repeat: int) -> List[Dict[str, Any]]:
+    """Respuesta normalizada y mejor tiempo (de `repeat` ejecuciones) por petición"""
+    import httpx
+    outcomes = []
+    transport = httpx.ASGITransport(app=module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=None) as client:
+        for record in records:
+            body = replay_body(record, profiles)
+            timings = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                response = await client.post(REPLAY_PATHS[record["endpoint"]], json=body)
+                timings.append((time.perf_counter() - t0) * 1000)
+            payload = response.json() if response.headers.get("content-type", "").startswith("application/json") else response.text
+            outcomes.append({"status": response.status_code, "ms": min(timings), "payload": normalize(payload)})
+    return outcomes
+
+def summary_mismatch(recorded: Dict[str, Any], payload: Any) -> Optional[str]:
+    """Compara el resumen grabado en producción con el de la reproducción (solo campos comunes)"""
+    if not isinstance(payload, (dict, list)):
+        return "respuesta no JSON"
+    if isinstance(payload, list):
+        current = {"items": len(payload)}
+    else:
+        current = {k: v for k, v in payload.items() if isinstance(v, (bool, int, float))}
+        if "proposedTransactions" in payload:
+            current["transactions"] = len(payload["proposedTransactions"])
+            current["total_debit"] = round(sum(e["debit"] for t in payload["proposedTransactions"] for e in t["entries"]), 2)
+    for key, value in recorded.items():
+        if key in current and current[key] != value:
+            return f"{key}: grabado {value!r} != reproducido {current[key]!r}"
+    return None
+
+def timing_table(records: List[Dict], column: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    table = {}
+    for endpoint in sorted({r["endpoint"] for r in records}):
+        values = column.get(endpoint, [])
+        if values:
+            ordered = sorted(values)
+            table[endpoint] = {
+                "requests": len(values),
+                "median_ms": round(statistics.median(values), 3),
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+                "total_ms": round(sum(values), 3)
+            }
+    return table
+
+def main():
+    """Función principal"""
+
+    parser = argparse.ArgumentParser(description='Reproduce trazas grabadas contra builds del motor')
+    parser.add_argument('traces', nargs='+', help='Archivos de trazas (.jsonl.gz)')
+    parser.add_argument('--engine', default=REPO_ROOT, help='Build candidata (directorio o ai_adjustment_engine.py)')
+    parser.add_argument('--baseline', help='Build de referencia contra la cual comparar respuestas y tiempos')
+    parser.add_argument('--endpoint', action='append', choices=sorted(REPLAY_PATHS), help='Filtrar por endpoint (repetible)')
+    parser.add_argument('--limit', type=int, default=0, help='Máximo de peticiones a reproducir')
+    parser.add_argument('--repeat', type=int, default=1, help='Ejecuciones por petición (se toma la más rápida)')
+    parser.add_argument('--show', type=int, default=10, help='Divergencias a mostrar')
+    parser.add_argument('--output', help='Guardar el reporte JSON en esta ruta')
+    args = parser.parse_args()
+
+    os.environ.setdefault('MAHORAGA_LOG_LEVEL', 'WARNING')
+    os.environ.pop('MAHORAGA_RECORD_PATH', None)  # la reproducción no debe volver a grabarse
+    # --repeat y la comparación de tiempos miden el motor, no las cachés de resultados y de cuentas
+    os.environ.setdefault('AI_RESULT_CACHE_SIZE', '0')
+    os.environ.setdefault('AI_ACCOUNT_MEMO', '0')
+
+    print('🎞️  MAHORAGA V9.0 - REPRODUCCIÓN DE TRAZAS')
+    print('=' * 60)
+    profiles, records = load_traces(args.traces)
+    if args.endpoint:
+        records = [r for r in records if r["endpoint"] in args.endpoint]
+    if args.limit:
+        records = records[:args.limit]
+    print(f"📼 {len(records)} peticiones, {len(profiles)} perfiles")
+    omitted = sum(1 for r in records if r.get("profile_omitted"))
+    if omitted:
+        print(f"⚠️  {omitted} peticiones usaban un perfil no grabado (MAHORAGA_RECORD_PROFILES=1 para incluirlo): "
+              f"se reproducen con el perfil por defecto y el resumen grabado puede no coincidir")
+    if not records:
+        return
+
+    builds = [("candidate", args.engine)] + ([("baseline", args.baseline)] if args.baseline else [])
+    outcomes = {}
+    for alias, path in builds:
+        module = load_engine(path, alias)
+        outcomes[alias] = asyncio.run(replay(module, records, profiles, args.repeat))
+        print(f"   ▶ {alias:<9} {path}")
+
+    report = {"requests": len(records), "builds": dict(builds), "divergences": [], "summary_mismatches": [], "errors": []}
+    timings = {alias: {} for alias, _ in builds}
+    timings["recorded"] = {}
+    for i, record in enumerate(records):
+        timings["recorded"].setdefault(record["endpoint"], []).append(record["duration_ms"])
+        for alias, _ in builds:
+            outcome = outcomes[alias][i]
+            timings[alias].setdefault(record["endpoint"], []).append(outcome["ms"])
+            if outcome["status"] != 200:
+                report["errors"].append({"index": i, "build": alias, "endpoint": record["endpoint"], "status": outcome["status"]})
+        candidate = outcomes["candidate"][i]
+        mismatch = summary_mismatch(record.get("response_summary") or {}, candidate["payload"])
+        if mismatch:
+            report["summary_mismatches"].append({"index": i, "endpoint": record["endpoint"], "correlation_id": record.get("correlation_id"), "detail": mismatch})
+        if args.baseline:
+            diff = first_difference(outcomes["baseline"][i]["payload"], candidate["payload"])
+            if diff:
+                report["divergences"].append({"index": i, "endpoint": record["endpoint"], "correlation_id": record.get("correlation_id"), "detail": diff})
+
+    report["timings"] = {alias: timing_table(records, column) for alias, column in timings.items()}
+
+    print('\n⏱️  Tiempos (mediana por petición):')
+    for endpoint in sorted({r["endpoint"] for r in records}):
+        row = "   " + f"{endpoint:<22}"
+        for alias in ["recorded"] + [a for a, _ in builds]:
+            stats = report["timings"][alias].get(endpoint)
+            row += f"{alias} {stats['median_ms']:>9.1f} ms   " if stats else ""
+        if args.baseline:
+            base, cand = report["timings"]["baseline"][endpoint]["median_ms"], report["timings"]["candidate"][endpoint]["median_ms"]
+            row += f"x{base / cand:.2f}" if cand else ""
+        print(row)
+
+    print(f"\n🔍 Errores HTTP: {len(report['errors'])}   resúmenes distintos a producción: {len(report['summary_mismatches'])}", end="")
+    print(f"   divergencias vs baseline: {len(report['divergences'])}" if args.baseline else "")
+    for item in (report["divergences"] or report["summary_mismatches"])[:args.show]:
+        print(f"   ❌ #{item['index']} {item['endpoint']} [{item['correlation_id']}] {item['detail'][:300]}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f'\n💾 Reporte guardado en: {args.output}')
+
+    if report["divergences"] or report["errors"]:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Mahoraga V9.0 - Pruebas de comportamiento de los almacenes sidecar del motor de ajustes
+Migración de eventos de adaptación, inmutabilidad y retención de versiones de perfil,
+invalidación de la caché de resultados / memoización por cuenta y réplica de impactos SCL.
+Uso: python test_sidecar_stores.py   (o python -m pytest test_sidecar_stores.py)
+"""
+
+import os
+import re
+import sys
+import json
+import sqlite3
+import tempfile
+import traceback
+
+# El sidecar de las pruebas nunca es el del repositorio; se fija antes de importar el motor
+os.environ["MAHORAGA_SIDECAR_DB"] = os.path.join(tempfile.mkdtemp(prefix="mahoraga-test-"), "sidecar.db")
+os.environ.setdefault("MAHORAGA_LOG_LEVEL", "WARNING")
+os.environ.pop("MAHORAGA_RECORD_PATH", None)
+
+import ai_adjustment_engine as engine
+
+SCL_PROFILE = {
+    "monetary_rules": [{"pattern": ".*caja.*", "tags": ["Caja"], "source_nc": "test", "confidence_weight": 5.0}],
+    "non_monetary_rules": [{"pattern": ".*edificio.*", "tags": ["Depreciable", "Edificios"], "source_nc": "test", "confidence_weight": 5.0}]
+}
+
+def sidecar_path() -> str:
+    return os.path.join(tempfile.mkdtemp(prefix="mahoraga-test-"), "sidecar.db")
+
+def feedback(company_id: str, profile: dict) -> "engine.FeedbackRequest":
+    return engine.FeedbackRequest(
+        company_id=company_id, account_code="1105", account_name="Caja chica sucursal",
+        correct_type="monetary", error_tag=engine.FeedbackErrorTag.MISCLASSIFIED_ACCOUNT,
+        user="auditor", existing_profile=profile
+    )
+
+def generation_request(company_id: str) -> "engine.AdjustmentRequest":
+    return engine.AdjustmentRequest(
+        company_id=company_id,
+        accounts=[engine.Account(code="1201", name="Edificios", balance=1000.0),
+                  engine.Account(code="1101", name="Caja M/N", balance=50.0)],
+        parameters=engine.AdjustmentParameters(ufv_initial=2.4, ufv_final=2.5)
+    )
+
+def empty_response() -> "engine.AdjustmentResponse":
+    return engine.AdjustmentResponse(success=True, proposedTransactions=[], aggregate_confidence=1.0, reasoning="")
+
+def scl_hit_total(scl_engine) -> int:
+    return sum(rule.get("hit_count") or 0
+               for rule_type in ("monetary_rules", "non_monetary_rules")
+               for rule in scl_engine.profile.profile_data.get(rule_type, []))
+
+class FailingEventLog(engine.AdaptationEventLog):
+    """Registro durable cuyo append falla (disco lleno, base bloqueada)"""
+
+    def append(self, company_id, events):
+        raise sqlite3.OperationalError("database is locked")
+
+# ---------------------------------------------------------------------------
+# Eventos de adaptación
+# ---------------------------------------------------------------------------
+
+def test_feedback_migrates_legacy_events_to_durable_log():
+    engine._event_log = engine.AdaptationEventLog(sidecar_path())
+    legacy = {"id": "EVT-LEGACY-1", "account_code": "1101", "action": "Set nature to monetary"}
+    result = engine.MahoragaEngine().learn_from_feedback(feedback("co-mig", {**SCL_PROFILE, "adaptation_events": [legacy]}))
+
+    assert result.success
+    assert "adaptation_events" not in result.updated_profile_schema
+    events, _ = engine._event_log.query("co-mig")
+    assert [e["id"] for e in events] == [result.adaptation_details["event_id"], "EVT-LEGACY-1"]
+
+def test_feedback_keeps_events_in_profile_when_log_is_not_durable():
+    engine._event_log = engine.AdaptationEventLog(":memory:")
+    legacy = {"id": "EVT-LEGACY-2"}
+    result = engine.MahoragaEngine().learn_from_feedback(feedback("co-mem", {**SCL_PROFILE, "adaptation_events": [legacy]}))
+
+    kept = result.updated_profile_schema["adaptation_events"]
+    assert [e["id"] for e in kept] == ["EVT-LEGACY-2", result.adaptation_details["event_id"]]
+
+def test_feedback_keeps_events_in_profile_when_append_fails():
+    engine._event_log = FailingEventLog(sidecar_path())
+    result = engine.MahoragaEngine().learn_from_feedback(feedback("co-fail", {**SCL_PROFILE, "adaptation_events": [{"id": "EVT-LEGACY-3"}]}))
+
+    kept = result.updated_profile_schema["adaptation_events"]
+    assert [e["id"] for e in kept] == ["EVT-LEGACY-3", result.adaptation_details["event_id"]]
+
+# ---------------------------------------------------------------------------
+# Versiones de perfil
+# ---------------------------------------------------------------------------
+
+def test_profile_versions_are_immutable():
+    store = engine.ProfileStore(sidecar_path())
+    v1, etag1 = store.put("co-ver", {"monetary_rules": [], "reasoning_config": {"confidence_threshold": 0.8}})
+    v2, etag2 = store.put("co-ver", {"monetary_rules": [], "reasoning_config": {"confidence_threshold": 0.9}}, version=v1)
+
+    assert (v1, v2) == (1, 2) and etag1 != etag2
+    assert store.get("co-ver", version=1)[2]["reasoning_config"]["confidence_threshold"] == 0.8
+    assert store.get("co-ver", etag=etag1)[0] == 1
+    # Mismo contenido que la última versión: no crea una nueva
+    assert store.put("co-ver", {"monetary_rules": [], "reasoning_config": {"confidence_threshold": 0.9}}) == (2, etag2)
+
+def test_profile_store_returns_fresh_copies():
+    store = engine.ProfileStore(sidecar_path())
+    store.put("co-copy", {"monetary_rules": []})
+    store.get("co-copy")[2]["monetary_rules"].append({"pattern": "^x$"})
+    assert store.get("co-copy")[2]["monetary_rules"] == []
+
+def test_profile_retention_keeps_latest_versions():
+    store = engine.ProfileStore(sidecar_path(), max_versions_per_company=3)
+    for threshold in range(5):
+        store.put("co-ret", {"reasoning_config": {"confidence_threshold": threshold / 10}})
+    store.put("co-other", {"monetary_rules": []})
+
+    assert [store.get("co-ret", version=v) is not None for v in range(1, 6)] == [False, False, True, True, True]
+    assert store.latest("co-ret")[0] == 5
+    assert store.latest("co-other")[0] == 1
+
+def test_engine_for_profile_owns_its_profile_copy():
+    profile = json.loads(json.dumps(SCL_PROFILE))
+    scl_engine = engine.engine_for_profile("co-own", profile, engine.profile_etag(profile))
+    scl_engine.generate_adjustments(generation_request("co-own"))
+
+    assert scl_hit_total(scl_engine) == 2
+    assert all("hit_count" not in rule for rule in profile["monetary_rules"] + profile["non_monetary_rules"])
+
+# ---------------------------------------------------------------------------
+# Caché de resultados y memoización por cuenta
+# ---------------------------------------------------------------------------
+
+def test_result_cache_invalidation_is_per_company_and_persistent():
+    path = sidecar_path()
+    cache = engine.ResultCache(db_path=path)
+    response = empty_response()
+    cache.put("k-a", "co-a", response, [("monetary_rules", 0)])
+    cache.put("k-b", "co-b", response)
+
+    assert cache.invalidate("co-a") == 1
+    assert cache.get("k-a") is None
+    assert cache.get("k-b") is not None
+    # Otro proceso sobre el mismo sidecar tampoco ve la entrada invalidada
+    reopened = engine.ResultCache(db_path=path)
+    assert reopened.get("k-a") is None
+    assert reopened.get("k-b")[1] == []
+
+def test_result_cache_hit_replays_rule_hits():
+    engine._result_cache = engine.ResultCache()
+    profile = json.loads(json.dumps(SCL_PROFILE))
+    etag = engine.profile_etag(profile)
+    scl_engine = engine.engine_for_profile("co-hits", profile, etag)
+    request = generation_request("co-hits")
+
+    first = engine.run_generation(request, profile, 1, etag)
+    second = engine.run_generation(request, profile, 1, etag)
+
+    assert (first.processing_stats["result_cache"], second.processing_stats["result_cache"]) == ("miss", "hit")
+    assert second.processing_stats["rule_hits_flushed"] == first.processing_stats["rule_hits_flushed"] == 2
+    assert scl_hit_total(scl_engine) == 4
+
+def test_account_memo_invalidation():
+    store = engine.AccountMemoStore(sidecar_path())
+    store.save("co-memo", {"m1": {"adjustments": [], "hits": [["monetary_rules", 0]]}})
+    store.save("co-keep", {"m1": {"adjustments": [], "hits": []}})
+
+    assert store.load("co-memo", ["m1", "m2"]) == {"m1": {"adjustments": [], "hits": [["monetary_rules", 0]]}}
+    assert store.invalidate("co-memo") == 1
+    assert store.load("co-memo", ["m1"]) == {}
+    assert list(store.load("co-keep", ["m1"])) == ["m1"]
+
+def test_feedback_endpoint_invalidates_company_caches():
+    from fastapi.testclient import TestClient
+
+    engine._event_log = engine.AdaptationEventLog(sidecar_path())
+    engine._profile_store = engine.ProfileStore(sidecar_path())
+    engine._result_cache = engine.ResultCache()
+    engine._account_memo_store = engine.AccountMemoStore(sidecar_path())
+    response = empty_response()
+    engine._result_cache.put("k-fb", "co-fb", response)
+    engine._result_cache.put("k-other", "co-other", response)
+    engine._account_memo_store.save("co-fb", {"m1": {"adjustments": [], "hits": []}})
+
+    body = feedback("co-fb", json.loads(json.dumps(SCL_PROFILE))).model_dump(mode="json")
+    reply = TestClient(engine.app).post("/api/ai/adjustments/feedback", json=body)
+
+    assert reply.status_code == 200, reply.text
+    assert reply.json()["profile_version"] == 1
+    assert engine._result_cache.get("k-fb") is None
+    assert engine._result_cache.get("k-other") is not None
+    assert engine._account_memo_store.load("co-fb", ["m1"]) == {}
+
+# ---------------------------------------------------------------------------
+# Contadores de reglas SCL
+# ---------------------------------------------------------------------------
+
+def test_generalize_rules_leaves_hit_counts_unchanged():
+    rules = [{"pattern": "^" + re.escape(f"banco union cta {i}") + "$", "tags": ["Bancos"],
+              "source_nc": "test", "confidence_weight": 5.0, "hit_count": 7} for i in (1, 2, 3)]
+    chart = [engine.Account(code=str(1000 + i), name=f"Banco Union cta {1 + i % 3}", balance=1.0) for i in range(1200)]
+    result = engine.MahoragaEngine({"monetary_rules": rules, "non_monetary_rules": []}).generalize_rules(chart)
+
+    assert [a["pattern"] for a in result["accepted"]] == [r"^banco\s+union(?:\s|$)"]
+    # La verificación contra 1200 cuentas no suma hits: la regla fusionada hereda solo el uso real
+    assert [r["hit_count"] for r in result["updated_profile_schema"]["monetary_rules"]] == [21]
+    assert [r["hit_count"] for r in rules] == [7, 7, 7]
+
+def test_profile_run_does_not_touch_hits_or_request():
+    profile = json.loads(json.dumps(SCL_PROFILE))
+    etag = engine.profile_etag(profile)
+    scl_engine = engine.engine_for_profile("co-prof", profile, etag)
+    request = generation_request("co-prof")
+    request.profile_schema = profile
+
+    report = engine.profile_adjustment_run(request, top=5, trace_memory=False)
+
+    assert report["result_summary"]["accounts"] == 2 and report["stage_timings"]
+    assert scl_hit_total(scl_engine) == 0
+    assert not request.include_stage_timings
+
+def test_debug_profile_token_with_non_ascii_header_is_forbidden():
+    import asyncio
+    from fastapi import HTTPException
+
+    run = engine.ProfileRunRequest(request=generation_request("co-token"))
+    try:
+        asyncio.run(engine.debug_profile_run(run, x_debug_token="clave-ñ"))
+    except HTTPException as e:
+        assert e.status_code == 403
+    else:
+        raise AssertionError("se esperaba 403")
+
+def main():
+    """Función principal"""
+    tests = [(name, fn) for name, fn in globals().items() if name.startswith("test_") and callable(fn)]
+    failures = 0
+    print('🧪 MAHORAGA V9.0 - ALMACENES SIDECAR')
+    print('=' * 60)
+    for name, fn in tests:
+        try:
+            fn()
+            print(f"✅ {name}")
+        except Exception:
+            failures += 1
+            print(f"❌ {name}\n{traceback.format_exc()}")
+    print(f"\n📊 {len(tests) - failures}/{len(tests)} pruebas correctas")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -549,11 +549,11 @@ router.post('/adjustments/feedback', async (req, res) => {
       console.log(`      - monetary_rules: ${savedProfile?.monetary_rules?.length || 0}`);
       console.log(`      - non_monetary_rules: ${savedProfile?.non_monetary_rules?.length || 0}`);
 
-      // 3. Log Evento (usando el perfil ya guardado para consistencia)
+      // 3. Log Evento (mismo event_id que la regla generada por Python)
       const lastEvent = savedProfile.adaptation_events && savedProfile.adaptation_events.length > 0
         ? savedProfile.adaptation_events[savedProfile.adaptation_events.length - 1]
         : null;
-      const eventId = lastEvent?.id || `EVT-${Date.now()}`;
+      const eventId = result.adaptation_details?.event_id || lastEvent?.id || `EVT-${Date.now()}`;
       await logEvent(companyId, req.body, eventId);
 
       if (recentConflicts.length > 0) {
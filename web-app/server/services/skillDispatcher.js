@@ -327,6 +327,8 @@ class SkillDispatcher {
 
     // ==================== FUNCIONES SEGURAS IMPLEMENTADAS ====================
 
+    // Portada bit a bit a Python (_skill_bankers_round en ai_adjustment_engine.py): mantener ambas en sincronía.
+    // Usa aritmética binaria (1.015 -> 1.01), a diferencia del bankersRound Decimal del motor Python (1.02)
     safeBankersRound(num, decimals = 2) {
         if (typeof num !== 'number' || isNaN(num)) return 0;
         const factor = Math.pow(10, decimals);